@@ -2,10 +2,12 @@ from flask import Flask
 from dotenv import load_dotenv
 import logging
 import os
+import time
 
 load_dotenv()
 
 def create_app(config_overrides=None):
+    started = time.perf_counter()
     app = Flask(__name__)
 
     # Logging - use StreamHandler for serverless environments
@@ -33,16 +35,39 @@ def create_app(config_overrides=None):
             repr(app_password)
         )
 
+    from .ai import configure_model
+    configure_model(app.config)
+    app.logger.info("AI backend: %s", app.config.get("AI_BACKEND"))
+
     # Initialize extensions
+    from . import replica, slowlog, uow
     from .extensions import db
     db.init_app(app)
+    replica.init_app(app)
+    uow.init_app(app)
+    slowlog.init_app(app)
     app.logger.info("Database initialized.")
 
+    from . import estimates, faq, fragments, geo, ics, pricing, search
+    fragments.init_app(app)
+    ics.init_app(app)
+    search.init_app(app)
+    geo.init_app(app)
+    estimates.init_app(app)
+    pricing.init_app(app)
+    faq.init_app(app)
+
     # Register blueprints
     from .routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
     app.logger.info("Blueprint registered.")
 
+    from .commands import register_commands
+    register_commands(app)
+
+    from . import warmup
+    warmup.init_app(app)
+
     # Create tables with error handling for serverless environments
     with app.app_context():
         try:
@@ -50,6 +75,17 @@ def create_app(config_overrides=None):
             app.logger.info("Database tables created.")
         except Exception as e:
             app.logger.warning(f"Could not create tables (may already exist): {e}")
+        try:
+            from .schema import upgrade_schema
+            applied = upgrade_schema()
+            if applied:
+                app.logger.info("Schema upgraded: %s", ", ".join(applied))
+        except Exception as e:
+            app.logger.warning(f"Could not upgrade schema: {e}")
 
-    app.logger.info("Application creation finished.")
+    elapsed = round((time.perf_counter() - started) * 1000, 2)
+    app.extensions.setdefault("startup", {})["create_app_ms"] = elapsed
+    from . import metrics
+    metrics.observe("startup.create_app_ms", elapsed)
+    app.logger.info("Application creation finished in %.1f ms.", elapsed)
     return app
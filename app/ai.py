@@ -1,91 +1,329 @@
 import os
 import json
 import base64
+import asyncio
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from . import metrics
+from .uow import check_released, external_call
+from .prompts import CHAT_SYSTEM_PROMPT, estimate_tokens, schedule_prompt
+
 load_dotenv()
 
 # Initialize Gemini
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 gemini_model = genai.GenerativeModel("gemini-2.0-flash")  # Stable FREE tier model
+_gemini = gemini_model
+
+# Prompt settings; replaced from app config by configure_model()
+_settings = {
+    "PROMPT_TOKEN_BUDGET": 1200,
+    "CONTEXT_CACHE_MIN_TOKENS": 4096,
+    "CONTEXT_CACHE_TTL": 3600,
+    "PHOTO_BATCH_SIZE": 10,
+    "PHOTO_BATCH_MAX_BYTES": 15 * 1024 * 1024,
+    "PHOTO_ANALYSIS_WORKERS": 4,
+}
+# System prompt -> (model bound to it, expiry timestamp or None)
+_system_models = {}
+
+
+def configure_model(config):
+    """Select the model backend named by AI_BACKEND ("gemini" or "fake")"""
+    global gemini_model
+    backend = config.get("AI_BACKEND", "gemini")
+    if backend == "fake":
+        from .fake_model import FakeGenerativeModel
+        gemini_model = FakeGenerativeModel.from_config(config)
+    elif backend == "gemini":
+        gemini_model = _gemini
+    else:
+        raise ValueError(f"Unknown AI_BACKEND: {backend!r}")
+    for key in _settings:
+        if key in config:
+            _settings[key] = config[key]
+
+
+CHAT_FALLBACK = (
+    "You asked: {message}. I can help with inventory commands or app features. "
+    "Try asking about job management, customers, scheduling, or gutter-related questions."
+)
+
+
+def _build_system_model(system):
+    """Bind a static system prompt to a Gemini model once.
+
+    Prompts large enough for the API's context cache are uploaded once and
+    referenced by every call; smaller ones go in as system_instruction.
+    """
+    if estimate_tokens(system) >= _settings["CONTEXT_CACHE_MIN_TOKENS"]:
+        try:
+            ttl = _settings["CONTEXT_CACHE_TTL"]
+            cache = genai.caching.CachedContent.create(
+                model=_gemini.model_name, system_instruction=system, ttl=datetime.timedelta(seconds=ttl)
+            )
+            return genai.GenerativeModel.from_cached_content(cache), time.time() + ttl - 60
+        except Exception:
+            metrics.incr("ai.context_cache_errors")
+    return genai.GenerativeModel(_gemini.model_name, system_instruction=system), None
+
+
+def _prepare(kind, contents, system):
+    """Pick the model for a call and record the prompt size we send."""
+    model = gemini_model
+    if system is not None:
+        if gemini_model is _gemini:
+            cached = _system_models.get(system)
+            if cached is None or (cached[1] is not None and cached[1] < time.time()):
+                cached = _system_models[system] = _build_system_model(system)
+            model = cached[0]
+            if cached[1] is not None:
+                metrics.incr("ai.context_cache_hits")
+                system = None  # not billed as prompt input
+        else:
+            # Backends without system instructions get the prompt inline
+            contents = f"{system}\n\n{contents}"
+            system = None
+    parts = contents if isinstance(contents, list) else [contents]
+    tokens = sum(estimate_tokens(part) for part in parts if isinstance(part, str))
+    tokens += estimate_tokens(system)
+    metrics.incr(f"ai.calls.{kind}")
+    metrics.observe(f"ai.prompt_tokens.{kind}", tokens)
+    return model, contents
+
+
+def _generate(kind, contents, system=None):
+    model, contents = _prepare(kind, contents, system)
+    with external_call(f"ai.{kind}"):
+        return model.generate_content(contents)
+
+
+async def _generate_async(kind, contents, system=None):
+    """Call the model without blocking the event loop.
+
+    Uses the SDK's async client when the model has one and otherwise runs
+    the blocking call in a worker thread.
+    """
+    model, contents = _prepare(kind, contents, system)
+    with external_call(f"ai.{kind}"):
+        if hasattr(model, "generate_content_async"):
+            return await model.generate_content_async(contents)
+        return await asyncio.to_thread(model.generate_content, contents)
+
+
+def _image_bytes(photo_base64):
+    # Gemini expects image data without the data:image prefix
+    if "," in photo_base64:
+        photo_base64 = photo_base64.split(",")[1]
+    return base64.b64decode(photo_base64)
+
+
+def _estimate_prompt(job_description, customer_address):
+    return (
+        "You are a gutter installation and repair expert.\n"
+        "Based on this job description, provide a detailed cost estimate.\n\n"
+        f"Job Description: {job_description}\n"
+        f"Property Address: {customer_address}\n\n"
+        "Provide:\n"
+        "1. Estimated labor hours\n"
+        "2. Materials needed (gutters, downspouts, fasteners, etc.)\n"
+        "3. Cost breakdown\n"
+        "4. Total estimate range (low-high)\n"
+        "5. Any potential complications or considerations\n\n"
+        "Format your response as a clear, professional estimate."
+    )
 
 
 # AI Helper Functions using Gemini
 def get_ai_estimate(job_description, customer_address):
     """Use Gemini to generate a cost estimate"""
     try:
-        prompt = (
+        response = _generate("estimate", _estimate_prompt(job_description, customer_address))
+        return response.text
+
+    except Exception as e:
+        return f"Error generating estimate: {str(e)}"
+
+
+def get_estimate_narrative(quote_text, job_description=""):
+    """Customer-facing write-up of a rule-based quote; the numbers stay as given"""
+    try:
+        response = _generate("estimate", (
             "You are a gutter installation and repair expert.\n"
-            "Based on this job description, provide a detailed cost estimate.\n\n"
-            f"Job Description: {job_description}\n"
-            f"Property Address: {customer_address}\n\n"
-            "Provide:\n"
-            "1. Estimated labor hours\n"
-            "2. Materials needed (gutters, downspouts, fasteners, etc.)\n"
-            "3. Cost breakdown\n"
-            "4. Total estimate range (low-high)\n"
-            "5. Any potential complications or considerations\n\n"
-            "Format your response as a clear, professional estimate."
-        )
+            "Write a short, professional estimate for the customer from this itemized quote.\n"
+            "Use the quantities and prices exactly as given; do not change any number.\n\n"
+            f"Job Description: {job_description or 'N/A'}\n\n"
+            f"{quote_text}"
+        ))
+        return response.text
+
+    except Exception as e:
+        return f"Error generating estimate: {str(e)}"
 
-        response = gemini_model.generate_content(prompt)
+
+async def get_ai_estimate_async(job_description, customer_address):
+    """Async variant of get_ai_estimate"""
+    try:
+        response = await _generate_async("estimate", _estimate_prompt(job_description, customer_address))
         return response.text
 
     except Exception as e:
         return f"Error generating estimate: {str(e)}"
 
 
+PHOTO_CHECKLIST = (
+    "1. Current condition (damage, rust, sagging, clogs)\n"
+    "2. Type of gutters (K-style, half-round, etc.)\n"
+    "3. Approximate measurements if visible\n"
+    "4. Recommended repairs or replacements\n"
+    "5. Urgency level (low/medium/high)\n\n"
+)
+
+
 def analyze_photo(photo_base64, context=""):
     """Use Gemini Vision to analyze a job site photo"""
     try:
-        # Gemini expects image data without the data:image prefix
-        if "," in photo_base64:
-            image_data = photo_base64.split(",")[1]
-        else:
-            image_data = photo_base64
-
-        # Decode base64 to bytes
-        image_bytes = base64.b64decode(image_data)
+        image_bytes = _image_bytes(photo_base64)
 
         prompt = (
             "Analyze this gutter-related photo. Identify:\n"
-            "1. Current condition (damage, rust, sagging, clogs)\n"
-            "2. Type of gutters (K-style, half-round, etc.)\n"
-            "3. Approximate measurements if visible\n"
-            "4. Recommended repairs or replacements\n"
-            "5. Urgency level (low/medium/high)\n\n"
+            f"{PHOTO_CHECKLIST}"
             f"Context: {context}\n\n"
             "Provide a detailed professional assessment."
         )
 
         # Upload the image and generate content
-        response = gemini_model.generate_content(
-            [prompt, {"mime_type": "image/jpeg", "data": image_bytes}]
-        )
+        response = _generate("photo", [prompt, {"mime_type": "image/jpeg", "data": image_bytes}])
         return response.text
 
     except Exception as e:
         return f"Error analyzing photo: {str(e)}"
 
 
-def suggest_schedule(jobs_data, new_job_address):
-    """Use Gemini to suggest optimal scheduling"""
+def _parse_batch_analyses(text, count):
+    """Map image number -> analysis from the model's JSON array reply."""
+    start, end = text.find("["), text.rfind("]")
+    items = json.loads(text[start:end + 1]) if start != -1 and end > start else []
+    results = {}
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get("image"), int) and item.get("analysis"):
+            if 1 <= item["image"] <= count:
+                results[item["image"] - 1] = str(item["analysis"])
+    return results
+
+
+def _analyze_batch(images, context):
+    """One multimodal request for several images; returns {index: analysis}."""
+    parts = [
+        f"You will see {len(images)} gutter-related photos, numbered 1 to {len(images)} in order. "
+        "For each photo identify:\n"
+        f"{PHOTO_CHECKLIST}"
+        f"Context: {context}\n\n"
+        'Reply with only a JSON array, one object per photo: [{"image": 1, "analysis": "..."}, ...]'
+    ]
+    for number, image_bytes in enumerate(images, start=1):
+        parts.append(f"Photo {number}:")
+        parts.append({"mime_type": "image/jpeg", "data": image_bytes})
     try:
-        prompt = f"""Given these upcoming jobs: {json.dumps(jobs_data)}
+        return _parse_batch_analyses(_generate("photo_batch", parts).text, len(images))
+    except Exception:
+        metrics.incr("ai.photo_batch_failures")
+        return {}
+
+
+def analyze_photos(photos_base64, context=""):
+    """Analyze several photos of one job, in as few round trips as possible.
 
-New job location: {new_job_address}
+    Up to PHOTO_BATCH_SIZE images (and PHOTO_BATCH_MAX_BYTES of image data)
+    go in a single request.  Larger sets, and any image the batch reply did
+    not cover, fall back to single calls on PHOTO_ANALYSIS_WORKERS threads.
+    Returns analyses in the order given.
+    """
+    # Single-photo calls may run on worker threads; check the caller's connections here
+    check_released("ai.photos")
+    results = [None] * len(photos_base64)
+    images = {}
+    for index, photo in enumerate(photos_base64):
+        try:
+            images[index] = _image_bytes(photo)
+        except Exception as e:
+            results[index] = f"Error analyzing photo: {str(e)}"
 
-Suggest the best date to schedule this job considering:
-1. Route optimization (group nearby jobs)
-2. Current workload
-3. Weather considerations
-4. Efficiency
+    pending = sorted(images)
+    batch_bytes = sum(len(images[i]) for i in pending)
+    if 1 < len(pending) <= _settings["PHOTO_BATCH_SIZE"] and batch_bytes <= _settings["PHOTO_BATCH_MAX_BYTES"]:
+        for offset, analysis in _analyze_batch([images[i] for i in pending], context).items():
+            results[pending[offset]] = analysis
+        pending = [i for i in pending if results[i] is None]
 
-Respond with just a date in YYYY-MM-DD format and brief reason."""
+    if pending:
+        workers = min(_settings["PHOTO_ANALYSIS_WORKERS"], len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for index, analysis in zip(pending, pool.map(lambda i: analyze_photo(photos_base64[i], context), pending)):
+                results[index] = analysis
+    return results
 
-        response = gemini_model.generate_content(prompt)
+
+def suggest_schedule(jobs_data, new_job_address):
+    """Use Gemini to suggest optimal scheduling"""
+    try:
+        prompt = schedule_prompt(jobs_data, new_job_address, _settings["PROMPT_TOKEN_BUDGET"])
+        response = _generate("schedule", prompt)
         return response.text
 
     except Exception:
         return None
+
+
+def chat_reply(message):
+    """Answer a free-form /api/chat message about the app"""
+    if hasattr(gemini_model, "generate_content"):
+        try:
+            resp = _generate("chat", f"User Question: {message}", system=CHAT_SYSTEM_PROMPT)
+            return resp.text
+        except Exception:
+            pass
+    return CHAT_FALLBACK.format(message=message)
+
+
+async def chat_reply_async(message):
+    """Async variant of chat_reply"""
+    if hasattr(gemini_model, "generate_content"):
+        try:
+            resp = await _generate_async("chat", f"User Question: {message}", system=CHAT_SYSTEM_PROMPT)
+            return resp.text
+        except Exception:
+            pass
+    return CHAT_FALLBACK.format(message=message)
+
+
+def help_answer(question):
+    """Tech-support answer for /api/ai/help; model errors propagate"""
+    return _generate("help", f"You are a helpful tech support assistant. Question: {question}").text
+
+
+async def help_answer_async(question):
+    """Async variant of help_answer"""
+    response = await _generate_async("help", f"You are a helpful tech support assistant. Question: {question}")
+    return response.text
+
+
+def scan_inventory_photo(photo_base64):
+    """Describe the stock visible in an inventory photo"""
+    image_bytes = _image_bytes(photo_base64)
+    if not hasattr(gemini_model, "generate_content"):
+        return "Inventory analysis placeholder"
+    return _generate("scan", ["Analyze inventory image", {"mime_type": "image/jpeg", "data": image_bytes}]).text
+
+
+async def scan_inventory_photo_async(photo_base64):
+    """Async variant of scan_inventory_photo"""
+    image_bytes = _image_bytes(photo_base64)
+    if not hasattr(gemini_model, "generate_content"):
+        return "Inventory analysis placeholder"
+    response = await _generate_async("scan", ["Analyze inventory image", {"mime_type": "image/jpeg", "data": image_bytes}])
+    return response.text
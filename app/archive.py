@@ -0,0 +1,122 @@
+"""Archival tier for completed jobs.
+
+``archive_jobs`` moves completed jobs scheduled (or, when unscheduled,
+created) before a cutoff into the ``archived_*`` tables, together with
+their material lines and photos, in batches of set-based
+``INSERT ... SELECT`` / ``DELETE`` statements.  Their counts and revenue are
+added to ``JobRollup`` first so dashboard and report totals do not change;
+``forget_customer`` takes them out again when a customer is deleted.
+Archived rows keep their ids; the hot tables use AUTOINCREMENT on SQLite so
+those ids are never handed out again.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+
+from .extensions import db
+from .ics import expire_months
+from .models import (
+    ArchivedJob,
+    ArchivedJobMaterial,
+    ArchivedJobPhoto,
+    Job,
+    JobMaterial,
+    JobPhoto,
+    JobRollup,
+)
+
+# (hot table, archive table); children are copied verbatim, stored bytes and all
+_TIERS = [
+    (Job.__table__, ArchivedJob.__table__, "id"),
+    (JobMaterial.__table__, ArchivedJobMaterial.__table__, "job_id"),
+    (JobPhoto.__table__, ArchivedJobPhoto.__table__, "job_id"),
+]
+
+
+def _eligible(cutoff):
+    return (
+        select(Job.id)
+        .where(Job.status == "completed")
+        .where(or_(
+            Job.scheduled_date < cutoff,
+            and_(Job.scheduled_date.is_(None), Job.created < datetime.combine(cutoff, datetime.min.time())),
+        ))
+        .order_by(Job.id)
+    )
+
+
+def _month(scheduled_date, created):
+    day = scheduled_date or created
+    return day.strftime("%Y-%m") if day else "unknown"
+
+
+def _roll_up(model, condition, sign=1):
+    """Add (or with ``sign=-1`` take away) ``model`` rows matching ``condition`` in ``JobRollup``."""
+    totals = defaultdict(lambda: [0, 0.0])
+    rows = db.session.execute(
+        select(model.scheduled_date, model.created, model.status, model.total_cost).where(condition)
+    )
+    for scheduled_date, created, status, total_cost in rows:
+        entry = totals[(_month(scheduled_date, created), status)]
+        entry[0] += 1
+        entry[1] += total_cost or 0.0
+    for (month, status), (count, revenue) in totals.items():
+        rollup = db.session.get(JobRollup, (month, status))
+        if rollup is None:
+            rollup = JobRollup(month=month, status=status, job_count=0, revenue=0.0)
+            db.session.add(rollup)
+        rollup.job_count += sign * count
+        rollup.revenue += sign * revenue
+
+
+def _copy(ids):
+    for hot, cold, key in _TIERS:
+        columns = [c.name for c in hot.columns if c.name in cold.c]
+        db.session.execute(
+            insert(cold).from_select(columns, select(*(hot.c[name] for name in columns)).where(hot.c[key].in_(ids)))
+        )
+
+
+def archive_jobs(older_than_days, batch_size=500, today=None):
+    """Archive completed jobs older than ``older_than_days``; returns how many moved.
+
+    Each batch commits on its own, so a long first run can be interrupted
+    and resumed, and the app keeps serving while it works.
+    """
+    cutoff = (today or date.today()) - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        ids = db.session.execute(_eligible(cutoff).limit(batch_size)).scalars().all()
+        if not ids:
+            if moved:
+                expire_months()
+            return moved
+        try:
+            _roll_up(Job, Job.id.in_(ids))
+            db.session.flush()
+            _copy(ids)
+            # ON DELETE CASCADE removes the hot material lines and photos
+            db.session.execute(delete(Job).where(Job.id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(ids)
+
+
+def forget_customer(customer_id):
+    """Take a customer's archived jobs out of ``JobRollup``.
+
+    Call before deleting the customer: the database cascades the
+    ``archived_job`` rows away, and the totals must drop with them.
+    """
+    _roll_up(ArchivedJob, ArchivedJob.customer_id == customer_id, sign=-1)
+
+
+def archived_stats():
+    """``{status: (count, revenue)}`` over every rollup month."""
+    rows = db.session.execute(
+        select(JobRollup.status, func.sum(JobRollup.job_count), func.sum(JobRollup.revenue)).group_by(JobRollup.status)
+    )
+    return {status: (count or 0, revenue or 0.0) for status, count, revenue in rows}
@@ -0,0 +1,207 @@
+"""ASGI serving mode.
+
+The AI endpoints spend nearly all their time waiting on the model, so in
+this mode they are served natively on the event loop with the async Gemini
+client: one worker can hold hundreds of them open at once.  Every other
+request (and ``/api/chat`` inventory commands, which write to the database,
+and estimates reused from earlier jobs, which read it) is handed to the
+unchanged Flask app on a thread pool.  The estimate-reuse index is built by
+``warm_up`` on a thread at lifespan startup; until it exists, estimates go
+to Flask too, so the event loop never waits on the database.
+
+Run with::
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import current_app
+
+from . import ai, estimates, faq
+from .warmup import warm_up
+from .routes import CHAT_COMMAND_PREFIXES
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs WSGI apps on one shared thread by default, which would
+    # serialize the CRUD routes; run them on a real pool instead.  The loop
+    # is ours, built on build_environ/start_response/sync_send, so nothing
+    # depends on how asgiref decorates its own run_wsgi_app.
+    def __init__(self, wsgi_application, duplicate_header_limit, executor):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run, thread_sensitive=False, executor=self.executor)(body)
+
+    def _run(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            headers = [(b"content-type", b"text/plain")]
+            self.sync_send({"type": "http.response.start", "status": 400, "headers": headers})
+            self.sync_send({"type": "http.response.body", "body": b"Bad Request"})
+            return
+        output = self.wsgi_application(environ, self.start_response)
+        sent = 0
+        try:
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                if self.response_content_length is not None:
+                    chunk = chunk[:self.response_content_length - sent]
+                self.sync_send({"type": "http.response.body", "body": chunk, "more_body": True})
+                sent += len(chunk)
+                if sent == self.response_content_length:
+                    break
+        finally:
+            if hasattr(output, "close"):
+                output.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({"type": "http.response.body"})
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs requests on a fixed-size thread pool."""
+
+    def __init__(self, wsgi_application, threads):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        instance = _PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit, self.executor)
+        await instance(scope, receive, send)
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _replay(body):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def chat(data):
+    message = (data.get("message") or "").strip()
+    if not message or message.lower().startswith(CHAT_COMMAND_PREFIXES):
+        return None
+    return 200, {"response": faq.answer(message) or await ai.chat_reply_async(message)}
+
+
+async def ai_help(data):
+    question = data.get("question", "")
+    if not question:
+        return 400, {"error": "Question required"}
+    try:
+        return 200, {"success": True, "answer": await ai.help_answer_async(question)}
+    except Exception as e:
+        return 500, {"success": False, "error": str(e)}
+
+
+async def ai_estimate(data):
+    description = data.get("description", "")
+    address = data.get("address", "Unknown address")
+    if "linear_feet" in data:
+        # Rule-engine quote; Flask prices it from the catalog
+        return None
+    if not description:
+        return 400, {"error": "Description required"}
+    if not estimates.is_built() or estimates.has_candidate(description):
+        # Building the index and reading the stored estimate are database
+        # calls; Flask serves those
+        return None
+    estimate = await ai.get_ai_estimate_async(description, address)
+    return 200, {"success": True, "estimate": estimate, "provider": current_app.config["AI_BACKEND"], "reused": False}
+
+
+async def scan_inventory(data):
+    photo_data = data.get("photo_data", "")
+    if not photo_data:
+        return 400, {"error": "Photo data required"}
+    try:
+        analysis = await ai.scan_inventory_photo_async(photo_data)
+        return 200, {"success": True, "analysis": analysis, "provider": "LocalFallback"}
+    except Exception as e:
+        return 500, {"success": False, "error": str(e)}
+
+
+ASYNC_ROUTES = {
+    "/api/chat": chat,
+    "/api/ai/help": ai_help,
+    "/api/ai/estimate": ai_estimate,
+    "/api/ai/scan-inventory": scan_inventory,
+}
+
+
+class AsyncAIApp:
+    """ASGI app serving ``ASYNC_ROUTES`` natively and everything else via Flask."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = PooledWsgiToAsgi(flask_app, flask_app.config["ASGI_WSGI_THREADS"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        handler = ASYNC_ROUTES.get(scope.get("path")) if scope.get("method") == "POST" else None
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            data = None
+        with self.flask_app.app_context():
+            result = await handler(data) if isinstance(data, dict) else None
+        if result is None:
+            # Not something we serve natively; Flask gets the same body
+            return await self.wsgi(scope, _replay(body), send)
+        await _send_json(send, *result)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await sync_to_async(warm_up, thread_sensitive=False)(self.flask_app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app=None):
+    if flask_app is None:
+        from . import create_app
+        flask_app = create_app()
+    return AsyncAIApp(flask_app)
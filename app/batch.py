@@ -0,0 +1,126 @@
+"""``/api/batch``: several blueprint requests in one round trip.
+
+Each sub-request is matched against the app's URL map and dispatched
+in-process through ``full_dispatch_request`` with the caller's cookies, so
+it gets the same login, hooks and error handling as a real request.  They
+share the caller's app context and therefore one database session; all of
+them read the primary (never the replica) and, when every sub-request is a
+GET, they run in a single ``REPEATABLE READ`` transaction on PostgreSQL so
+the whole dashboard comes from one snapshot.  (SQLite's driver does not
+open a transaction for reads, so there each read sees the latest commit.)
+
+With ``"parallel": true`` the AI sub-requests, which spend their time
+waiting on the model, run on a thread pool - each in its own app context
+and session - while the others run in order on the calling thread.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, session
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.test import EnvironBuilder
+
+from . import metrics
+from .extensions import db
+
+METHODS = ("GET", "POST", "PATCH", "PUT", "DELETE")
+# Endpoints that mostly wait on the model; safe to run alongside each other
+AI_ENDPOINTS = frozenset({
+    "main.api_chat", "main.api_ai_help", "main.api_ai_estimate", "main.api_scan_inventory",
+})
+_EXCLUDED = frozenset({"main.api_batch", "main.warmup_instance", "static"})
+
+
+class BatchError(ValueError):
+    """Raised for a batch payload that cannot be run at all."""
+
+
+def parse(payload, max_requests):
+    """Validated ``[(id, method, path, body, endpoint)]`` from the request JSON."""
+    items = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError("requests must be a non-empty list")
+    if len(items) > max_requests:
+        raise BatchError(f"At most {max_requests} requests per batch")
+    adapter = current_app.url_map.bind("localhost")
+    parsed = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str) or not item["path"].startswith("/"):
+            raise BatchError(f"requests[{position}] needs a path starting with /")
+        method = str(item.get("method", "GET")).upper()
+        if method not in METHODS:
+            raise BatchError(f"requests[{position}] has unsupported method {method}")
+        try:
+            endpoint, _ = adapter.match(item["path"].split("?", 1)[0], method=method)
+        except (NotFound, MethodNotAllowed):
+            endpoint = None
+        if endpoint in _EXCLUDED:
+            raise BatchError(f"requests[{position}] cannot be batched")
+        parsed.append((item.get("id", position), method, item["path"], item.get("body"), endpoint))
+    return parsed
+
+
+def _environ(method, path, body, headers, base_url):
+    return EnvironBuilder(
+        path=path, method=method, base_url=base_url, headers=headers,
+        json=body if body is not None and method != "GET" else None,
+    ).get_environ()
+
+
+def _dispatch(app, request_id, method, path, body, headers, base_url):
+    """Run one sub-request; returns its result and its session if it changed."""
+    with app.request_context(_environ(method, path, body, headers, base_url)):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            app.logger.exception("Batch sub-request %s %s failed", method, path)
+            db.session.rollback()
+            return {"id": request_id, "status": 500, "body": {"error": str(e)}}, None
+        if response.status_code >= 500:
+            db.session.rollback()
+        body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+        changed = dict(session) if session.modified else None
+        return {"id": request_id, "status": response.status_code, "body": body}, changed
+
+
+def _dispatch_isolated(app, *args):
+    with app.app_context():
+        return _dispatch(app, *args)
+
+
+def run(items, headers, base_url, parallel=False, workers=4):
+    """Run parsed sub-requests; returns their results in request order.
+
+    Session changes made by sub-requests are copied into the caller's session.
+    """
+    app = current_app._get_current_object()
+    results = [None] * len(items)
+    pool = None
+    futures = {}
+    g.pin_primary = True
+    try:
+        if all(method == "GET" for _, method, _, _, _ in items) and db.engine.dialect.name == "postgresql":
+            db.session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        if parallel and sum(endpoint in AI_ENDPOINTS for *_, endpoint in items) > 1:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        for position, (request_id, method, path, body, endpoint) in enumerate(items):
+            if pool is not None and endpoint in AI_ENDPOINTS:
+                futures[position] = pool.submit(
+                    _dispatch_isolated, app, request_id, method, path, body, headers, base_url
+                )
+            else:
+                results[position] = _dispatch(app, request_id, method, path, body, headers, base_url)
+        for position, future in futures.items():
+            results[position] = future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        g.pin_primary = False
+        db.session.rollback()
+    # Sub-request cookies are dropped, so carry their session changes (the
+    # read-your-writes deadline after a write, above all) to the caller's
+    for _, changed in results:
+        if changed is not None:
+            session.update(changed)
+    metrics.incr("batch.requests")
+    metrics.observe("batch.size", len(items))
+    return [result for result, _ in results]
@@ -0,0 +1,291 @@
+"""Bulk NDJSON/CSV import and export.
+
+Imports parse the input one record at a time, validate each row against the
+entity's field spec and insert valid rows with one executemany ``INSERT``
+per chunk, committing every few chunks.  Rows that fail validation - or
+point at a customer that does not exist - are skipped and reported with
+their 1-based row number, so a bad line never sinks the file.  Input that
+cannot be parsed at all (a broken CSV line) raises ``ImportFormatError``
+after rolling back the uncommitted chunks; its ``report`` says what the
+earlier commits already loaded, through ``committed_through_row``, so a
+retry can resume after that row instead of inserting duplicates.
+
+Exports stream rows with ``yield_per`` (a server-side cursor where the
+driver has one) and encode them as they go.  Memory stays flat either way.
+
+Bulk inserts bypass ORM session events: the typeahead and geo indexes (and
+the price book, for materials) are expired afterwards, and imported
+customers without coordinates are left for ``flask geocode-customers``.
+"""
+import csv
+import io
+import json
+import math
+from datetime import date, datetime
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert, select
+
+from .extensions import db
+from .geo import geohash
+from .models import Customer, InventoryItem, Job, Material
+from .ics import expire_months
+from .pricing import expire_price_book
+
+FORMATS = ("ndjson", "csv")
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    """Raised when the input cannot be parsed at all.
+
+    ``report`` is set by ``import_rows`` to the rows committed before the
+    error.
+    """
+
+    report = None
+
+
+def _text(limit=None, required=False):
+    def convert(value):
+        value = "" if value is None else str(value).strip()
+        if not value:
+            if required:
+                raise ValueError("is required")
+            return None
+        if limit and len(value) > limit:
+            raise ValueError(f"is longer than {limit} characters")
+        return value
+    return convert
+
+
+def _number(kind, required=False, default=None):
+    def convert(value):
+        if value is None or value == "":
+            if required:
+                raise ValueError("is required")
+            return default
+        try:
+            number = kind(value)
+            # No nan/inf, and no silent truncation of 1.9 to 1
+            if not math.isfinite(number) or (kind is int and isinstance(value, float) and number != value):
+                raise ValueError(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"must be {'an integer' if kind is int else 'a finite number'}")
+        return number
+    return convert
+
+
+def _date(value):
+    if value is None or value == "":
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError("must be a YYYY-MM-DD date")
+
+
+def _choice(*options, default=None):
+    def convert(value):
+        value = ("" if value is None else str(value)).strip() or default or ""
+        if value not in options:
+            raise ValueError(f"must be one of {', '.join(options)}")
+        return value
+    return convert
+
+
+# Entity name -> (model, {field: converter}, customer reference field)
+ENTITIES = {
+    "customers": (Customer, {
+        "name": _text(200, required=True),
+        "address": _text(500),
+        "phone": _text(50),
+        "email": _text(200),
+        "notes": _text(),
+        "latitude": _number(float),
+        "longitude": _number(float),
+    }, None),
+    "jobs": (Job, {
+        "customer_id": _number(int, required=True),
+        "title": _text(200, required=True),
+        "description": _text(),
+        "scheduled_date": _date,
+        "status": _choice("scheduled", "in_progress", "completed", "cancelled", default="scheduled"),
+        "total_cost": _number(float, default=0.0),
+        "notes": _text(),
+    }, "customer_id"),
+    "materials": (Material, {
+        "name": _text(200, required=True),
+        "unit": _text(50),
+        "unit_cost": _number(float),
+        "supplier": _text(200),
+        "notes": _text(),
+    }, None),
+    "inventory": (InventoryItem, {
+        "name": _text(200, required=True),
+        "quantity": _number(float, default=0.0),
+        "unit": _text(50),
+        "unit_cost": _number(float),
+        "location": _text(200),
+        "low_stock_alert": _number(float, default=0.0),
+        "notes": _text(),
+        "owner_id": _number(int),
+    }, "owner_id"),
+}
+
+
+def read_records(stream, fmt):
+    """Yield ``(row_number, record_or_error)`` from a binary stream, lazily."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        try:
+            if not reader.fieldnames:
+                return
+            for number, record in enumerate(reader, start=1):
+                yield number, record
+        except csv.Error as e:
+            raise ImportFormatError(f"CSV line {reader.line_num}: {e}")
+        return
+    if fmt != "ndjson":
+        raise ImportFormatError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"invalid JSON: {e}")
+            continue
+        yield number, record if isinstance(record, dict) else ValueError("each line must be a JSON object")
+
+
+def _validate(fields, record):
+    row = {}
+    for name, convert in fields.items():
+        try:
+            row[name] = convert(record.get(name))
+        except ValueError as e:
+            raise ValueError(f"{name} {e}")
+    if "latitude" in fields:
+        # executemany needs the same keys on every row
+        if row["latitude"] is None or row["longitude"] is None:
+            row["latitude"] = row["longitude"] = None
+        row["geohash"] = geohash(row["latitude"], row["longitude"]) if row["latitude"] is not None else None
+    return row
+
+
+def _existing_customers(ids):
+    return set(db.session.execute(select(Customer.id).where(Customer.id.in_(ids))).scalars()) if ids else set()
+
+
+def import_rows(entity, records, chunk_size=1000, commit_every=5, dry_run=False):
+    """Validate and insert ``(row_number, record)`` pairs; returns a report dict."""
+    model, fields, reference = ENTITIES[entity]
+    table = model.__table__
+    report = {"entity": entity, "inserted": 0, "failed": 0, "errors": []}
+
+    def fail(number, message):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "error": message})
+
+    records = iter(records)
+    chunks = 0
+    committed = {**report, "errors": [], "committed_through_row": 0}
+    try:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            if _import_chunk(chunk, fields, reference, table, report, fail, dry_run):
+                chunks += 1
+                if chunks % commit_every == 0:
+                    db.session.commit()
+                    committed = {**report, "errors": list(report["errors"]), "committed_through_row": chunk[-1][0]}
+    except ImportFormatError as e:
+        db.session.rollback()
+        if committed["inserted"]:
+            _expire_after_import(entity)
+        e.report = committed
+        raise
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        if report["inserted"]:
+            _expire_after_import(entity)
+    return report
+
+
+def _import_chunk(chunk, fields, reference, table, report, fail, dry_run):
+    """Validate one chunk and insert its valid rows; True when it inserted any."""
+    valid = []
+    for number, record in chunk:
+        if isinstance(record, Exception):
+            fail(number, str(record))
+            continue
+        try:
+            valid.append((number, _validate(fields, record)))
+        except ValueError as e:
+            fail(number, str(e))
+    if reference:
+        known = _existing_customers({row[reference] for _, row in valid if row[reference] is not None})
+        for number, row in valid:
+            if row[reference] is not None and row[reference] not in known:
+                fail(number, f"{reference} {row[reference]} does not exist")
+        valid = [(n, row) for n, row in valid if row[reference] is None or row[reference] in known]
+    report["inserted"] += len(valid)
+    if valid and not dry_run:
+        db.session.execute(insert(table), [row for _, row in valid])
+        return True
+    return False
+
+
+def _expire_after_import(entity):
+    if entity == "customers":
+        _expire_customer_indexes()
+    elif entity == "materials":
+        expire_price_book()
+    elif entity == "jobs":
+        expire_months()
+
+
+def _expire_customer_indexes():
+    for name in ("customer_index", "geo_index"):
+        index = current_app.extensions.get(name)
+        if index is not None:
+            index.expire()
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def export_rows(entity, fmt, batch_size=1000):
+    """Yield the entity's rows encoded as NDJSON lines or CSV text, in id order."""
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    model, fields, _ = ENTITIES[entity]
+    table = model.__table__
+    names = ["id", *fields, *(c for c in ("created", "updated_at") if c in table.c)]
+    result = db.session.execute(
+        select(*(table.c[name] for name in names)).order_by(table.c.id).execution_options(yield_per=batch_size)
+    )
+    if fmt == "ndjson":
+        for row in result:
+            yield json.dumps({name: _json_value(value) for name, value in zip(names, row)}) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for count, row in enumerate(result, start=1):
+        writer.writerow([_json_value(value) for value in row])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
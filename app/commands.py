@@ -0,0 +1,229 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .extensions import db
+
+
+@click.command("reconcile-job-totals")
+@with_appcontext
+def reconcile_job_totals_command():
+    """Recompute Job.total_cost for every job whose lines have drifted."""
+    from .ledger import reconcile_job_totals
+
+    count = reconcile_job_totals()
+    db.session.commit()
+    click.echo(f"Reconciled {count} job total(s).")
+
+
+@click.command("compress-text-columns")
+@click.option("--batch-size", default=200, show_default=True, help="Rows rewritten per transaction.")
+@click.option("--vacuum/--no-vacuum", default=True, show_default=True, help="VACUUM afterwards (SQLite) to shrink the file.")
+@with_appcontext
+def compress_text_columns_command(batch_size, vacuum):
+    """Compress long values written before their column used CompressedText.
+
+    Safe to run while the app is serving: each batch is its own short
+    transaction, and re-running it only touches rows still stored raw.
+    The counts reported are rows that are now stored compressed.
+    """
+    from .compression import compress_existing, compressed_columns
+
+    for table, column in compressed_columns(db.metadata):
+        total = 0
+        for count in compress_existing(db.session, table, column, batch_size):
+            total += count
+        click.echo(f"{table.name}.{column.name}: compressed {total} row(s).")
+    if vacuum and db.engine.dialect.name == "sqlite":
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        click.echo("Vacuumed database.")
+
+
+@click.command("archive-jobs")
+@click.option("--days", type=int, default=None, help="Archive completed jobs older than this (default ARCHIVE_AFTER_DAYS).")
+@with_appcontext
+def archive_jobs_command(days):
+    """Move old completed jobs, their materials and photos to the archive tables."""
+    from .archive import archive_jobs
+
+    days = current_app.config["ARCHIVE_AFTER_DAYS"] if days is None else days
+    moved = archive_jobs(days, batch_size=current_app.config["ARCHIVE_BATCH_SIZE"])
+    click.echo(f"Archived {moved} job(s) completed more than {days} day(s) ago.")
+
+
+@click.command("import-geocodes")
+@click.argument("csv_file", type=click.File("r", encoding="utf-8"))
+@click.option("--source", default="import", show_default=True, help="Recorded against each entry.")
+@with_appcontext
+def import_geocodes_command(csv_file, source):
+    """Load address,latitude,longitude rows into the offline geocoding table."""
+    import csv
+
+    from .geo import address_key
+    from .models import GeocodeEntry
+
+    count = 0
+    for row in csv.DictReader(csv_file):
+        key = address_key(row.get("address"))
+        if not key:
+            continue
+        db.session.merge(GeocodeEntry(
+            address_key=key, latitude=float(row["latitude"]), longitude=float(row["longitude"]), source=source,
+        ))
+        count += 1
+        if count % 1000 == 0:
+            db.session.commit()
+    db.session.commit()
+    click.echo(f"Imported {count} geocode(s).")
+
+
+@click.command("geocode-customers")
+@click.option("--all", "everyone", is_flag=True, help="Re-geocode customers that already have coordinates.")
+@with_appcontext
+def geocode_customers_command(everyone):
+    """Fill customer coordinates from the configured geocoder."""
+    from sqlalchemy import select, update
+
+    from .geo import geohash, load_geocoder
+    from .models import Customer
+
+    geocoder = load_geocoder(current_app.config.get("GEOCODER"))
+    query = select(Customer.id, Customer.address).where(Customer.address.is_not(None))
+    if not everyone:
+        query = query.where(Customer.latitude.is_(None))
+    found = missed = 0
+    # Running servers pick the new coordinates up on their next GEO_INDEX_TTL rebuild
+    for customer_id, address in db.session.execute(query).all():
+        coords = geocoder(address)
+        if coords is None:
+            missed += 1
+            continue
+        db.session.execute(
+            update(Customer).where(Customer.id == customer_id)
+            .values(latitude=coords[0], longitude=coords[1], geohash=geohash(*coords))
+        )
+        found += 1
+    db.session.commit()
+    click.echo(f"Geocoded {found} customer(s); {missed} address(es) not found.")
+
+
+@click.command("prune-sync-tombstones")
+@with_appcontext
+def prune_sync_tombstones_command():
+    """Forget deletions older than SYNC_TOMBSTONE_DAYS."""
+    from .sync import prune_tombstones
+
+    count = prune_tombstones(current_app.config["SYNC_TOMBSTONE_DAYS"])
+    db.session.commit()
+    click.echo(f"Pruned {count} tombstone(s).")
+
+
+@click.command("import-data")
+@click.argument("entity", type=click.Choice(["customers", "jobs", "materials", "inventory"]))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default=None,
+              help="Defaults to the file extension.")
+@click.option("--dry-run", is_flag=True, help="Validate only.")
+@with_appcontext
+def import_data_command(entity, path, fmt, dry_run):
+    """Bulk-load ENTITY rows from an NDJSON or CSV file."""
+    from . import bulk
+
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, "rb") as stream:
+        try:
+            report = bulk.import_rows(
+                entity, bulk.read_records(stream, fmt),
+                chunk_size=current_app.config["BULK_IMPORT_CHUNK_ROWS"], dry_run=dry_run,
+            )
+        except bulk.ImportFormatError as e:
+            db.session.rollback()
+            committed = e.report or {}
+            if committed.get("inserted"):
+                click.echo(
+                    f"Imported {committed['inserted']} {entity} row(s) through row "
+                    f"{committed['committed_through_row']} before the error.",
+                    err=True,
+                )
+            raise click.ClickException(str(e))
+    for error in report["errors"]:
+        click.echo(f"row {error['row']}: {error['error']}", err=True)
+    verb = "Validated" if dry_run else "Imported"
+    click.echo(f"{verb} {report['inserted']} {entity} row(s); {report['failed']} failed.")
+
+
+@click.command("export-data")
+@click.argument("entity", type=click.Choice(["customers", "jobs", "materials", "inventory"]))
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default="ndjson", show_default=True)
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-")
+@with_appcontext
+def export_data_command(entity, fmt, output):
+    """Stream every ENTITY row as NDJSON or CSV."""
+    from .bulk import export_rows
+
+    for chunk in export_rows(entity, fmt):
+        output.write(chunk)
+
+
+@click.command("price-jobs")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]), default=None,
+              help="Defaults to the file extension.")
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-")
+@with_appcontext
+def price_jobs_command(path, fmt, output):
+    """Quote every job in an NDJSON or CSV file of measurements, as CSV.
+
+    Columns are the pricing inputs (linear_feet, stories, downspouts,
+    gutter_type, ...); useful for reviewing rates against many jobs at once.
+    """
+    import csv
+
+    from . import bulk, pricing
+
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    book = pricing.get_price_book()
+    writer = csv.writer(output)
+    writer.writerow(["row", *pricing.INPUT_FIELDS, "materials", "labor", "markup", "total", "low", "high", "error"])
+    priced = failed = 0
+    with open(path, "rb") as stream:
+        try:
+            for number, quote in pricing.quote_records(bulk.read_records(stream, fmt), book):
+                if isinstance(quote, Exception):
+                    failed += 1
+                    writer.writerow([number, *[""] * len(pricing.INPUT_FIELDS), "", "", "", "", "", "", str(quote)])
+                    continue
+                priced += 1
+                inputs = quote["inputs"]
+                writer.writerow([number, *(inputs[name] for name in pricing.INPUT_FIELDS),
+                                 *(quote[key] for key in ("materials", "labor", "markup", "total", "low", "high")), ""])
+        except bulk.ImportFormatError as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Priced {priced} job(s); {failed} failed.", err=True)
+
+
+@click.command("precompile-templates")
+@with_appcontext
+def precompile_templates_command():
+    """Compile every template into the Jinja bytecode cache (run at build time)."""
+    from .warmup import precompile_templates
+
+    directory = getattr(current_app.jinja_env.bytecode_cache, "directory", None)
+    if directory is None:
+        raise click.ClickException("JINJA_BYTECODE_CACHE_DIR is not set.")
+    count = precompile_templates(current_app)
+    click.echo(f"Compiled {count} template(s) into {directory}.")
+
+
+def register_commands(app):
+    app.cli.add_command(reconcile_job_totals_command)
+    app.cli.add_command(compress_text_columns_command)
+    app.cli.add_command(archive_jobs_command)
+    app.cli.add_command(import_geocodes_command)
+    app.cli.add_command(geocode_customers_command)
+    app.cli.add_command(prune_sync_tombstones_command)
+    app.cli.add_command(import_data_command)
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(price_jobs_command)
+    app.cli.add_command(precompile_templates_command)
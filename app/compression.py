@@ -0,0 +1,94 @@
+"""Transparent compression for long text columns.
+
+``CompressedText`` stores values longer than its threshold as zlib-deflated,
+base85-encoded text behind a short marker, and only when that is actually
+smaller.  Anything without the marker - short values, incompressible ones and
+every row written before the column used this type - reads back unchanged,
+so old databases keep working and ``compress_existing`` can convert them in
+the background.
+"""
+import base64
+import zlib
+
+from sqlalchemy import func, select, update
+from sqlalchemy.types import Text, TypeDecorator
+
+MARKER = "\x1bz1:"
+DEFAULT_THRESHOLD = 512
+
+
+def compress(value, threshold=DEFAULT_THRESHOLD):
+    if value is None or len(value) < threshold or value.startswith(MARKER):
+        return value
+    packed = MARKER + base64.b85encode(zlib.compress(value.encode("utf-8"), 6)).decode("ascii")
+    return packed if len(packed) < len(value) else value
+
+
+def decompress(value):
+    if value is None or not value.startswith(MARKER):
+        return value
+    return zlib.decompress(base64.b85decode(value[len(MARKER):])).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """``Text`` that is compressed at rest above ``threshold`` characters."""
+
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, **kwargs):
+        super().__init__(**kwargs)
+        self.threshold = threshold
+
+    def process_bind_param(self, value, dialect):
+        return compress(value, self.threshold)
+
+    def process_result_value(self, value, dialect):
+        return decompress(value)
+
+
+def compressed_columns(metadata):
+    """``(table, column)`` for every ``CompressedText`` column in ``metadata``."""
+    return [
+        (table, column)
+        for table in metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, CompressedText)
+    ]
+
+
+def compress_existing(session, table, column, batch_size=200):
+    """Rewrite raw values of one column in id order, committing per batch.
+
+    Yields the number of rows compressed after each batch so callers can
+    report progress.  Values the column type would store raw anyway
+    (incompressible ones) are left untouched and not counted.
+    """
+    pk = table.c.id
+    # substr() is untyped, so this compares the stored text, not the type's view
+    stored = func.substr(column, 1, len(MARKER))
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(pk, column)
+            .where(pk > last_id)
+            .where(func.length(column) >= column.type.threshold)
+            .where(stored != MARKER)
+            .order_by(pk)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        compressed = 0
+        for row_id, value in rows:
+            if not compress(value, column.type.threshold).startswith(MARKER):
+                continue
+            compressed += 1
+            values = {column.name: value}
+            if "updated_at" in table.c:
+                # Storage-only change: keep sync cursors, feeds and cache keys still
+                values["updated_at"] = table.c.updated_at
+            session.execute(update(table).where(pk == row_id).values(values))
+        session.commit()
+        last_id = rows[-1][0]
+        yield compressed
@@ -16,3 +16,123 @@ class Config:
     SQLALCHEMY_DATABASE_URI = database_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     APP_PASSWORD = os.getenv("APP_PASSWORD", "nao$")
+
+    # Max dHash bit distance for two uploads on a job to count as one photo
+    PHOTO_DEDUP_THRESHOLD = int(os.getenv("PHOTO_DEDUP_THRESHOLD", "5"))
+
+    # Jinja bytecode cache, filled at build time by flask precompile-templates
+    # and shipped with the bundle; empty disables it
+    JINJA_BYTECODE_CACHE_DIR = os.getenv(
+        "JINJA_BYTECODE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "jinja_cache")
+    )
+
+    # Threads for the Flask (non-AI) routes when served through asgi.py
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "4"))
+
+    # Model backend: "gemini", or "fake" for offline load/latency testing
+    # (see app/fake_model.py for the latency spec format)
+    AI_BACKEND = os.getenv("AI_BACKEND", "gemini")
+    AI_FAKE_LATENCY = os.getenv("AI_FAKE_LATENCY", "fixed:0.2")
+    AI_FAKE_ERROR_RATE = float(os.getenv("AI_FAKE_ERROR_RATE", "0"))
+    AI_FAKE_TOKENS_PER_SECOND = float(os.getenv("AI_FAKE_TOKENS_PER_SECOND", "0"))
+    AI_FAKE_RESPONSES = os.getenv("AI_FAKE_RESPONSES")  # JSON file of {substring: reply}
+    AI_FAKE_SEED = int(os.getenv("AI_FAKE_SEED", "0"))
+
+    # Token budget for data summarized into prompts (e.g. upcoming jobs)
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+    # System prompts at least this large use the Gemini context cache
+    CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "4096"))
+    CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "3600"))
+
+    # Photos per multimodal request when analyzing a job's photos together;
+    # larger sets fall back to this many parallel single-photo calls
+    PHOTO_BATCH_SIZE = int(os.getenv("PHOTO_BATCH_SIZE", "10"))
+    PHOTO_BATCH_MAX_BYTES = int(os.getenv("PHOTO_BATCH_MAX_BYTES", str(15 * 1024 * 1024)))
+    PHOTO_ANALYSIS_WORKERS = int(os.getenv("PHOTO_ANALYSIS_WORKERS", "4"))
+
+    # Seconds before the in-process customer typeahead index is rebuilt
+    # to pick up writes made by other workers
+    CUSTOMER_INDEX_TTL = int(os.getenv("CUSTOMER_INDEX_TTL", "300"))
+
+    # "table" looks addresses up in geocode_entry (flask import-geocodes);
+    # "package.module:callable" plugs in another address -> (lat, lon) lookup
+    GEOCODER = os.getenv("GEOCODER", "table")
+    GEO_INDEX_TTL = int(os.getenv("GEO_INDEX_TTL", "300"))
+    # Largest radius /api/customers/<id>/nearby_jobs accepts
+    NEARBY_MAX_KM = float(os.getenv("NEARBY_MAX_KM", "200"))
+
+    # /api/sync: rows per model per page, how long fresh writes are held back
+    # so late commits are not skipped, and how long deletions are remembered
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+    SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "2"))
+    SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+    # Rule-based quotes (/api/ai/estimate with linear_feet, flask price-jobs):
+    # labor per gutter foot and per downspout, extra labor share per story
+    # above the first, markup and the +/- spread of the low/high range
+    PRICING_LABOR_PER_FOOT = float(os.getenv("PRICING_LABOR_PER_FOOT", "6.0"))
+    PRICING_LABOR_PER_DOWNSPOUT = float(os.getenv("PRICING_LABOR_PER_DOWNSPOUT", "15.0"))
+    PRICING_STORY_LABOR_FACTOR = float(os.getenv("PRICING_STORY_LABOR_FACTOR", "0.25"))
+    PRICING_MARKUP_PERCENT = float(os.getenv("PRICING_MARKUP_PERCENT", "30"))
+    PRICING_RANGE_PERCENT = float(os.getenv("PRICING_RANGE_PERCENT", "10"))
+    # Seconds before the catalog is re-read (other workers' Material edits)
+    PRICE_BOOK_TTL = int(os.getenv("PRICE_BOOK_TTL", "300"))
+
+    # add_job and /api/ai/estimate reuse an earlier job's estimate when its
+    # description is at least this similar (shingle Jaccard, 0-1); above 1 disables
+    ESTIMATE_REUSE_THRESHOLD = float(os.getenv("ESTIMATE_REUSE_THRESHOLD", "0.8"))
+    ESTIMATE_INDEX_TTL = int(os.getenv("ESTIMATE_INDEX_TTL", "300"))
+
+    # /api/chat answers from the local FAQ when the best match covers at least
+    # this share of the question's weight (0-1); 1 sends everything to the model
+    FAQ_MIN_CONFIDENCE = float(os.getenv("FAQ_MIN_CONFIDENCE", "0.6"))
+
+    # /api/batch: sub-requests per call, and threads for AI sub-requests
+    # when the caller asks for "parallel"
+    BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+    BATCH_AI_WORKERS = int(os.getenv("BATCH_AI_WORKERS", "4"))
+
+    # Inventory edits that lose a race to another writer are retried on a
+    # fresh copy this many times before reporting a conflict
+    STOCK_EDIT_RETRIES = int(os.getenv("STOCK_EDIT_RETRIES", "3"))
+
+    # Rendered row fragments ({% cache %} in jobs.html, customers.html): entries
+    # kept per worker (0 disables), and an optional SQLite file shared by the
+    # workers on one machine with the row count it is pruned back to
+    FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "5000"))
+    FRAGMENT_CACHE_DB = os.getenv("FRAGMENT_CACHE_DB")
+    FRAGMENT_CACHE_DB_ROWS = int(os.getenv("FRAGMENT_CACHE_DB_ROWS", "50000"))
+
+    # Statements slower than this (ms) are logged with their plan and listed
+    # at /admin/slow-queries; negative turns timing off.  SLOW_QUERY_LOG is
+    # an NDJSON file rotated at SLOW_QUERY_LOG_BYTES (unset keeps no file)
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+    SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+    SLOW_QUERY_LOG_BYTES = int(os.getenv("SLOW_QUERY_LOG_BYTES", "5000000"))
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "3"))
+
+    # /calendar.ics: months before and after the current one in the default
+    # window, the most a ?months= range may ask for, how long a month's
+    # snapshot is trusted (other workers' writes are only seen after this),
+    # and the ?token= phone calendars subscribe with (unset: login only)
+    CALENDAR_FEED_PAST_MONTHS = int(os.getenv("CALENDAR_FEED_PAST_MONTHS", "1"))
+    CALENDAR_FEED_FUTURE_MONTHS = int(os.getenv("CALENDAR_FEED_FUTURE_MONTHS", "6"))
+    CALENDAR_FEED_MAX_MONTHS = int(os.getenv("CALENDAR_FEED_MAX_MONTHS", "24"))
+    CALENDAR_SNAPSHOT_TTL = int(os.getenv("CALENDAR_SNAPSHOT_TTL", "300"))
+    CALENDAR_FEED_TOKEN = os.getenv("CALENDAR_FEED_TOKEN")
+
+    # Rows per executemany INSERT for /api/import and flask import-data
+    BULK_IMPORT_CHUNK_ROWS = int(os.getenv("BULK_IMPORT_CHUNK_ROWS", "1000"))
+
+    # Completed jobs older than this many days move to the archive tables
+    # (flask archive-jobs); their totals stay in the dashboard via rollups
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+    # Optional read replica for reporting routes marked @read_only
+    SQLALCHEMY_REPLICA_URI = os.getenv("DATABASE_REPLICA_URL")
+    if SQLALCHEMY_REPLICA_URI and SQLALCHEMY_REPLICA_URI.startswith("postgres://"):
+        SQLALCHEMY_REPLICA_URI = SQLALCHEMY_REPLICA_URI.replace("postgres://", "postgresql://", 1)
+    # A client that just wrote keeps reading the primary for this long
+    READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+    REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
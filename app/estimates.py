@@ -0,0 +1,251 @@
+"""Reuse of past AI estimates for near-duplicate job descriptions.
+
+Descriptions are normalized (units spelled one way, plurals folded) and cut
+into word-bigram shingles.  Each job with an estimate gets a MinHash
+signature; LSH over ``BANDS`` bands of ``ROWS`` rows buckets signatures so
+a lookup only compares against jobs that share a band, and candidates are
+then ranked by their exact shingle Jaccard similarity.  Bigrams keep
+numbers in context: "clean 150 ft gutters" and "clean 50 ft gutters" share
+little.
+
+``find_reusable`` returns the closest prior estimate at or above
+``ESTIMATE_REUSE_THRESHOLD``; ``add_job`` and ``/api/ai/estimate`` try it
+before asking the model.  Estimates that were themselves reused are not
+indexed, so a lookup always points at the job the model wrote it for.
+
+Like the typeahead and geo indexes this one is built lazily per app, kept
+current from session events and rebuilt in the background every
+``ESTIMATE_INDEX_TTL`` seconds.  Archived jobs drop out at the next rebuild.
+"""
+import random
+import threading
+import time
+import zlib
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from . import metrics
+from .extensions import db
+from .models import Job
+from .search import normalize
+
+NUM_PERM = 32
+BANDS, ROWS = 8, 4
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERM)]
+_SYNONYMS = {"feet": "ft", "foot": "ft", "inch": "in", "inches": "in", "stories": "story", "storey": "story"}
+_PENDING = "estimate_index_pending"
+_ERROR_PREFIX = "Error generating estimate"
+
+
+def shingles(text):
+    words = []
+    for word in normalize(text):
+        word = _SYNONYMS.get(word, word)
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    grams = [" ".join(pair) for pair in zip(words, words[1:])] or words
+    return frozenset(zlib.crc32(gram.encode()) for gram in grams)
+
+
+def signature(shingle_set):
+    return tuple(min((a * x + b) % _PRIME for x in shingle_set) for a, b in _PERMUTATIONS)
+
+
+def _bands(sig):
+    return [(band, sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+class EstimateIndex:
+    """MinHash LSH buckets over the descriptions of jobs with an estimate."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._entries = {}
+        self.built_at = None
+        self.refreshing = False
+
+    def _add(self, job_id, description):
+        shingle_set = shingles(description)
+        if not shingle_set:
+            return
+        keys = _bands(signature(shingle_set))
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(job_id)
+        self._entries[job_id] = (shingle_set, keys)
+
+    def _remove(self, job_id):
+        entry = self._entries.pop(job_id, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(job_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def build(self, rows):
+        buckets, entries = {}, {}
+        for job_id, description in rows:
+            shingle_set = shingles(description)
+            if not shingle_set:
+                continue
+            keys = _bands(signature(shingle_set))
+            for key in keys:
+                buckets.setdefault(key, set()).add(job_id)
+            entries[job_id] = (shingle_set, keys)
+        with self._lock:
+            self._buckets, self._entries = buckets, entries
+            self.built_at = time.monotonic()
+
+    def upsert(self, job_id, description):
+        with self._lock:
+            self._remove(job_id)
+            self._add(job_id, description)
+
+    def remove(self, job_id):
+        with self._lock:
+            self._remove(job_id)
+
+    def expire(self):
+        """Keep serving, but rebuild in the background on next use."""
+        if self.built_at is not None:
+            self.built_at = float("-inf")
+
+    @property
+    def stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    def similar(self, description, threshold):
+        """``[(similarity, job_id)]`` at or above ``threshold``, most similar first."""
+        shingle_set = shingles(description)
+        if not shingle_set:
+            return []
+        keys = _bands(signature(shingle_set))
+        found = []
+        with self._lock:
+            candidates = set()
+            for key in keys:
+                candidates |= self._buckets.get(key, set())
+            for job_id in candidates:
+                other = self._entries[job_id][0]
+                similarity = len(shingle_set & other) / len(shingle_set | other)
+                if similarity >= threshold:
+                    found.append((similarity, job_id))
+        found.sort(key=lambda item: (-item[0], -item[1]))
+        return found
+
+
+def _rows():
+    return db.session.execute(
+        select(Job.id, Job.description).where(
+            Job.ai_estimate.is_not(None), Job.description.is_not(None), Job.estimate_reused_from.is_(None)
+        )
+    ).all()
+
+
+def _load(app, index):
+    with app.app_context():
+        try:
+            index.build(_rows())
+        finally:
+            index.refreshing = False
+
+
+def get_estimate_index(app=None):
+    """This app's estimate index; built inline the first time, then in the background."""
+    app = app or current_app._get_current_object()
+    index = app.extensions.get("estimate_index")
+    if index is None:
+        index = app.extensions["estimate_index"] = EstimateIndex(ttl=app.config["ESTIMATE_INDEX_TTL"])
+    if index.built_at is None:
+        index.build(_rows())
+    elif index.stale and not index.refreshing:
+        index.refreshing = True
+        threading.Thread(target=_load, args=(app, index), daemon=True).start()
+    return index
+
+
+def is_built(app=None):
+    """Whether this app's index exists, so ``get_estimate_index`` will not query."""
+    index = (app or current_app).extensions.get("estimate_index")
+    return index is not None and index.built_at is not None
+
+
+def has_candidate(description):
+    """Whether ``find_reusable`` might hit, without reading any estimate.
+
+    A ``False`` is counted as a reuse miss; a ``True`` is counted by the
+    ``find_reusable`` call that follows.
+    """
+    threshold = current_app.config["ESTIMATE_REUSE_THRESHOLD"]
+    if threshold <= 1 and get_estimate_index().similar(description, threshold):
+        return True
+    metrics.incr("estimate.reuse.miss")
+    return False
+
+
+def find_reusable(description):
+    """The closest prior estimate for ``description``, or ``None``.
+
+    Returns ``{"estimate", "job_id", "similarity"}``.  Counts
+    ``estimate.reuse.hit``/``estimate.reuse.miss`` in ``app.metrics``.
+    """
+    threshold = current_app.config["ESTIMATE_REUSE_THRESHOLD"]
+    if threshold > 1 or not description:
+        return None
+    index = get_estimate_index()
+    for similarity, job_id in index.similar(description, threshold):
+        estimate = db.session.execute(select(Job.ai_estimate).where(Job.id == job_id)).scalar()
+        if not estimate or estimate.startswith(_ERROR_PREFIX):
+            # Archived or re-estimated since the index last saw it
+            index.remove(job_id)
+            continue
+        metrics.incr("estimate.reuse.hit")
+        metrics.observe("estimate.reuse_similarity", similarity)
+        return {"estimate": estimate, "job_id": job_id, "similarity": round(similarity, 3)}
+    metrics.incr("estimate.reuse.miss")
+    return None
+
+
+def _collect(session, flush_context):
+    pending = session.info.setdefault(_PENDING, {})
+    for obj in session.new | session.dirty:
+        # Only jobs whose estimate was loaded or set; never trigger a deferred load
+        if isinstance(obj, Job) and "ai_estimate" in obj.__dict__ and "description" in obj.__dict__:
+            usable = obj.ai_estimate and not obj.ai_estimate.startswith(_ERROR_PREFIX)
+            pending[obj.id] = obj.description if usable and obj.estimate_reused_from is None else None
+    for obj in session.deleted:
+        if isinstance(obj, Job):
+            pending[obj.id] = None
+
+
+def _apply(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get("estimate_index")
+    if index is None:
+        return
+    for job_id, description in pending.items():
+        if description:
+            index.upsert(job_id, description)
+        else:
+            index.remove(job_id)
+
+
+def _discard(session):
+    session.info.pop(_PENDING, None)
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_flush", _collect):
+        event.listen(db.session, "after_flush", _collect)
+        event.listen(db.session, "after_commit", _apply)
+        event.listen(db.session, "after_rollback", _discard)
@@ -1,3 +1,19 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .replica import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
 
-db = SQLAlchemy()
+@event.listens_for(Engine, "connect")
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores REFERENCES clauses (and so ON DELETE CASCADE) unless
+    # enforcement is switched on for every new connection
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
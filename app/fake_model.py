@@ -0,0 +1,164 @@
+"""Deterministic local stand-in for ``genai.GenerativeModel``.
+
+Selected with ``AI_BACKEND=fake`` so the AI routes can be load- and
+latency-tested offline.  It honours the parts of the ``generate_content``
+contract the app relies on: text or ``[prompt, {"mime_type", "data"}]``
+contents, ``stream=True`` iteration, ``.text`` on the response, and an
+async twin.  Everything random comes from one seeded generator, so a given
+seed replays the same latencies and failures in the same call order.
+
+Latency specs (seconds)::
+
+    fixed:0.2
+    uniform:0.1,0.6
+    normal:0.3,0.05          mean, stddev (clamped at 0)
+    lognormal:-1.2,0.4       mu, sigma of the underlying normal
+"""
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+
+from .prompts import estimate_tokens
+
+
+class FakeModelError(Exception):
+    """Injected failure, shaped like the SDK's quota errors."""
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """Response object; iterable chunk by chunk when streamed."""
+
+    def __init__(self, chunks, pace=None):
+        self._chunks = chunks
+        self._pace = pace
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self._pace:
+                self._pace(chunk)
+            yield FakeChunk(chunk)
+
+    def resolve(self):
+        for _ in self:
+            pass
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+
+class FakeAsyncResponse(FakeResponse):
+    def __init__(self, chunks, pace=None):
+        super().__init__(chunks)
+        self._async_pace = pace
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            if self._async_pace:
+                await self._async_pace(chunk)
+            yield FakeChunk(chunk)
+
+    async def resolve(self):
+        async for _ in self:
+            pass
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a ``rng -> seconds`` sampler."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class FakeGenerativeModel:
+    def __init__(self, latency="fixed:0", error_rate=0.0, tokens_per_second=0, responses=None, seed=0):
+        self._sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        # Ordered (substring, reply) pairs; the first match wins
+        self.responses = list((responses or {}).items())
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = itertools.count(1)
+
+    @classmethod
+    def from_config(cls, config):
+        responses = {}
+        if config.get("AI_FAKE_RESPONSES"):
+            with open(config["AI_FAKE_RESPONSES"]) as f:
+                responses = json.load(f)
+        return cls(
+            latency=config.get("AI_FAKE_LATENCY", "fixed:0"),
+            error_rate=config.get("AI_FAKE_ERROR_RATE", 0.0),
+            tokens_per_second=config.get("AI_FAKE_TOKENS_PER_SECOND", 0),
+            responses=responses,
+            seed=config.get("AI_FAKE_SEED", 0),
+        )
+
+    def _plan(self, contents):
+        """Draw this call's latency, failure and reply under the lock."""
+        if isinstance(contents, str):
+            contents = [contents]
+        prompt = " ".join(part for part in contents if isinstance(part, str))
+        images = sum(1 for part in contents if isinstance(part, dict) and "data" in part)
+        with self._lock:
+            call = next(self._calls)
+            latency = self._sample_latency(self._rng)
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            return latency, FakeModelError(f"429 Resource has been exhausted (fake call {call})"), None
+        reply = next((text for key, text in self.responses if key.lower() in prompt.lower()), None)
+        if reply is None:
+            reply = f"Fake response #{call} to a {estimate_tokens(prompt)}-token prompt"
+            if images:
+                reply += f" with {images} image(s)"
+        words = reply.split(" ")
+        chunks = [" ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "") for i in range(0, len(words), 8)]
+        return latency, None, chunks
+
+    def _chunk_delay(self, chunk):
+        return estimate_tokens(chunk) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        latency, error, chunks = self._plan(contents)
+        time.sleep(latency)
+        if error:
+            raise error
+
+        def pace(chunk):
+            time.sleep(self._chunk_delay(chunk))
+
+        response = FakeResponse(chunks, pace)
+        if not stream:
+            response.resolve()
+        return response
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        latency, error, chunks = self._plan(contents)
+        await asyncio.sleep(latency)
+        if error:
+            raise error
+
+        async def pace(chunk):
+            await asyncio.sleep(self._chunk_delay(chunk))
+
+        response = FakeAsyncResponse(chunks, pace)
+        if not stream:
+            await response.resolve()
+        return response
@@ -0,0 +1,180 @@
+"""Local answers for how-to questions in the chat.
+
+Most chat traffic asks how to use the app, and those answers do not need a
+model call.  At startup a BM25 index is built over the canned answers below
+and the quick-help cards in ``templates/help.html`` (their ``data-answer``
+attribute).  ``answer(message)`` returns the best local answer when it is
+confident enough, otherwise ``None`` and the caller asks the model.
+
+Confidence is the share of the message's IDF weight that the best entry
+covers, so a question made of words the index has never seen scores low
+however well its one familiar word matches.  Only how-to questions are
+looked up at all: "show me low stock inventory" or "mark job 5 completed"
+share words with an entry but ask for data or an action, so they go to the
+model.  Every decision is counted in
+``app.metrics`` (``chat.route.faq`` / ``chat.route.llm``, and
+``chat.faq_hit``, whose mean is the local hit rate).
+"""
+import html
+import math
+import os
+import re
+from collections import Counter
+
+from flask import current_app
+
+from . import metrics
+from .search import normalize
+
+# (question phrasings, answer)
+FAQ = [
+    (["How do I schedule a job?", "create a new job", "add a job for a customer", "book a job"],
+     "Open Jobs, fill in Create New Job: pick the customer, give it a title, an optional description and a "
+     "scheduled date, then save. It shows on the calendar for that date."),
+    (["How do I add a customer?", "create a new customer", "new client"],
+     "Open Customers and use Add New Customer: name, phone and address are required; email and notes are "
+     "optional."),
+    (["How do I edit or delete a customer?", "change customer details", "remove a customer"],
+     "On Customers, use Edit on the customer's card to change details, or Delete to remove the customer with "
+     "all of their jobs, photos and inventory."),
+    (["How do I add inventory?", "add an inventory item", "add stock", "track stock"],
+     "Open Inventory and fill in Add Inventory Item (name, location, quantity, unit, unit cost, optional "
+     "low-stock alert), or in chat send: inventory-add name=Hangers, quantity=50, unit=each, unit_cost=1.2"),
+    (["How do I update or delete inventory?", "change inventory quantity", "remove an inventory item"],
+     "Edit the item on the Inventory page, or in chat send inventory-adjust id=<id>, delta=<+n or -n> to "
+     "take or return stock, inventory-update id=<id>, quantity=<n> or inventory-delete id=<id>."),
+    (["How do I scan inventory with the camera?", "scan stock photo", "inventory scanner"],
+     "On Inventory, open the AI Inventory Scanner, take or upload a photo and choose Analyze with AI. In chat, "
+     "inventory-scan image_data=<data URL> creates an item from a photo."),
+    (["How do I add materials to a job?", "record materials used", "add material to job"],
+     "Open the job and use Add Material: choose a material from the library and a quantity. The job total and "
+     "the customer's stock update automatically."),
+    (["How do I add a material to the library?", "materials catalog", "material price"],
+     "Open Materials and use Add Material with a name, unit, unit cost and optional supplier."),
+    (["How do I change a job's status?", "mark a job completed", "complete a job"],
+     "Open the job, pick Scheduled, In Progress, Completed or Cancelled under Update Job Status, and press "
+     "Update Status."),
+    (["How do I add photos to a job?", "upload job photo", "photo analysis"],
+     "Open the job, choose a photo under Add Photo, add a caption and upload it. Analyze Photos asks the AI to "
+     "assess gutter condition for all of the job's photos."),
+    (["How do I get an estimate?", "AI estimate", "quote a job", "price a job"],
+     "Use Quick Estimate for a materials and labor quote from measurements or a photo. Jobs created with a "
+     "description also get an AI estimate."),
+    (["Where is the calendar?", "see jobs by date", "month view"],
+     "Open Calendar to see jobs by scheduled date; use the arrows to move between months."),
+    (["How do I see reports?", "revenue report", "end of shift report", "download daily report"],
+     "Open Reports for job, revenue and customer totals; Download Today's Report gives a text summary of "
+     "today's jobs."),
+]
+
+K1, B = 1.2, 0.75
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in into is it me my of on or the this to what "
+    "when where which with you your".split()
+)
+_CARD = re.compile(r'<div class="help-card"(?P<attrs>[^>]*)>(?P<body>.*?)(?=<div class="help-card"|<!--|</div>\s*</div>)', re.S)
+_ASK = re.compile(r"askQuestion\('(?P<q>[^']*)'\)")
+_ANSWER = re.compile(r'data-answer="(?P<a>[^"]*)"')
+_TAG = re.compile(r"<[^>]+>")
+# How-to phrasing; anything else is a data request or command for the model
+_HOW_TO = re.compile(r"\b(how|where|help|can (i|we|you)|is there a way|way to|steps? to)\b", re.I)
+
+
+def tokens(text):
+    words = []
+    for word in normalize(text):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        # Light stemming so "jobs"/"scheduled"/"scheduling" meet "job"/"schedule"
+        for suffix in ("ing", "ed", "s"):
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        if len(word) > 3 and word.endswith("e"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+class FaqIndex:
+    """BM25 over FAQ entries; questions are weighted above answer text."""
+
+    def __init__(self, entries):
+        self.answers = []
+        self.docs = []
+        for questions, answer in entries:
+            terms = Counter()
+            for question in questions:
+                terms.update({t: 2 for t in tokens(question)})
+            terms.update(tokens(answer))
+            self.answers.append(answer)
+            self.docs.append(terms)
+        lengths = [sum(doc.values()) for doc in self.docs]
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self.lengths = lengths
+        df = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+        self.unknown_idf = math.log(1 + (n + 0.5) / 0.5)
+
+    def best(self, text):
+        """``(answer, confidence, score)`` of the best entry, or ``None``."""
+        query = tokens(text)
+        if not query or not self.docs:
+            return None
+        best, best_score = None, 0.0
+        for position, doc in enumerate(self.docs):
+            norm = K1 * (1 - B + B * self.lengths[position] / self.avg_length)
+            score = 0.0
+            for term in query:
+                tf = doc.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (K1 + 1) / (tf + norm)
+            if score > best_score:
+                best, best_score = position, score
+        if best is None:
+            return None
+        weights = [self.idf.get(term, self.unknown_idf) for term in query]
+        covered = sum(w for term, w in zip(query, weights) if term in self.docs[best])
+        return self.answers[best], covered / sum(weights), best_score
+
+
+def help_cards(path):
+    """``(questions, answer)`` for each help.html quick-help card with a data-answer."""
+    try:
+        with open(path, encoding="utf-8") as handle:
+            page = handle.read()
+    except OSError:
+        return []
+    cards = []
+    for match in _CARD.finditer(page):
+        attrs, body = match.group("attrs"), match.group("body")
+        answer, question = _ANSWER.search(attrs), _ASK.search(attrs)
+        if not answer:
+            continue
+        text = " ".join(html.unescape(_TAG.sub(" ", body)).split())
+        questions = [html.unescape(question.group("q"))] if question else []
+        cards.append((questions + [text], html.unescape(answer.group("a"))))
+    return cards
+
+
+def answer(message):
+    """A local answer for ``message`` if the FAQ is confident, else ``None``."""
+    index = current_app.extensions.get("faq_index")
+    threshold = current_app.config["FAQ_MIN_CONFIDENCE"]
+    found = None
+    if index is not None and threshold < 1 and _HOW_TO.search(message):
+        found = index.best(message)
+    if found is not None:
+        metrics.observe("chat.faq_confidence", found[1])
+    if found is not None and found[1] >= threshold:
+        metrics.incr("chat.route.faq")
+        metrics.observe("chat.faq_hit", 1)
+        return found[0]
+    metrics.incr("chat.route.llm")
+    metrics.observe("chat.faq_hit", 0)
+    return None
+
+
+def init_app(app):
+    app.extensions["faq_index"] = FaqIndex(FAQ + help_cards(os.path.join(app.root_path, "templates", "help.html")))
@@ -0,0 +1,197 @@
+"""Template fragment cache: ``{% cache key, ... %}...{% endcache %}``.
+
+Rendered markup is stored under the template name, a checksum of its
+source and the key expressions, so a key that includes the row's
+``updated_at`` (and that of anything else the fragment shows) never serves
+a stale row, and a deploy that changes the markup starts from fresh keys;
+old entries simply age out.  On a hit the block body is not evaluated at
+all.
+
+Two tiers: a bounded in-process LRU (``FRAGMENT_CACHE_SIZE`` entries, 0
+turns caching off) and, when ``FRAGMENT_CACHE_DB`` names a file, a shared
+SQLite table consulted on a local miss, so workers on one machine fill
+each other's caches.  Hit counts per tier are reported by ``stats()`` and
+under ``fragment_cache`` in /admin/metrics.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# Prune the shared table after this many writes
+_PRUNE_EVERY = 500
+
+
+class SharedStore:
+    """Fragments in a SQLite file, shared by every worker that points at it."""
+
+    def __init__(self, path, max_rows):
+        self.path = path
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fragment (key TEXT PRIMARY KEY, html TEXT NOT NULL, stored REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute("SELECT html FROM fragment WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, html):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO fragment (key, html, stored) VALUES (?, ?, ?)", (key, html, time.time()))
+        self._writes += 1
+        if self._writes % _PRUNE_EVERY == 0:
+            conn.execute(
+                "DELETE FROM fragment WHERE key IN "
+                "(SELECT key FROM fragment ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM fragment")
+
+
+class FragmentCache:
+    def __init__(self, max_entries=5000, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return html
+        if self.shared is not None:
+            try:
+                html = self.shared.get(key)
+            except sqlite3.Error:
+                html = None
+            if html is not None:
+                self._remember(key, html)
+                with self._lock:
+                    self.shared_hits += 1
+                return html
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, html):
+        self._remember(key, html)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, html)
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.shared_hits = self.misses = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "shared": self.shared.path if self.shared is not None else None,
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.shared_hits) / lookups, 4) if lookups else None,
+            }
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the ``cache`` tag; uses ``environment.fragment_cache`` when set."""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [nodes.Const(self._prefix(parser.name)), nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _prefix(self, template_name):
+        # The source checksum retires every entry (shared tier included) when
+        # a deploy changes the template's markup
+        try:
+            source = self.environment.loader.get_source(self.environment, template_name)[0]
+        except Exception:
+            source = ""
+        return f"{template_name}@{hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]}"
+
+    def _render(self, prefix, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = f"{prefix}:" + ":".join(map(str, parts))
+        html = cache.get(key)
+        if html is None:
+            html = str(caller())
+            cache.set(key, html)
+        return Markup(html)
+
+
+def get_fragment_cache(app):
+    return app.extensions.get("fragment_cache")
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    size = app.config.get("FRAGMENT_CACHE_SIZE", 5000)
+    if size <= 0:
+        return
+    shared = None
+    path = app.config.get("FRAGMENT_CACHE_DB")
+    if path:
+        try:
+            shared = SharedStore(path, app.config.get("FRAGMENT_CACHE_DB_ROWS", 50000))
+        except (OSError, sqlite3.Error) as e:
+            app.logger.warning("Shared fragment cache %s unavailable: %s", path, e)
+    cache = FragmentCache(size, shared)
+    app.extensions["fragment_cache"] = cache
+    app.jinja_env.fragment_cache = cache
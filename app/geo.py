@@ -0,0 +1,311 @@
+"""Customer coordinates and nearby-job lookups.
+
+Customers get ``latitude``/``longitude`` from a geocoder when their address
+is saved, plus a geohash.  The default geocoder is offline: it looks the
+normalized address up in the ``geocode_entry`` table, which is filled with
+``flask import-geocodes``.  ``GEOCODER = "package.module:callable"`` plugs in
+anything else that maps an address to ``(lat, lon)`` or ``None``.
+
+Radius queries use an in-process grid whose cells are the 5-character
+geohash cells (about 4.9 km square), keyed by integer row and column: the
+cells covering the query's bounding box give the candidates, and an exact
+haversine check keeps those inside the radius (a box wider than the number
+of populated cells walks the populated cells instead).  Like
+the typeahead index it is built lazily per app, kept current from session
+events and rebuilt in the background every ``GEO_INDEX_TTL`` seconds.
+"""
+import importlib
+import math
+import threading
+import time
+from datetime import date
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+
+from .extensions import db
+from .models import Customer, GeocodeEntry, Job
+from .search import normalize
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+CELL_PRECISION = 5
+# Cell size in degrees at CELL_PRECISION (13 longitude bits, 12 latitude bits)
+CELL_LAT = 180.0 / 2 ** 12
+CELL_LON = 360.0 / 2 ** 13
+_PENDING = "geo_index_pending"
+_QUERY_CHUNK = 500
+
+
+def geohash(lat, lon, precision=9):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        span, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (span[0] + span[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            span[0] = mid
+        else:
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, km):
+    """``(min_lat, max_lat, min_lon, max_lon)`` enclosing a ``km`` circle."""
+    dlat = math.degrees(km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, math.degrees(km / (EARTH_RADIUS_KM * cos_lat)))
+    return max(-90.0, lat - dlat), min(90.0, lat + dlat), max(-180.0, lon - dlon), min(180.0, lon + dlon)
+
+
+def address_key(address):
+    return " ".join(normalize(address))
+
+
+def table_geocoder(address):
+    """Offline lookup in ``geocode_entry`` by normalized address."""
+    key = address_key(address)
+    if not key:
+        return None
+    row = db.session.execute(
+        select(GeocodeEntry.latitude, GeocodeEntry.longitude).where(GeocodeEntry.address_key == key)
+    ).first()
+    return (row.latitude, row.longitude) if row else None
+
+
+def load_geocoder(spec):
+    if not spec or spec == "table":
+        return table_geocoder
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def set_location(customer, coords):
+    lat, lon = coords if coords else (None, None)
+    customer.latitude, customer.longitude = lat, lon
+    customer.geohash = geohash(lat, lon) if coords else None
+
+
+class GeoIndex:
+    """Customer points bucketed by geohash cell."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cells = {}
+        self._points = {}
+        self.built_at = None
+        self.refreshing = False
+
+    def _add(self, customer_id, lat, lon):
+        cell = _cell(lat, lon)
+        self._cells.setdefault(cell, []).append((customer_id, lat, lon))
+        self._points[customer_id] = cell
+
+    def _remove(self, customer_id):
+        cell = self._points.pop(customer_id, None)
+        if cell is not None:
+            self._cells[cell] = [p for p in self._cells[cell] if p[0] != customer_id]
+
+    def build(self, rows):
+        cells, points = {}, {}
+        for customer_id, lat, lon in rows:
+            cell = _cell(lat, lon)
+            cells.setdefault(cell, []).append((customer_id, lat, lon))
+            points[customer_id] = cell
+        with self._lock:
+            self._cells, self._points = cells, points
+            self.built_at = time.monotonic()
+
+    def upsert(self, customer_id, lat, lon):
+        with self._lock:
+            self._remove(customer_id)
+            if lat is not None and lon is not None:
+                self._add(customer_id, lat, lon)
+
+    def remove(self, customer_id):
+        with self._lock:
+            self._remove(customer_id)
+
+    def expire(self):
+        """Keep serving, but rebuild in the background on next use."""
+        if self.built_at is not None:
+            self.built_at = float("-inf")
+
+    @property
+    def stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    def within(self, lat, lon, km):
+        """``[(customer_id, distance_km)]`` inside ``km`` of the point, nearest first."""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, km)
+        (row_lo, col_lo), (row_hi, col_hi) = _cell(min_lat, min_lon), _cell(max_lat, max_lon)
+        # Haversine with the query point's terms hoisted out of the loop
+        phi, cos_phi = math.radians(lat), math.cos(math.radians(lat))
+        limit = math.sin(min(km / (2 * EARTH_RADIUS_KM), math.pi / 2)) ** 2
+        radians, sin, cos = math.radians, math.sin, math.cos
+        found = []
+        cells = self._cells
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(cells):
+            # A wide box has more cells than are populated; walk those instead
+            buckets = [points for (row, col), points in list(cells.items())
+                       if row_lo <= row <= row_hi and col_lo <= col <= col_hi]
+        else:
+            buckets = [cells.get((row, col), ()) for row in range(row_lo, row_hi + 1)
+                       for col in range(col_lo, col_hi + 1)]
+        for points in buckets:
+            for customer_id, plat, plon in points:
+                if min_lat <= plat <= max_lat and min_lon <= plon <= max_lon:
+                    pphi = radians(plat)
+                    a = sin((pphi - phi) / 2) ** 2 + cos_phi * cos(pphi) * sin(radians(plon - lon) / 2) ** 2
+                    if a <= limit:
+                        found.append((customer_id, 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))))
+        found.sort(key=lambda item: item[1])
+        return found
+
+
+def _cell(lat, lon):
+    # Same cells as geohash(lat, lon, CELL_PRECISION), as integer row/column
+    return (
+        min(int((lat + 90.0) // CELL_LAT), 2 ** 12 - 1),
+        min(int((lon + 180.0) // CELL_LON), 2 ** 13 - 1),
+    )
+
+
+def _rows():
+    return db.session.execute(
+        select(Customer.id, Customer.latitude, Customer.longitude)
+        .where(Customer.latitude.is_not(None), Customer.longitude.is_not(None))
+    ).all()
+
+
+def _load(app, index):
+    with app.app_context():
+        try:
+            index.build(_rows())
+        finally:
+            index.refreshing = False
+
+
+def get_geo_index(app=None):
+    """This app's geo index; built inline the first time, then in the background."""
+    app = app or current_app._get_current_object()
+    index = app.extensions.get("geo_index")
+    if index is None:
+        index = app.extensions["geo_index"] = GeoIndex(ttl=app.config["GEO_INDEX_TTL"])
+    if index.built_at is None:
+        index.build(_rows())
+    elif index.stale and not index.refreshing:
+        index.refreshing = True
+        threading.Thread(target=_load, args=(app, index), daemon=True).start()
+    return index
+
+
+def nearby_jobs(customer, km, start=None, end=None):
+    """Jobs of customers within ``km`` of ``customer``, nearest first.
+
+    ``start``/``end`` bound ``scheduled_date`` inclusively.  Returns dicts
+    ready for JSON.
+    """
+    if customer.latitude is None or customer.longitude is None:
+        return []
+    distances = dict(get_geo_index().within(customer.latitude, customer.longitude, km))
+    ids = list(distances)
+    jobs = []
+    for offset in range(0, len(ids), _QUERY_CHUNK):
+        query = (
+            select(Job.id, Job.title, Job.status, Job.scheduled_date, Job.customer_id, Customer.name, Customer.address)
+            .join(Customer, Customer.id == Job.customer_id)
+            .where(Job.customer_id.in_(ids[offset:offset + _QUERY_CHUNK]))
+        )
+        if start:
+            query = query.where(Job.scheduled_date >= start)
+        if end:
+            query = query.where(Job.scheduled_date <= end)
+        jobs.extend(db.session.execute(query))
+    jobs.sort(key=lambda row: (distances[row.customer_id], row.scheduled_date or date.max, row.id))
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "status": row.status,
+            "scheduled_date": row.scheduled_date.isoformat() if row.scheduled_date else None,
+            "customer_id": row.customer_id,
+            "customer_name": row.name,
+            "address": row.address,
+            "distance_km": round(distances[row.customer_id], 3),
+        }
+        for row in jobs
+    ]
+
+
+def forget_customer(customer_id, session=None):
+    """Queue a geo index removal for a customer deleted with a Core DELETE."""
+    session = session or db.session
+    session.info.setdefault(_PENDING, {})[customer_id] = (None, None)
+
+
+def _geocode(session, flush_context, instances):
+    geocoder = None
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Customer):
+            continue
+        state = inspect(obj)
+        if state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes():
+            # Coordinates set explicitly win over the geocoder
+            given = obj.latitude is not None and obj.longitude is not None
+            set_location(obj, (obj.latitude, obj.longitude) if given else None)
+            continue
+        if not state.attrs.address.history.has_changes():
+            continue
+        if geocoder is None:
+            geocoder = load_geocoder(current_app.config.get("GEOCODER")) if has_app_context() else table_geocoder
+        with session.no_autoflush:
+            set_location(obj, geocoder(obj.address))
+
+
+def _collect(session, flush_context):
+    pending = session.info.setdefault(_PENDING, {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Customer):
+            pending[obj.id] = (obj.latitude, obj.longitude)
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            pending[obj.id] = (None, None)
+
+
+def _apply(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get("geo_index")
+    if index is None:
+        return
+    for customer_id, (lat, lon) in pending.items():
+        index.upsert(customer_id, lat, lon)
+
+
+def _discard(session):
+    session.info.pop(_PENDING, None)
+
+
+def init_app(app):
+    if not event.contains(db.session, "before_flush", _geocode):
+        event.listen(db.session, "before_flush", _geocode)
+        event.listen(db.session, "after_flush", _collect)
+        event.listen(db.session, "after_commit", _apply)
+        event.listen(db.session, "after_rollback", _discard)
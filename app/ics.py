@@ -0,0 +1,255 @@
+"""Per-month job snapshots behind ``/calendar`` and the ``/calendar.ics`` feed.
+
+A snapshot holds one month's scheduled jobs as plain ``CalendarEntry``
+rows with their ``VEVENT`` text already rendered, plus an ETag over that
+text.  Snapshots are built on first use (all missing months of a request
+in one query, always read from the primary: ``/calendar`` is
+``@read_only``, and a lagging replica's rows would otherwise be cached for
+the feed and for read-your-writes clients too).  They are dropped when a
+job in that month is added, moved, changed or deleted - session events see
+the old and new ``scheduled_date`` - or when a customer's name or address
+changes.  They also expire after ``CALENDAR_SNAPSHOT_TTL`` seconds, since writes made by
+another worker are not seen here.
+
+The feed ETag is derived from the month ETags and the filters, so a phone
+polling with ``If-None-Match`` gets a 304 from a few dictionary lookups.
+"""
+import calendar
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+
+from .extensions import db
+from .models import Customer, Job
+
+PRODID = "-//Gutter Tracker//Jobs//EN"
+UID_DOMAIN = "gutter-tracker"
+_PENDING = "calendar_months_pending"
+# The months ``datetime.date`` can represent
+FIRST_MONTH, LAST_MONTH = (1, 1), (9999, 12)
+# Job status -> iCalendar STATUS
+_STATUS = {"cancelled": "CANCELLED", "scheduled": "CONFIRMED", "in_progress": "CONFIRMED", "completed": "CONFIRMED"}
+
+CalendarEntry = namedtuple(
+    "CalendarEntry", "id title status scheduled_date customer_id customer_name address vevent"
+)
+
+
+def month_of(day):
+    return (day.year, day.month)
+
+
+def add_months(month, count):
+    year, number = month
+    index = year * 12 + number - 1 + count
+    return (index // 12, index % 12 + 1)
+
+
+def month_range(first, last):
+    """Every ``(year, month)`` from ``first`` to ``last`` inclusive."""
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def escape(text):
+    return (
+        (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """Split a content line at 75 octets as RFC 5545 requires."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # Never cut inside a UTF-8 sequence
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode("utf-8"))
+        encoded = encoded[size:]
+    return "\r\n ".join(parts)
+
+
+def _stamp(moment):
+    return (moment or datetime(1970, 1, 1)).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(row):
+    summary = f"{row.title} - {row.customer_name}" if row.customer_name else row.title
+    description = f"Status: {(row.status or 'scheduled').replace('_', ' ')}"
+    if row.description_preview:
+        description += "\n" + row.description_preview
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:job-{row.id}@{UID_DOMAIN}",
+        f"DTSTAMP:{_stamp(row.updated_at)}",
+        f"LAST-MODIFIED:{_stamp(row.updated_at)}",
+        f"DTSTART;VALUE=DATE:{row.scheduled_date:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{row.scheduled_date + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{escape(summary)}",
+        f"STATUS:{_STATUS.get(row.status, 'CONFIRMED')}",
+        f"DESCRIPTION:{escape(description)}",
+    ]
+    if row.address:
+        lines.append(f"LOCATION:{escape(row.address)}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) + "\r\n" for line in lines)
+
+
+class MonthSnapshot:
+    def __init__(self, entries):
+        self.entries = entries
+        self.etag = hashlib.sha1("".join(entry.vevent for entry in entries).encode("utf-8")).hexdigest()
+        self.built_at = time.monotonic()
+
+
+class MonthCache:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._months = {}
+        self.builds = 0
+
+    def get(self, months):
+        """``{month: MonthSnapshot}`` for the requested months, building missing ones."""
+        now = time.monotonic()
+        with self._lock:
+            found = {m: s for m in months if (s := self._months.get(m)) is not None and now - s.built_at <= self.ttl}
+        missing = [m for m in months if m not in found]
+        if missing:
+            built = self._build(missing)
+            with self._lock:
+                self._months.update(built)
+            found.update(built)
+        return found
+
+    def _build(self, months):
+        start = date(*months[0], 1)
+        # The last day, not the next month's first: December 9999 has no next month
+        end = date(*months[-1], calendar.monthrange(*months[-1])[1])
+        rows = db.session.execute(
+            select(
+                Job.id, Job.title, Job.status, Job.scheduled_date, Job.customer_id, Job.updated_at,
+                Job.description_preview, Customer.name.label("customer_name"), Customer.address,
+            )
+            .join(Customer, Customer.id == Job.customer_id)
+            .where(Job.scheduled_date >= start, Job.scheduled_date <= end)
+            .order_by(Job.scheduled_date, Job.id),
+            bind_arguments={"bind": db.engine},
+        ).all()
+        by_month = {month: [] for month in months}
+        for row in rows:
+            entries = by_month.get(month_of(row.scheduled_date))
+            if entries is not None:
+                entries.append(CalendarEntry(
+                    row.id, row.title, row.status, row.scheduled_date, row.customer_id,
+                    row.customer_name, row.address, render_event(row),
+                ))
+        self.builds += len(months)
+        return {month: MonthSnapshot(entries) for month, entries in by_month.items()}
+
+    def expire(self, months=None):
+        """Drop the given months' snapshots (all of them when ``months`` is None)."""
+        with self._lock:
+            if months is None:
+                self._months.clear()
+            else:
+                for month in months:
+                    self._months.pop(month, None)
+
+
+def get_month_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get("calendar_months")
+    if cache is None:
+        cache = app.extensions["calendar_months"] = MonthCache(app.config.get("CALENDAR_SNAPSHOT_TTL", 300))
+    return cache
+
+
+def feed_etag(snapshots, filters):
+    digest = hashlib.sha1(repr(filters).encode("utf-8"))
+    for month in sorted(snapshots):
+        digest.update(snapshots[month].etag.encode("ascii"))
+    return digest.hexdigest()
+
+
+def select_entries(snapshots, statuses=None, customer_id=None):
+    for month in sorted(snapshots):
+        for entry in snapshots[month].entries:
+            if statuses and entry.status not in statuses:
+                continue
+            if customer_id is not None and entry.customer_id != customer_id:
+                continue
+            yield entry
+
+
+def render_feed(entries, name):
+    head = [
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape(name)}",
+    ]
+    body = "".join(fold(line) + "\r\n" for line in head)
+    return body + "".join(entry.vevent for entry in entries) + "END:VCALENDAR\r\n"
+
+
+def expire_months(app=None):
+    """Drop every snapshot; for bulk Core writes the session hooks cannot see."""
+    cache = (app or current_app).extensions.get("calendar_months")
+    if cache is not None:
+        cache.expire()
+
+
+def forget_customer(customer_id, session=None):
+    """Queue a full expiry for a customer deleted with a Core DELETE (its jobs go too)."""
+    (session or db.session).info[_PENDING] = None
+
+
+def _collect(session, flush_context):
+    if _PENDING in session.info and session.info[_PENDING] is None:
+        return
+    pending = session.info.setdefault(_PENDING, set())
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Job):
+            history = inspect(obj).attrs.scheduled_date.history
+            for day in (obj.scheduled_date, *history.deleted):
+                if day is not None:
+                    pending.add(month_of(day))
+        elif isinstance(obj, Customer) and obj not in session.new:
+            state = inspect(obj)
+            if obj in session.deleted or state.attrs.name.history.has_changes() or state.attrs.address.history.has_changes():
+                session.info[_PENDING] = None
+                return
+
+
+def _apply(session):
+    if _PENDING not in session.info:
+        return
+    months = session.info.pop(_PENDING)
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get("calendar_months")
+    if cache is not None and (months is None or months):
+        cache.expire(months)
+
+
+def _discard(session):
+    session.info.pop(_PENDING, None)
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_flush", _collect):
+        event.listen(db.session, "after_flush", _collect)
+        event.listen(db.session, "after_commit", _apply)
+        event.listen(db.session, "after_rollback", _discard)
@@ -0,0 +1,171 @@
+"""Job materials ledger.
+
+Every change to a job's material lines goes through here so that the owner's
+inventory and ``Job.total_cost`` move in the same transaction as the lines
+themselves.  Callers commit (or roll back on ``LedgerError``).
+"""
+import math
+
+from sqlalchemy import delete, func, select, update
+
+from . import stock
+from .extensions import db
+from .models import InventoryItem, Job, JobMaterial, Material
+
+
+class LedgerError(ValueError):
+    """Raised when a ledger change cannot be applied as requested."""
+
+
+class InsufficientStock(LedgerError):
+    """Raised when the owner's inventory cannot cover a withdrawal."""
+
+
+def _line_total_sum():
+    # Correlated against the job row being updated
+    return (
+        select(func.coalesce(func.sum(JobMaterial.total_cost), 0.0))
+        .where(JobMaterial.job_id == Job.id)
+        .scalar_subquery()
+    )
+
+
+def sync_job_total(job_id):
+    """Recompute one job's total from its lines with a single UPDATE."""
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(total_cost=_line_total_sum())
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def reconcile_job_totals(tolerance=0.005):
+    """Fix every drifted job total in one set-wise UPDATE.
+
+    Only jobs that have ledger lines are considered, so totals entered by
+    hand on jobs without materials are left alone.  Returns the row count.
+    """
+    line_sum = _line_total_sum()
+    result = db.session.execute(
+        update(Job)
+        .where(select(JobMaterial.id).where(JobMaterial.job_id == Job.id).exists())
+        .where(db.or_(Job.total_cost.is_(None), func.abs(Job.total_cost - line_sum) > tolerance))
+        .values(total_cost=line_sum)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.expire_all()
+    return result.rowcount
+
+
+def _take_stock(owner_id, name, quantity):
+    """Take ``quantity`` of ``name`` from the owner's inventory (negative returns it).
+
+    Materials the owner does not stock are not tracked.  ``adjust_stock``'s
+    guarded UPDATE never lets a concurrent withdrawal drive the count below zero.
+    """
+    if owner_id is None or not name or not quantity:
+        return
+    item_id = db.session.execute(
+        select(InventoryItem.id)
+        .where(InventoryItem.owner_id == owner_id, func.lower(InventoryItem.name) == name.lower())
+        .order_by(InventoryItem.id)
+        .limit(1)
+    ).scalar()
+    if item_id is None:
+        return
+    try:
+        stock.adjust_stock(item_id, -quantity)
+    except stock.StockShortage:
+        raise InsufficientStock(f"Insufficient stock of {name}")
+
+
+def _parse_quantity(value):
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        raise LedgerError(f"Invalid quantity: {value!r}")
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise LedgerError("Quantity must be greater than zero")
+    return quantity
+
+
+def _parse_lines(lines, key):
+    if not lines:
+        raise LedgerError("No materials given")
+    parsed = []
+    for line in lines:
+        try:
+            line_id = int(line[key])
+        except (KeyError, TypeError, ValueError):
+            raise LedgerError(f"Each line needs a numeric {key}")
+        parsed.append((line_id, _parse_quantity(line.get("quantity"))))
+    return parsed
+
+
+def add_job_materials(job, lines):
+    """Add lines of ``{"material_id", "quantity"}`` to a job, priced from ``Material``."""
+    wanted = _parse_lines(lines, "material_id")
+    catalog = {m.id: m for m in Material.query.filter(Material.id.in_({mid for mid, _ in wanted}))}
+    added = []
+    for material_id, quantity in wanted:
+        material = catalog.get(material_id)
+        if material is None:
+            raise LedgerError(f"Material {material_id} not found")
+        unit_cost = material.unit_cost or 0.0
+        added.append(JobMaterial(
+            job_id=job.id,
+            material_id=material.id,
+            name=material.name,
+            quantity=quantity,
+            unit_cost=unit_cost,
+            total_cost=quantity * unit_cost,
+        ))
+        _take_stock(job.customer_id, material.name, quantity)
+    db.session.add_all(added)
+    db.session.flush()
+    sync_job_total(job.id)
+    return added
+
+
+def update_job_materials(job, changes):
+    """Change quantities of existing lines given as ``{"id", "quantity"}``."""
+    wanted = dict(_parse_lines(changes, "id"))
+    rows = JobMaterial.query.filter(JobMaterial.job_id == job.id, JobMaterial.id.in_(wanted)).all()
+    if len(rows) != len(wanted):
+        missing = sorted(set(wanted) - {row.id for row in rows})
+        raise LedgerError(f"Job material lines not found: {missing}")
+    for row in rows:
+        quantity = wanted[row.id]
+        _take_stock(job.customer_id, row.name, quantity - (row.quantity or 0))
+        row.quantity = quantity
+        row.total_cost = quantity * (row.unit_cost or 0.0)
+    db.session.flush()
+    sync_job_total(job.id)
+    return rows
+
+
+def remove_job_materials(job, ids):
+    """Delete lines by id and return their quantities to the owner's stock."""
+    try:
+        ids = {int(i) for i in ids or []}
+    except (TypeError, ValueError):
+        raise LedgerError("Material line ids must be numeric")
+    if not ids:
+        raise LedgerError("No materials given")
+    rows = db.session.execute(
+        select(JobMaterial.id, JobMaterial.name, JobMaterial.quantity)
+        .where(JobMaterial.job_id == job.id, JobMaterial.id.in_(ids))
+    ).all()
+    if len(rows) != len(ids):
+        missing = sorted(ids - {row.id for row in rows})
+        raise LedgerError(f"Job material lines not found: {missing}")
+    for row in rows:
+        _take_stock(job.customer_id, row.name, -(row.quantity or 0))
+    db.session.execute(
+        delete(JobMaterial)
+        .where(JobMaterial.job_id == job.id, JobMaterial.id.in_(ids))
+        .execution_options(synchronize_session="fetch")
+    )
+    sync_job_total(job.id)
+    return len(rows)
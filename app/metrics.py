@@ -0,0 +1,44 @@
+"""In-process counters and value summaries.
+
+Cheap enough to call on every request; numbers are per worker process and
+reset on restart.  ``snapshot()`` backs the /admin/metrics endpoint.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_values = {}
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name, value):
+    """Record one sample of ``name`` (count, total, min, max are kept)."""
+    with _lock:
+        stats = _values.get(name)
+        if stats is None:
+            _values[name] = [1, value, value, value]
+        else:
+            stats[0] += 1
+            stats[1] += value
+            stats[2] = min(stats[2], value)
+            stats[3] = max(stats[3], value)
+
+
+def snapshot():
+    with _lock:
+        values = {
+            name: {"count": count, "total": total, "mean": total / count, "min": low, "max": high}
+            for name, (count, total, low, high) in _values.items()
+        }
+        return {"counters": dict(_counters), "values": values}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _values.clear()
@@ -1,6 +1,13 @@
 from datetime import datetime
+from .compression import CompressedText
 from .extensions import db
 
+# Long text (and photo bytes) are deferred so that lists and counts only read
+# the short columns.  Detail views undefer the groups they render; lists use
+# the ``*_preview`` column properties, which the database truncates, so the
+# previewed columns are the ones not stored as ``CompressedText``.
+PREVIEW_CHARS = 240
+
 
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -8,25 +15,52 @@ class Customer(db.Model):
     address = db.Column(db.String(500))
     phone = db.Column(db.String(50))
     email = db.Column(db.String(200))
-    notes = db.Column(db.Text)
+    notes = db.deferred(db.Column(db.Text), group="text")
+    notes_preview = db.column_property(db.func.substr(notes, 1, PREVIEW_CHARS), deferred=True)
     created = db.Column(db.DateTime, default=datetime.utcnow)
-    jobs = db.relationship("Job", backref="customer", lazy=True, cascade="all, delete-orphan")
-    inventory_items = db.relationship("InventoryItem", backref="owner", lazy=True, cascade="all, delete-orphan")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Filled from the geocoder when the address is saved (see app/geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)
+    # Children are removed by ON DELETE CASCADE, so deleting a customer never
+    # loads its history
+    jobs = db.relationship("Job", backref="customer", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    inventory_items = db.relationship("InventoryItem", backref="owner", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Job(db.Model):
+    # Never reuse an id: archived jobs keep theirs
+    __table_args__ = (
+        db.Index("ix_job_customer_date", "customer_id", "scheduled_date"),
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id", ondelete="CASCADE"), nullable=False)
     title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
+    description = db.deferred(db.Column(db.Text), group="text")
     scheduled_date = db.Column(db.Date)
     status = db.Column(db.String(50), default="scheduled")
     total_cost = db.Column(db.Float, default=0.0)
-    ai_estimate = db.Column(db.Text)
-    notes = db.Column(db.Text)
+    ai_estimate = db.deferred(db.Column(CompressedText), group="text")
+    # Set when ai_estimate was copied from a near-identical earlier job
+    estimate_reused_from = db.Column(db.Integer)
+    notes = db.deferred(db.Column(CompressedText), group="text")
+    description_preview = db.column_property(db.func.substr(description, 1, PREVIEW_CHARS), deferred=True)
     created = db.Column(db.DateTime, default=datetime.utcnow)
-    materials_used = db.relationship("JobMaterial", backref="job", lazy=True, cascade="all, delete-orphan")
-    photos = db.relationship("JobPhoto", backref="job", lazy=True, cascade="all, delete-orphan")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    materials_used = db.relationship("JobMaterial", backref="job", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    photos = db.relationship("JobPhoto", backref="job", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+
+
+class GeocodeEntry(db.Model):
+    """Offline geocoding table: normalized address to coordinates."""
+
+    address_key = db.Column(db.String(500), primary_key=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(100))
 
 
 class Material(db.Model):
@@ -36,6 +70,7 @@ class Material(db.Model):
     unit_cost = db.Column(db.Float)
     supplier = db.Column(db.String(200))
     notes = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 
 class InventoryItem(db.Model):
@@ -48,21 +83,28 @@ class InventoryItem(db.Model):
     low_stock_alert = db.Column(db.Float, default=0)
     notes = db.Column(db.Text)
     created = db.Column(db.DateTime, default=datetime.utcnow)
-    owner_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), nullable=True)
+    # Optimistic lock for full edits; see app.stock
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
 
 class InventoryAudit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    item_id = db.Column(db.Integer, db.ForeignKey('inventory_item.id'))
+    item_id = db.Column(db.Integer, db.ForeignKey('inventory_item.id', ondelete='SET NULL'))
     action = db.Column(db.String(50))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     owner_id = db.Column(db.Integer)
 
 
 class JobMaterial(db.Model):
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey("job.id"), nullable=False)
-    material_id = db.Column(db.Integer, db.ForeignKey("material.id"))
+    job_id = db.Column(db.Integer, db.ForeignKey("job.id", ondelete="CASCADE"), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey("material.id", ondelete="SET NULL"))
     name = db.Column(db.String(200))
     quantity = db.Column(db.Float)
     unit_cost = db.Column(db.Float)
@@ -70,9 +112,93 @@ class JobMaterial(db.Model):
 
 
 class JobPhoto(db.Model):
+    __table_args__ = (db.Index("ix_job_photo_job_phash", "job_id", "phash"), {"sqlite_autoincrement": True})
+
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey("job.id"), nullable=False)
-    photo_data = db.Column(db.Text)
+    job_id = db.Column(db.Integer, db.ForeignKey("job.id", ondelete="CASCADE"), nullable=False)
+    photo_data = db.deferred(db.Column(CompressedText), group="image")
     caption = db.Column(db.String(500))
-    ai_analysis = db.Column(db.Text)
+    ai_analysis = db.deferred(db.Column(CompressedText), group="text")
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Perceptual hash ("<kind>:<hex>") and, for near-duplicate uploads, the
+    # photo on the same job whose bytes this row reuses
+    phash = db.Column(db.String(20))
+    source_photo_id = db.Column(db.Integer, db.ForeignKey("job_photo.id", ondelete="CASCADE"))
+    source_photo = db.relationship("JobPhoto", remote_side=[id])
+
+    @property
+    def data(self):
+        if self.photo_data is None and self.source_photo is not None:
+            return self.source_photo.photo_data
+        return self.photo_data
+
+
+# Archive tier: completed jobs past ARCHIVE_AFTER_DAYS are moved here (see
+# app/archive.py) so the hot tables only hold recent and open work.  Rows
+# keep their original ids, which the hot tables never hand out again.
+class ArchivedJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id", ondelete="CASCADE"), nullable=False, index=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.deferred(db.Column(db.Text), group="text")
+    scheduled_date = db.Column(db.Date, index=True)
+    status = db.Column(db.String(50))
+    total_cost = db.Column(db.Float, default=0.0)
+    ai_estimate = db.deferred(db.Column(CompressedText), group="text")
+    estimate_reused_from = db.Column(db.Integer)
+    notes = db.deferred(db.Column(CompressedText), group="text")
+    created = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    customer = db.relationship("Customer")
+    materials_used = db.relationship("ArchivedJobMaterial", lazy=True, passive_deletes=True, order_by="ArchivedJobMaterial.id")
+    photos = db.relationship("ArchivedJobPhoto", backref="job", lazy=True, passive_deletes=True, order_by="ArchivedJobPhoto.id")
+
+
+class ArchivedJobMaterial(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    job_id = db.Column(db.Integer, db.ForeignKey("archived_job.id", ondelete="CASCADE"), nullable=False, index=True)
+    material_id = db.Column(db.Integer)
+    name = db.Column(db.String(200))
+    quantity = db.Column(db.Float)
+    unit_cost = db.Column(db.Float)
+    total_cost = db.Column(db.Float)
+
+
+class ArchivedJobPhoto(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    job_id = db.Column(db.Integer, db.ForeignKey("archived_job.id", ondelete="CASCADE"), nullable=False, index=True)
+    photo_data = db.deferred(db.Column(CompressedText), group="image")
+    caption = db.Column(db.String(500))
+    ai_analysis = db.deferred(db.Column(CompressedText), group="text")
+    timestamp = db.Column(db.DateTime)
+    phash = db.Column(db.String(20))
+    source_photo_id = db.Column(db.Integer)
+
+    @property
+    def data(self):
+        if self.photo_data is None and self.source_photo_id is not None:
+            # Duplicates only ever point at a photo on the same job
+            for photo in self.job.photos:
+                if photo.id == self.source_photo_id:
+                    return photo.photo_data
+        return self.photo_data
+
+
+class JobRollup(db.Model):
+    """Counts and revenue of archived jobs per scheduled month and status."""
+
+    month = db.Column(db.String(7), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    job_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class SyncTombstone(db.Model):
+    """One row per deleted synced record, written by database triggers."""
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, server_default=db.func.current_timestamp(), index=True)
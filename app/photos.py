@@ -0,0 +1,86 @@
+"""Photo deduplication by perceptual hash.
+
+Each uploaded photo gets a 64-bit difference hash (dHash).  A new upload is
+compared against the hashes of photos already attached to the same job, and
+one within ``PHOTO_DEDUP_THRESHOLD`` bits is treated as the same shot: the
+new row points at the stored original and reuses its ``ai_analysis``
+instead of storing the image again and paying for another Gemini call.
+
+Pillow is optional.  Without it, or for images it cannot decode, photos are
+hashed by exact content and only byte-identical uploads are deduplicated.
+"""
+import base64
+import hashlib
+import io
+
+from sqlalchemy import select
+
+from .extensions import db
+from .models import JobPhoto
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - depends on the deployment
+    Image = None
+
+PERCEPTUAL = "d"
+EXACT = "s"
+
+
+def decode_photo(photo_base64):
+    """Return raw image bytes from a base64 string or ``data:`` URL."""
+    if "," in photo_base64:
+        photo_base64 = photo_base64.split(",", 1)[1]
+    return base64.b64decode(photo_base64)
+
+
+def _dhash(image_bytes, size=8):
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:016x}"
+
+
+def photo_hash(photo_base64):
+    """Hash a photo as ``"<kind>:<16 hex digits>"``, or None if it won't decode."""
+    try:
+        image_bytes = decode_photo(photo_base64)
+    except (ValueError, TypeError):
+        return None
+    if Image is not None:
+        try:
+            return f"{PERCEPTUAL}:{_dhash(image_bytes)}"
+        except Exception:
+            pass
+    return f"{EXACT}:{hashlib.sha256(image_bytes).hexdigest()[:16]}"
+
+
+def hamming_distance(a, b):
+    """Bit distance between two hashes, or None when their kinds differ."""
+    kind_a, bits_a = a.split(":", 1)
+    kind_b, bits_b = b.split(":", 1)
+    if kind_a != kind_b:
+        return None
+    return bin(int(bits_a, 16) ^ int(bits_b, 16)).count("1")
+
+
+def find_duplicate(job_id, phash, threshold):
+    """Return the stored photo on this job closest to ``phash``, if close enough."""
+    if not phash:
+        return None
+    if phash.startswith(f"{EXACT}:"):
+        threshold = 0
+    best_id, best_distance = None, None
+    rows = db.session.execute(
+        select(JobPhoto.id, JobPhoto.phash)
+        .where(JobPhoto.job_id == job_id, JobPhoto.phash.isnot(None), JobPhoto.source_photo_id.is_(None))
+    )
+    for photo_id, other in rows:
+        distance = hamming_distance(phash, other)
+        if distance is not None and distance <= threshold and (best_distance is None or distance < best_distance):
+            best_id, best_distance = photo_id, distance
+    return db.session.get(JobPhoto, best_id) if best_id is not None else None
@@ -0,0 +1,232 @@
+"""Deterministic gutter pricing from the ``Material`` catalog.
+
+``quote(inputs)`` turns structured measurements - linear feet, stories,
+downspouts, gutter type and the fittings the quick-estimate page asks for -
+into itemized quantities with the same workflow rules as that page (one
+hanger every two feet, two elbows and one outlet per downspout, 10 ft
+downspout sections per story).  Each part is priced from the catalog
+``Material`` whose normalized name matches one of the part's names in
+``PARTS``, falling back to the page's default price.  Labor is charged per
+foot, scaled by gutter type and stories, plus a fixed amount per downspout;
+markup and the low/high spread come from config.
+
+The catalog prices are read once into a ``PriceBook`` that is cached per app
+and dropped whenever a ``Material`` change commits (or after
+``PRICE_BOOK_TTL`` seconds, for changes made by other workers), so a quote is
+pure arithmetic.  Pass the same book to ``quote`` for bulk runs
+(``flask price-jobs``).
+"""
+import math
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from .extensions import db
+from .models import Material
+from .search import normalize
+
+# Part -> (default unit cost, unit, catalog names as normalized words)
+PARTS = {
+    "gutter_k5": (1.25, "ft", ("5 k style gutter", "5 inch k style gutter", "k5 gutter", "gutter coil", "gutter")),
+    "gutter_k6": (1.75, "ft", ("6 k style gutter", "6 inch k style gutter", "k6 gutter")),
+    "gutter_half_round": (3.00, "ft", ("half round gutter", "6 inch half round gutter")),
+    "downspout": (4.50, "10 ft section", ("downspout", "downspout 10 ft", "10 ft downspout")),
+    "elbow": (4.00, "each", ("elbow", "downspout elbow")),
+    "outlet": (3.50, "each", ("outlet", "drop outlet", "outlet drop")),
+    "hanger": (0.75, "each", ("hanger", "hidden hanger", "gutter hanger")),
+    "inside_corner": (3.00, "each", ("inside corner", "inside miter")),
+    "outside_corner": (3.00, "each", ("outside corner", "outside miter")),
+    "end_cap": (1.50, "each", ("end cap",)),
+    "splash_block": (8.00, "each", ("splash block",)),
+    "gutter_guard": (3.50, "ft", ("gutter guard", "leaf guard")),
+}
+# Gutter type -> (gutter part, labor multiplier)
+GUTTER_TYPES = {"k5": ("gutter_k5", 1.0), "k6": ("gutter_k6", 1.1), "half_round": ("gutter_half_round", 1.4)}
+HANGERS_PER_FOOT = 0.5
+ELBOWS_PER_DOWNSPOUT = 2
+DOWNSPOUT_FEET_PER_STORY = 10
+DOWNSPOUT_SECTION_FEET = 10
+MAX_STORIES = 4
+_COUNTS = ("downspouts", "inside_corners", "outside_corners", "end_caps", "extra_elbows")
+INPUT_FIELDS = ("linear_feet", "stories", "gutter_type", "guards", "splash_blocks") + _COUNTS
+
+
+def _flag(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def parse_inputs(data):
+    """Validated quote inputs from a request or CSV/NDJSON record; raises ``ValueError``."""
+    try:
+        linear_feet = float(data.get("linear_feet") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("linear_feet must be a number")
+    if not 0 < linear_feet < 100000:
+        raise ValueError("linear_feet must be greater than 0")
+    inputs = {"linear_feet": linear_feet}
+    for name in ("stories",) + _COUNTS:
+        value = data.get(name)
+        try:
+            number = float(value if value not in (None, "") else (1 if name == "stories" else 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a whole number")
+        if not math.isfinite(number) or not number.is_integer():
+            raise ValueError(f"{name} must be a whole number")
+        if number < 0:
+            raise ValueError(f"{name} cannot be negative")
+        inputs[name] = int(number)
+    if not 1 <= inputs["stories"] <= MAX_STORIES:
+        raise ValueError(f"stories must be between 1 and {MAX_STORIES}")
+    gutter_type = (data.get("gutter_type") or "k5").strip().lower().replace("-", "_")
+    if gutter_type not in GUTTER_TYPES:
+        raise ValueError(f"gutter_type must be one of {', '.join(GUTTER_TYPES)}")
+    inputs["gutter_type"] = gutter_type
+    inputs["guards"] = _flag(data.get("guards"), False)
+    inputs["splash_blocks"] = _flag(data.get("splash_blocks"), True)
+    return inputs
+
+
+class PriceBook:
+    """Unit costs for every part plus the labor, markup and spread settings."""
+
+    def __init__(self, unit_costs, sources, labor_per_foot=6.0, labor_per_downspout=15.0,
+                 story_labor_factor=0.25, markup_percent=30.0, range_percent=10.0):
+        self.unit_costs = unit_costs
+        self.sources = sources
+        self.labor_per_foot = labor_per_foot
+        self.labor_per_downspout = labor_per_downspout
+        self.story_labor_factor = story_labor_factor
+        self.markup = markup_percent / 100
+        self.spread = range_percent / 100
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_catalog(cls, materials, **settings):
+        """Build from ``(name, unit_cost)`` rows; later rows win a name clash."""
+        by_name = {" ".join(normalize(name)): cost for name, cost in materials if cost is not None}
+        unit_costs, sources = {}, {}
+        for part, (default, _, names) in PARTS.items():
+            match = next((name for name in names if name in by_name), None)
+            unit_costs[part] = by_name[match] if match else default
+            sources[part] = "catalog" if match else "default"
+        return cls(unit_costs, sources, **settings)
+
+    def quote(self, inputs):
+        """Itemized low/high quote for inputs from ``parse_inputs``."""
+        feet, downspouts = inputs["linear_feet"], inputs["downspouts"]
+        gutter, labor_factor = GUTTER_TYPES[inputs["gutter_type"]]
+        quantities = [
+            (gutter, feet),
+            ("hanger", math.ceil(feet * HANGERS_PER_FOOT)),
+            ("downspout", math.ceil(downspouts * inputs["stories"] * DOWNSPOUT_FEET_PER_STORY / DOWNSPOUT_SECTION_FEET)),
+            ("elbow", downspouts * ELBOWS_PER_DOWNSPOUT + inputs["extra_elbows"]),
+            ("outlet", downspouts),
+            ("inside_corner", inputs["inside_corners"]),
+            ("outside_corner", inputs["outside_corners"]),
+            ("end_cap", inputs["end_caps"]),
+            ("splash_block", downspouts if inputs["splash_blocks"] else 0),
+            ("gutter_guard", feet if inputs["guards"] else 0),
+        ]
+        lines, materials = [], 0.0
+        for part, quantity in quantities:
+            if not quantity:
+                continue
+            cost = quantity * self.unit_costs[part]
+            materials += cost
+            lines.append({
+                "item": part, "quantity": quantity, "unit": PARTS[part][1],
+                "unit_cost": self.unit_costs[part], "cost": round(cost, 2), "source": self.sources[part],
+            })
+        stories = 1 + self.story_labor_factor * (inputs["stories"] - 1)
+        labor = feet * self.labor_per_foot * labor_factor * stories + downspouts * self.labor_per_downspout
+        markup = (materials + labor) * self.markup
+        total = materials + labor + markup
+        return {
+            "inputs": inputs,
+            "lines": lines,
+            "materials": round(materials, 2),
+            "labor": round(labor, 2),
+            "markup": round(markup, 2),
+            "total": round(total, 2),
+            "low": round(total * (1 - self.spread), 2),
+            "high": round(total * (1 + self.spread), 2),
+        }
+
+
+def summary(quote):
+    """Plain-text rendering of a quote, for chat and reports."""
+    inputs = quote["inputs"]
+    rows = [f"Estimate: {inputs['linear_feet']:g} ft {inputs['gutter_type']} gutter, "
+            f"{inputs['downspouts']} downspout(s), {inputs['stories']} stor{'y' if inputs['stories'] == 1 else 'ies'}"]
+    for line in quote["lines"]:
+        rows.append(f"  {line['item'].replace('_', ' ')}: {line['quantity']:g} {line['unit']} x "
+                    f"${line['unit_cost']:.2f} = ${line['cost']:.2f}")
+    rows.append(f"Materials ${quote['materials']:.2f}, labor ${quote['labor']:.2f}, markup ${quote['markup']:.2f}")
+    rows.append(f"Total ${quote['total']:.2f} (range ${quote['low']:.2f} - ${quote['high']:.2f})")
+    return "\n".join(rows)
+
+
+def _settings(config):
+    return {
+        "labor_per_foot": config["PRICING_LABOR_PER_FOOT"],
+        "labor_per_downspout": config["PRICING_LABOR_PER_DOWNSPOUT"],
+        "story_labor_factor": config["PRICING_STORY_LABOR_FACTOR"],
+        "markup_percent": config["PRICING_MARKUP_PERCENT"],
+        "range_percent": config["PRICING_RANGE_PERCENT"],
+    }
+
+
+def get_price_book(app=None):
+    """This app's price book, read from the catalog on first use after a change.
+
+    It is also re-read after ``PRICE_BOOK_TTL`` seconds, since catalog changes
+    committed by other workers never reach this process's session hooks.
+    """
+    app = app or current_app._get_current_object()
+    book = app.extensions.get("price_book")
+    if book is None or time.monotonic() - book.built_at > app.config.get("PRICE_BOOK_TTL", 300):
+        rows = db.session.execute(select(Material.name, Material.unit_cost).order_by(Material.id)).all()
+        book = app.extensions["price_book"] = PriceBook.from_catalog(rows, **_settings(app.config))
+    return book
+
+
+def expire_price_book(app=None):
+    (app or current_app).extensions.pop("price_book", None)
+
+
+def quote_records(records, book):
+    """Yield ``(row_number, quote_or_error)`` for ``(row_number, record)`` pairs."""
+    for number, record in records:
+        if isinstance(record, Exception):
+            yield number, record
+            continue
+        try:
+            yield number, book.quote(parse_inputs(record))
+        except ValueError as e:
+            yield number, e
+
+
+def _collect(session, flush_context):
+    if any(isinstance(obj, Material) for obj in session.new | session.dirty | session.deleted):
+        session.info["price_book_stale"] = True
+
+
+def _apply(session):
+    if session.info.pop("price_book_stale", False) and has_app_context():
+        expire_price_book()
+
+
+def _discard(session):
+    session.info.pop("price_book_stale", None)
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_flush", _collect):
+        event.listen(db.session, "after_flush", _collect)
+        event.listen(db.session, "after_commit", _apply)
+        event.listen(db.session, "after_rollback", _discard)
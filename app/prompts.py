@@ -0,0 +1,71 @@
+"""Prompt assembly with bounded size.
+
+Prompt size drives both latency and cost, so anything that can grow with
+the data (job lists) is summarized into compact lines and cut off at a
+token budget.  Token counts are estimated (~4 characters per token), which
+is close enough for budgeting and reporting without a tokenizer call.
+"""
+from collections import defaultdict
+
+CHAT_SYSTEM_PROMPT = """You are the assistant inside Gutter Tracker, an app for gutter installation and cleaning companies.
+Features: jobs (status scheduled/in progress/completed, filter by status, monthly calendar), customers (name, address, phone, email, notes), inventory per owner (name, quantity, unit, unit_cost, location, low_stock_alert, notes), materials catalog, AI estimates from descriptions or photos, photo analysis of gutter condition, schedule suggestions, reports (jobs, revenue, completion, customers).
+Chat commands: inventory-add, inventory-update, inventory-adjust, inventory-delete, inventory-scan (key=value pairs).
+Answer questions about using these features or about gutter work; be brief."""
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about four characters per token)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _area(address):
+    # "123 Main St, Seattle, WA 98101" -> "Seattle"
+    parts = [part.strip() for part in (address or "").split(",") if part.strip()]
+    if len(parts) >= 2:
+        return parts[1]
+    return parts[0] if parts else "unknown"
+
+
+def _job_date(job):
+    value = job.get("scheduled_date") or job.get("date")
+    return str(value)[:10] if value else "unscheduled"
+
+
+def compact_jobs(jobs, budget_tokens):
+    """Summarize jobs as one line per (date, area), within ``budget_tokens``.
+
+    ``jobs`` are dicts with any of ``scheduled_date``/``date``, ``address``,
+    ``title`` and ``status``.  Lines are emitted in date order; whatever does
+    not fit is reported as a single "omitted" line.
+    """
+    groups = defaultdict(list)
+    for job in jobs:
+        groups[(_job_date(job), _area(job.get("address")))].append(job)
+
+    lines, used = [], 0
+    keys = sorted(groups)
+    for index, (day, area) in enumerate(keys):
+        group = groups[(day, area)]
+        titles = "; ".join((job.get("title") or "job")[:30] for job in group[:3])
+        if len(group) > 3:
+            titles += f"; +{len(group) - 3}"
+        line = f"{day} {area}: {len(group)} ({titles})"
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget_tokens:
+            rest = keys[index:]
+            lines.append(f"(+{sum(len(groups[k]) for k in rest)} more jobs on {len(rest)} date/area groups omitted)")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def schedule_prompt(jobs_data, new_job_address, budget_tokens):
+    return (
+        "Upcoming jobs (date area: count (titles)):\n"
+        f"{compact_jobs(jobs_data, budget_tokens) or 'none'}\n\n"
+        f"New job location: {new_job_address}\n\n"
+        "Suggest the best date for the new job, considering route grouping with nearby jobs, "
+        "workload per day, weather and efficiency.\n"
+        "Respond with just a date in YYYY-MM-DD format and brief reason."
+    )
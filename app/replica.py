@@ -0,0 +1,104 @@
+"""Read-replica routing.
+
+Routes wrapped in ``@read_only`` send their SELECTs to a second engine
+on ``DATABASE_REPLICA_URL``; everything else, and every write, uses the
+primary.  A client that committed a write in the last
+``READ_YOUR_WRITES_SECONDS`` keeps reading from the primary so it never
+sees its own change missing.  If the replica cannot be reached the route
+is retried on the primary and the replica is skipped for
+``REPLICA_RETRY_SECONDS``.
+"""
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DatabaseError
+
+_RW_KEY = "_rw_until"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and has_app_context()
+            and g.get("use_replica")
+            and not self._flushing
+            and (clause is None or getattr(clause, "is_select", False))
+        ):
+            engine = current_app.extensions.get("replica_engine")
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_state():
+    return current_app.extensions.setdefault("replica_state", {"down_until": 0.0})
+
+
+def _mark_down(error):
+    state = _replica_state()
+    state["down_until"] = time.monotonic() + current_app.config["REPLICA_RETRY_SECONDS"]
+    current_app.logger.warning("Read replica unavailable, using primary: %s", error)
+
+
+def replica_available():
+    if current_app.extensions.get("replica_engine") is None:
+        return False
+    if time.monotonic() < _replica_state()["down_until"]:
+        return False
+    return time.time() >= http_session.get(_RW_KEY, 0)
+
+
+def read_only(view):
+    """Serve this view's reads from the replica when it is usable."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # /api/batch pins its sub-requests to the primary's one session
+        if g.get("pin_primary") or not replica_available():
+            return view(*args, **kwargs)
+        g.use_replica = True
+        try:
+            return view(*args, **kwargs)
+        except DatabaseError as e:
+            from .extensions import db
+            _mark_down(e)
+            db.session.rollback()
+            g.use_replica = False
+            return view(*args, **kwargs)
+        finally:
+            g.use_replica = False
+    return wrapper
+
+
+def _note_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+def _note_statement(orm_execute_state):
+    # Core-style UPDATE/DELETE through the session never flushes
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info["wrote"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("wrote", False) and has_request_context():
+        http_session[_RW_KEY] = time.time() + current_app.config["READ_YOUR_WRITES_SECONDS"]
+
+
+def _after_rollback(session):
+    session.info.pop("wrote", None)
+
+
+def init_app(app):
+    url = app.config.get("SQLALCHEMY_REPLICA_URI")
+    app.extensions["replica_engine"] = create_engine(url) if url else None
+    from .extensions import db
+    if not event.contains(db.session, "after_flush", _note_write):
+        event.listen(db.session, "after_flush", _note_write)
+        event.listen(db.session, "do_orm_execute", _note_statement)
+        event.listen(db.session, "after_commit", _after_commit)
+        event.listen(db.session, "after_rollback", _after_rollback)
+
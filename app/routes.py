@@ -8,14 +8,34 @@ from flask import (
     session,
     current_app,
     Response,
+    abort,
+    stream_with_context,
 )
 from functools import wraps
 from datetime import datetime, date
 import base64
+import hmac
+import math
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import joinedload, selectinload, undefer, undefer_group
 
 from .extensions import db
-from .models import Customer, Job, Material, InventoryItem, JobMaterial, JobPhoto
-from .ai import get_ai_estimate, analyze_photo, suggest_schedule, gemini_model
+from . import metrics
+from .models import Customer, Job, Material, InventoryItem, JobMaterial, JobPhoto, ArchivedJob
+from .archive import archived_stats
+from .sync import SyncTokenError, changes_since
+from .photos import photo_hash, find_duplicate
+from . import archive, batch, bulk, estimates, faq, geo, ics, pricing, search
+from .search import get_index
+from .replica import read_only
+from .uow import release
+from .warmup import warm_up
+from .fragments import get_fragment_cache
+from .slowlog import get_slow_query_log
+from .stock import StockError, EditConflict, StockShortage, adjust_stock, edit_item, parse_delta
+from .ledger import LedgerError, InsufficientStock, add_job_materials, update_job_materials, remove_job_materials
+from .ai import get_ai_estimate, get_estimate_narrative, analyze_photo, analyze_photos, suggest_schedule, chat_reply, help_answer, scan_inventory_photo
 
 # Main blueprint
 main = Blueprint("main", __name__)
@@ -60,28 +80,63 @@ def logout():
 @main.route("/home")
 @login_required
 def home():
-    customers = Customer.query.all()
     current_id = request.args.get("customer_id", type=int)
-    if current_id:
-        session["current_owner_id"] = current_id
-    inventories = InventoryItem.query.filter_by(owner_id=current_id).all() if current_id else []
-    return render_template("index.html", customers=customers, current_id=current_id, inventories=inventories)
+    current = db.session.get(Customer, current_id) if current_id else None
+    if current:
+        session["current_owner_id"] = current.id
+    inventories = InventoryItem.query.filter_by(owner_id=current.id).all() if current else []
+    return render_template("index.html", current=current, inventories=inventories)
 
 # Dashboard
 @main.route("/dashboard")
 @login_required
+@read_only
 def dashboard():
-    total_jobs = Job.query.count()
-    completed_jobs = Job.query.filter_by(status="completed").count()
-    scheduled_jobs = Job.query.filter_by(status="scheduled").count()
-    total_revenue = (db.session.query(db.func.sum(Job.total_cost)).filter_by(status="completed").scalar() or 0)
+    stats = _job_stats()
     return render_template(
         "dashboard.html",
-        total_jobs=total_jobs,
-        completed_jobs=completed_jobs,
-        scheduled_jobs=scheduled_jobs,
-        total_revenue=total_revenue,
+        total_jobs=stats["total_jobs"],
+        completed_jobs=stats["completed_jobs"],
+        scheduled_jobs=stats["scheduled_jobs"],
+        total_revenue=stats["total_revenue"],
+    )
+
+
+def _job_stats():
+    """Job counts and completed revenue, hot jobs plus the archive rollups."""
+    rows = db.session.query(Job.status, db.func.count(Job.id), db.func.sum(Job.total_cost)).group_by(Job.status).all()
+    by_status = archived_stats()
+    for status, count, revenue in rows:
+        archived_count, archived_revenue = by_status.get(status, (0, 0.0))
+        by_status[status] = (count + archived_count, (revenue or 0) + archived_revenue)
+    return {
+        "total_jobs": sum(count for count, _ in by_status.values()),
+        "completed_jobs": by_status.get("completed", (0, 0))[0],
+        "scheduled_jobs": by_status.get("scheduled", (0, 0))[0],
+        "total_revenue": by_status.get("completed", (0, 0))[1] or 0,
+    }
+
+@main.route("/api/dashboard/stats")
+@login_required
+@read_only
+def api_dashboard_stats():
+    return jsonify(_job_stats())
+
+
+@main.route("/api/batch", methods=["POST"])
+@login_required
+def api_batch():
+    data = request.get_json(silent=True)
+    try:
+        items = batch.parse(data, current_app.config["BATCH_MAX_REQUESTS"])
+    except batch.BatchError as e:
+        return jsonify({"error": str(e)}), 400
+    headers = {"Cookie": request.headers.get("Cookie", "")}
+    results = batch.run(
+        items, headers, request.host_url, parallel=bool(data.get("parallel")),
+        workers=current_app.config["BATCH_AI_WORKERS"],
     )
+    return jsonify({"responses": results})
 
 # Customers
 @main.route("/customers")
@@ -95,11 +150,106 @@ def customers():
                 Customer.address.ilike(f"%{search_query}%"),
                 Customer.phone.ilike(f"%{search_query}%"),
             )
-        ).all()
+        )
     else:
-        customers = Customer.query.order_by(Customer.created.desc()).all()
+        customers = Customer.query.order_by(Customer.created.desc())
+    customers = customers.options(undefer(Customer.notes_preview)).all()
     return render_template("customers.html", customers=customers, search_query=search_query)
 
+@main.route("/api/customers")
+@login_required
+@read_only
+def api_customers():
+    limit = min(request.args.get("limit", 100, type=int), 500)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    rows = db.session.execute(
+        db.select(Customer.id, Customer.name, Customer.address, Customer.phone, Customer.email)
+        .order_by(Customer.name, Customer.id).limit(limit).offset(offset)
+    ).all()
+    return jsonify({"customers": [row._asdict() for row in rows], "limit": limit, "offset": offset})
+
+@main.route("/api/customers/suggest")
+@login_required
+def api_customer_suggest():
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    return jsonify({"results": get_index().search(query, limit)})
+
+@main.route("/api/customers/<int:customer_id>/nearby_jobs")
+@login_required
+def api_nearby_jobs(customer_id):
+    customer = Customer.query.get_or_404(customer_id)
+    if customer.latitude is None or customer.longitude is None:
+        return jsonify({"error": "Customer address has not been geocoded"}), 422
+    try:
+        km = float(request.args.get("km", 10))
+        start = date.fromisoformat(request.args["start"]) if request.args.get("start") else None
+        end = date.fromisoformat(request.args["end"]) if request.args.get("end") else None
+    except ValueError:
+        return jsonify({"error": "km must be a number and start/end YYYY-MM-DD"}), 400
+    if not math.isfinite(km) or km <= 0:
+        return jsonify({"error": "km must be greater than zero"}), 400
+    max_km = current_app.config["NEARBY_MAX_KM"]
+    if km > max_km:
+        return jsonify({"error": f"km must be at most {max_km:g}"}), 400
+    return jsonify({
+        "customer_id": customer.id,
+        "km": km,
+        "jobs": geo.nearby_jobs(customer, km, start, end),
+    })
+
+@main.route("/api/sync")
+@login_required
+def api_sync():
+    config = current_app.config
+    limit = max(1, min(request.args.get("limit", config["SYNC_PAGE_SIZE"], type=int), 2000))
+    try:
+        page = changes_since(
+            request.args.get("since"),
+            limit,
+            settle_seconds=config["SYNC_SETTLE_SECONDS"],
+            tombstone_days=config["SYNC_TOMBSTONE_DAYS"],
+        )
+    except SyncTokenError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+@main.route("/api/import/<entity>", methods=["POST"])
+@login_required
+def api_import(entity):
+    if entity not in bulk.ENTITIES:
+        abort(404)
+    fmt = request.args.get("format") or ("csv" if "csv" in (request.content_type or "") else "ndjson")
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(bulk.FORMATS)}"}), 400
+    try:
+        report = bulk.import_rows(
+            entity,
+            bulk.read_records(request.stream, fmt),
+            chunk_size=current_app.config["BULK_IMPORT_CHUNK_ROWS"],
+            dry_run=request.args.get("dry_run") in ("1", "true"),
+        )
+    except bulk.ImportFormatError as e:
+        db.session.rollback()
+        # Earlier chunks may already be committed; say how far the import got
+        return jsonify({"error": str(e), "report": e.report}), 400
+    return jsonify(report)
+
+@main.route("/api/export/<entity>")
+@login_required
+def api_export(entity):
+    if entity not in bulk.ENTITIES:
+        abort(404)
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(bulk.FORMATS)}"}), 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(bulk.export_rows(entity, fmt)),
+        mimetype=mimetype,
+        headers={"Content-disposition": f"attachment; filename={entity}.{fmt}"},
+    )
+
 @main.route("/customers/add", methods=["POST"])
 @login_required
 def add_customer():
@@ -131,8 +281,16 @@ def edit_customer(customer_id):
 @main.route("/customers/delete/<int:customer_id>")
 @login_required
 def delete_customer(customer_id):
-    customer = Customer.query.get_or_404(customer_id)
-    db.session.delete(customer)
+    # One DELETE; the database cascades to jobs, photos, lines and inventory,
+    # and to archived jobs, whose rolled-up totals go first
+    archive.forget_customer(customer_id)
+    result = db.session.execute(delete(Customer).where(Customer.id == customer_id))
+    if result.rowcount == 0:
+        db.session.rollback()
+        abort(404)
+    search.forget_customer(customer_id)
+    geo.forget_customer(customer_id)
+    ics.forget_customer(customer_id)
     db.session.commit()
     return redirect(url_for("main.customers"))
 
@@ -155,14 +313,45 @@ def jobs():
     if date_filter:
         query = query.filter_by(scheduled_date=date_filter)
 
-    jobs = query.order_by(Job.scheduled_date.desc()).all()
-    customers = Customer.query.all()
-    return render_template("jobs.html", jobs=jobs, customers=customers, status_filter=status_filter)
+    jobs = (
+        query.options(undefer(Job.description_preview), joinedload(Job.customer))
+        .order_by(Job.scheduled_date.desc())
+        .all()
+    )
+    return render_template("jobs.html", jobs=jobs, status_filter=status_filter)
+
+@main.route("/api/jobs")
+@login_required
+@read_only
+def api_jobs():
+    query = Job.query.options(joinedload(Job.customer))
+    day = request.args.get("date")
+    if day:
+        try:
+            day = date.today() if day == "today" else date.fromisoformat(day)
+        except ValueError:
+            return jsonify({"error": "date must be YYYY-MM-DD or today"}), 400
+        query = query.filter(Job.scheduled_date == day)
+    if request.args.get("status"):
+        query = query.filter(Job.status == request.args["status"])
+    limit = min(request.args.get("limit", 100, type=int), 500)
+    jobs = query.order_by(Job.scheduled_date.desc(), Job.id).limit(limit).all()
+    return jsonify({"jobs": [{
+        "id": job.id, "title": job.title, "status": job.status, "total_cost": job.total_cost,
+        "scheduled_date": job.scheduled_date.isoformat() if job.scheduled_date else None,
+        "customer_id": job.customer_id, "customer_name": job.customer.name, "address": job.customer.address,
+    } for job in jobs]})
 
 @main.route("/jobs/add", methods=["POST"])
 @login_required
 def add_job():
-    customer_id = int(request.form["customer_id"])
+    customer_id = request.form.get("customer_id", type=int)
+    if customer_id is None:
+        abort(400, description="customer_id must be a customer id")
+    # Foreign keys are enforced; an unknown customer is a 404, not an IntegrityError
+    owner = db.session.execute(db.select(Customer.address).where(Customer.id == customer_id)).first()
+    if owner is None:
+        abort(404, description=f"Customer {customer_id} does not exist")
     job = Job(
         customer_id=customer_id,
         title=request.form["title"],
@@ -171,8 +360,12 @@ def add_job():
         status="scheduled",
     )
     if request.form.get("use_ai_estimate") == "on":
-        owner = Customer.query.get(customer_id)
-        job.ai_estimate = get_ai_estimate(job.description, owner.address) if owner else None
+        reuse = estimates.find_reusable(job.description)
+        if reuse:
+            job.ai_estimate, job.estimate_reused_from = reuse["estimate"], reuse["job_id"]
+        else:
+            release()
+            job.ai_estimate = get_ai_estimate(job.description, owner.address)
     db.session.add(job)
     db.session.commit()
     return redirect(url_for("main.jobs"))
@@ -180,7 +373,16 @@ def add_job():
 @main.route("/jobs/<int:job_id>")
 @login_required
 def view_job(job_id):
-    job = Job.query.get_or_404(job_id)
+    job = Job.query.options(
+        undefer_group("text"),
+        selectinload(Job.photos).undefer_group("text").undefer_group("image"),
+    ).filter_by(id=job_id).first()
+    if job is None:
+        archived = ArchivedJob.query.options(
+            undefer_group("text"),
+            selectinload(ArchivedJob.photos).undefer_group("text").undefer_group("image"),
+        ).filter_by(id=job_id).first_or_404()
+        return render_template("view_job.html", job=archived, customer=archived.customer, materials=[], archived=True)
     customer = job.customer
     materials = Material.query.all()
     return render_template("view_job.html", job=job, customer=customer, materials=materials)
@@ -193,19 +395,104 @@ def update_job_status(job_id):
     db.session.commit()
     return redirect(url_for("main.view_job", job_id=job_id))
 
+@main.route("/jobs/<int:job_id>/add_material", methods=["POST"])
+@login_required
+def add_material_to_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    try:
+        add_job_materials(job, [{"material_id": request.form.get("material_id"), "quantity": request.form.get("quantity")}])
+        db.session.commit()
+    except LedgerError as e:
+        db.session.rollback()
+        abort(409 if isinstance(e, InsufficientStock) else 400, description=str(e))
+    return redirect(url_for("main.view_job", job_id=job_id))
+
+def _material_line(line):
+    return {
+        "id": line.id,
+        "material_id": line.material_id,
+        "name": line.name,
+        "quantity": line.quantity,
+        "unit_cost": line.unit_cost,
+        "total_cost": line.total_cost,
+    }
+
+@main.route("/api/jobs/<int:job_id>/materials", methods=["GET", "POST", "PATCH", "DELETE"])
+@login_required
+def api_job_materials(job_id):
+    job = Job.query.get_or_404(job_id)
+    data = request.get_json(silent=True) or {}
+    status = 200
+    try:
+        if request.method == "POST":
+            add_job_materials(job, data.get("materials"))
+            status = 201
+        elif request.method == "PATCH":
+            update_job_materials(job, data.get("materials"))
+        elif request.method == "DELETE":
+            remove_job_materials(job, data.get("ids"))
+        db.session.commit()
+    except LedgerError as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 409 if isinstance(e, InsufficientStock) else 400
+    lines = JobMaterial.query.filter_by(job_id=job_id).order_by(JobMaterial.id).all()
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "total_cost": job.total_cost,
+        "materials": [_material_line(line) for line in lines],
+    }), status
+
 @main.route("/jobs/<int:job_id>/add_photo", methods=["POST"])
 @login_required
 def add_photo_to_job(job_id):
-    job = Job.query.get_or_404(job_id)
+    job_title = db.session.execute(db.select(Job.title).where(Job.id == job_id)).scalar()
+    if job_title is None:
+        abort(404)
     photo_data = request.form["photo_data"]
     caption = request.form.get("caption", "")
-    photo = JobPhoto(job_id=job_id, photo_data=photo_data, caption=caption)
-    if request.form.get("analyze_photo") == "on":
-        photo.ai_analysis = analyze_photo(photo_data, f"Job: {job.title}")
+    phash = photo_hash(photo_data)
+    photo = JobPhoto(job_id=job_id, caption=caption, phash=phash)
+    duplicate = find_duplicate(job_id, phash, current_app.config["PHOTO_DEDUP_THRESHOLD"])
+    if duplicate:
+        current_app.logger.info("Photo upload on job %s matches photo %s; reusing it", job_id, duplicate.id)
+        photo.source_photo_id = duplicate.id
+        photo.ai_analysis = duplicate.ai_analysis
+    else:
+        photo.photo_data = photo_data
+    if request.form.get("analyze_photo") == "on" and not photo.ai_analysis:
+        release()
+        photo.ai_analysis = analyze_photo(photo_data, f"Job: {job_title}")
     db.session.add(photo)
     db.session.commit()
     return redirect(url_for("main.view_job", job_id=job_id))
 
+@main.route("/jobs/<int:job_id>/analyze_photos", methods=["POST"])
+@login_required
+def analyze_job_photos(job_id):
+    job_title = db.session.execute(db.select(Job.title).where(Job.id == job_id)).scalar()
+    if job_title is None:
+        abort(404)
+    redo = request.form.get("reanalyze") == "on"
+    rows = db.session.execute(
+        db.select(JobPhoto.id, JobPhoto.photo_data, JobPhoto.ai_analysis)
+        .where(JobPhoto.job_id == job_id, JobPhoto.source_photo_id.is_(None))
+        .order_by(JobPhoto.id)
+    ).all()
+    pending = [(photo_id, data) for photo_id, data, analysis in rows if redo or not analysis]
+    if pending:
+        release()
+        analyses = analyze_photos([data for _, data in pending], f"Job: {job_title}")
+        by_source = {photo_id: analysis for (photo_id, _), analysis in zip(pending, analyses)}
+        db.session.execute(update(JobPhoto), [{"id": k, "ai_analysis": v} for k, v in by_source.items()])
+        # Duplicates share their original's analysis
+        for photo_id, analysis in by_source.items():
+            db.session.execute(
+                update(JobPhoto).where(JobPhoto.source_photo_id == photo_id).values(ai_analysis=analysis)
+            )
+        db.session.commit()
+    return redirect(url_for("main.view_job", job_id=job_id))
+
 # Inventory (full CRUD)
 @main.route("/inventory")
 @login_required
@@ -221,6 +508,18 @@ def inventory():
         inventory_items = query.all()
     return render_template("inventory.html", inventory=inventory_items, location_filter=location_filter)
 
+@main.route("/api/inventory/low-stock")
+@login_required
+@read_only
+def api_low_stock():
+    items = InventoryItem.query.filter(
+        InventoryItem.low_stock_alert > 0, InventoryItem.quantity <= InventoryItem.low_stock_alert
+    ).order_by(InventoryItem.name).all()
+    return jsonify({"items": [{
+        "id": item.id, "name": item.name, "quantity": item.quantity, "unit": item.unit,
+        "low_stock_alert": item.low_stock_alert, "location": item.location, "owner_id": item.owner_id,
+    } for item in items]})
+
 @main.route("/inventory/add", methods=["POST"])
 @login_required
 def add_inventory():
@@ -247,27 +546,55 @@ def add_inventory():
 def edit_inventory(item_id):
     item = InventoryItem.query.get_or_404(item_id)
     if request.method == "POST":
-        item.name = request.form["name"]
-        item.quantity = float(request.form["quantity"])
-        item.unit = request.form["unit"]
-        item.unit_cost = float(request.form["unit_cost"])
-        item.location = request.form["location"]
-        item.low_stock_alert = float(request.form.get("low_stock_alert", 0))
-        item.notes = request.form.get("notes", "")
-        item.owner_id = int(request.form["owner_id"]) if request.form.get("owner_id") else None
-        db.session.commit()
+        changes = {
+            "name": request.form["name"],
+            "quantity": float(request.form["quantity"]),
+            "unit": request.form["unit"],
+            "unit_cost": float(request.form["unit_cost"]),
+            "location": request.form["location"],
+            "low_stock_alert": float(request.form.get("low_stock_alert", 0)),
+            "notes": request.form.get("notes", ""),
+            "owner_id": int(request.form["owner_id"]) if request.form.get("owner_id") else None,
+        }
+        version = int(request.form["version"]) if request.form.get("version") else None
+        try:
+            edit_item(item_id, changes, expected_version=version)
+        except EditConflict as e:
+            db.session.rollback()
+            item = InventoryItem.query.get_or_404(item_id)
+            return render_template("edit_inventory.html", item=item, error=str(e)), 409
         return redirect(url_for("main.inventory"))
     return render_template("edit_inventory.html", item=item)
 
+@main.route("/api/inventory/<int:item_id>/adjust", methods=["POST"])
+@login_required
+def api_adjust_inventory(item_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        result = adjust_stock(item_id, parse_delta(data.get("delta")))
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 409 if isinstance(e, StockShortage) else 400
+    if result is None:
+        return jsonify({"success": False, "error": "Item not found"}), 404
+    db.session.commit()
+    quantity, version = result
+    return jsonify({"success": True, "id": item_id, "quantity": quantity, "version": version})
+
 @main.route("/inventory/delete/<int:item_id>")
 @login_required
 def delete_inventory(item_id):
-    item = InventoryItem.query.get_or_404(item_id)
-    db.session.delete(item)
+    result = db.session.execute(delete(InventoryItem).where(InventoryItem.id == item_id))
+    if result.rowcount == 0:
+        abort(404)
     db.session.commit()
     return redirect(url_for("main.inventory"))
 
 # Utilities and API
+
+# api_chat answers these itself (mostly inventory writes); anything else goes to the model
+CHAT_COMMAND_PREFIXES = ("inventory-add", "inventory-update", "inventory-adjust", "inventory-delete", "inventory-scan", "/", "!")
+
 @main.route("/api/chat", methods=["POST"])
 def api_chat():
     data = request.json or {}
@@ -304,30 +631,48 @@ def api_chat():
         kv = parse_kv(rest)
         if "id" not in kv:
             return jsonify({"response": "Missing id for update"})
-        item = InventoryItem.query.get(int(kv["id"]))
+        changes = {}
+        if "name" in kv: changes["name"] = kv["name"]
+        if "quantity" in kv: changes["quantity"] = float(kv["quantity"])
+        if "unit" in kv: changes["unit"] = kv["unit"]
+        if "unit_cost" in kv: changes["unit_cost"] = float(kv["unit_cost"])
+        if "location" in kv: changes["location"] = kv["location"]
+        if "notes" in kv: changes["notes"] = kv["notes"]
+        if "low_stock_alert" in kv: changes["low_stock_alert"] = float(kv["low_stock_alert"])
+        if "owner_id" in kv: changes["owner_id"] = int(kv["owner_id"]) if kv["owner_id"] else None
+        try:
+            item = edit_item(int(kv["id"]), changes, expected_version=int(kv["version"]) if kv.get("version") else None)
+        except EditConflict as e:
+            db.session.rollback()
+            return jsonify({"response": str(e)})
         if not item:
             return jsonify({"response": "Item not found"})
-        if "name" in kv: item.name = kv["name"]
-        if "quantity" in kv: item.quantity = float(kv["quantity"])
-        if "unit" in kv: item.unit = kv["unit"]
-        if "unit_cost" in kv: item.unit_cost = float(kv["unit_cost"])
-        if "location" in kv: item.location = kv["location"]
-        if "notes" in kv: item.notes = kv["notes"]
-        if "low_stock_alert" in kv: item.low_stock_alert = float(kv["low_stock_alert"])
-        if "owner_id" in kv: item.owner_id = int(kv["owner_id"]) if kv["owner_id"] else None
-        db.session.commit()
         return jsonify({"response": f"Updated item {item.id}"})
+    if lm.startswith("inventory-adjust"):
+        rest = message[len("inventory-adjust"):].strip()
+        kv = parse_kv(rest)
+        if "id" not in kv:
+            return jsonify({"response": "Missing id for adjust"})
+        try:
+            result = adjust_stock(int(kv["id"]), parse_delta(kv.get("delta")))
+        except StockError as e:
+            db.session.rollback()
+            return jsonify({"response": str(e)})
+        if result is None:
+            return jsonify({"response": "Item not found"})
+        db.session.commit()
+        return jsonify({"response": f"Item {kv['id']} now has {result[0]:g}"})
     if lm.startswith("inventory-delete"):
         rest = message[len("inventory-delete"):].strip()
         kv = parse_kv(rest)
         if "id" not in kv:
             return jsonify({"response": "Missing id for delete"})
-        item = InventoryItem.query.get(int(kv["id"]))
-        if not item:
+        item_id = int(kv["id"])
+        result = db.session.execute(delete(InventoryItem).where(InventoryItem.id == item_id))
+        if result.rowcount == 0:
             return jsonify({"response": "Item not found"})
-        db.session.delete(item)
         db.session.commit()
-        return jsonify({"response": f"Deleted item {item.id}"})
+        return jsonify({"response": f"Deleted item {item_id}"})
     if lm.startswith("inventory-scan"):
         rest = message[len("inventory-scan"):].strip()
         kv = parse_kv(rest)
@@ -340,35 +685,11 @@ def api_chat():
         return jsonify({"response": f"Created scanned inventory item {item.name} (id {item.id})"})
     if lm.startswith("/") or lm.startswith("!"):
         return jsonify({"response": "Unknown command. Try inventory- commands or /help"})
-    if hasattr(gemini_model, 'generate_content'):
-        try:
-            system_prompt = """You are a knowledgeable assistant for Gutter Tracker, a business management application for gutter installation and cleaning companies.
-
-ABOUT GUTTER TRACKER:
-- Job Management: Create, track, and manage gutter installation/cleaning jobs with status updates (scheduled, in progress, completed)
-- Customer Management: Store and manage customer information including names, addresses, phone numbers, emails, and notes
-- Inventory Management: Track materials and supplies used in jobs, with support for multiple owners/team members
-- Estimates & Pricing: Generate AI-powered cost estimates for jobs based on job descriptions and customer addresses
-- Photo Analysis: Analyze job site photos to identify gutter conditions, damage types, and indicate repairs
-- Scheduling: Suggest scheduling dates for jobs
-- Materials Database: Manage available materials for gutter work
-- Reports & Analytics: View job statistics, revenue, completion rates, and customer counts
-- Quick Estimates: Generate estimates from photos
-
-APP FEATURES:
-- User can ask about how to use any of these features
-- User can run inventory commands like "inventory-add", "inventory-update", "inventory-delete", "inventory-scan"
-- Inventory items have: name, quantity, unit, unit_cost, location, low_stock_alert, notes, and owner
-- Jobs can be filtered by status: scheduled, in progress, completed
-- Users can view monthly calendar of scheduled jobs
-"""
-
-            full_prompt = f"{system_prompt}\n\nUser Question: {message}"
-            resp = gemini_model.generate_content(full_prompt)
-            return jsonify({"response": resp.text})
-        except Exception:
-            pass
-    return jsonify({"response": f"You asked: {message}. I can help with inventory commands or app features. Try asking about job management, customers, scheduling, or gutter-related questions."})
+    local = faq.answer(message)
+    if local:
+        return jsonify({"response": local})
+    release()
+    return jsonify({"response": chat_reply(message)})
 
 
 @main.route("/api/ai/help", methods=["POST"])
@@ -378,9 +699,7 @@ def api_ai_help():
     if not question:
         return jsonify({"error": "Question required"}), 400
     try:
-        prompt = f"You are a helpful tech support assistant. Question: {question}"
-        response = gemini_model.generate_content(prompt)
-        return jsonify({"success": True, "answer": response.text})
+        return jsonify({"success": True, "answer": help_answer(question)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -390,11 +709,30 @@ def api_ai_estimate():
     data = request.json or {}
     description = data.get("description", "")
     address = data.get("address", "Unknown address")
+    if "linear_feet" in data:
+        # Measurements are priced by the rule engine; the model only narrates on request
+        try:
+            quote = pricing.get_price_book().quote(pricing.parse_inputs(data))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        result = {"success": True, "estimate": pricing.summary(quote), "quote": quote, "provider": "RuleEngine"}
+        if data.get("narrative"):
+            release()
+            result["narrative"] = get_estimate_narrative(result["estimate"], description)
+        return jsonify(result)
     if not description:
         return jsonify({"error": "Description required"}), 400
+    provider = current_app.config["AI_BACKEND"]
     try:
+        reuse = estimates.find_reusable(description)
+        if reuse:
+            return jsonify({
+                "success": True, "estimate": reuse["estimate"], "provider": provider, "reused": True,
+                "reused_from_job": reuse["job_id"], "similarity": reuse["similarity"],
+            })
+        release()
         estimate = get_ai_estimate(description, address)
-        return jsonify({"success": True, "estimate": estimate, "provider": "LocalFallback"})
+        return jsonify({"success": True, "estimate": estimate, "provider": provider, "reused": False})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -416,21 +754,39 @@ def api_scan_inventory():
     if not photo_data:
         return jsonify({"error": "Photo data required"}), 400
     try:
-        if "," in photo_data:
-            image_data = photo_data.split(",")[1]
-        else:
-            image_data = photo_data
-        image_bytes = base64.b64decode(image_data)
-        prompt = "Analyze inventory image"
-        if hasattr(gemini_model, "generate_content"):
-            analysis = gemini_model.generate_content([prompt, {"mime_type": "image/jpeg", "data": image_bytes}]).text
-        else:
-            analysis = "Inventory analysis placeholder"
+        analysis = scan_inventory_photo(photo_data)
         return jsonify({"success": True, "analysis": analysis, "provider": "LocalFallback"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@main.route("/admin/metrics")
+@login_required
+def admin_metrics():
+    data = metrics.snapshot()
+    cache = get_fragment_cache(current_app)
+    data["fragment_cache"] = cache.stats() if cache is not None else None
+    return jsonify(data)
+
+
+@main.route("/admin/slow-queries")
+@login_required
+def admin_slow_queries():
+    log = get_slow_query_log(current_app)
+    if log is None:
+        return jsonify({"error": "Slow-query logging is off (SLOW_QUERY_MS < 0)"}), 404
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    return jsonify({"threshold_ms": log.threshold_ms, "log": log.path, "queries": log.summary(limit)})
+
+
+@main.route("/_warmup")
+def warmup_instance():
+    # Open so a platform pinger can warm new instances; returns timings only
+    startup = current_app.extensions.get("startup", {})
+    timings = startup.get("warmup_ms") or warm_up(current_app._get_current_object())
+    return jsonify({"warm": True, "create_app_ms": startup.get("create_app_ms"), "warmup_ms": timings})
+
+
 # Quick Estimate
 @main.route("/quick-estimate")
 @login_required
@@ -456,25 +812,35 @@ def materials():
 # Reports
 @main.route("/reports")
 @login_required
+@read_only
 def reports():
-    total_jobs = Job.query.count()
-    completed_jobs = Job.query.filter_by(status="completed").count()
-    total_revenue = (db.session.query(db.func.sum(Job.total_cost)).filter_by(status="completed").scalar() or 0)
-    customers_count = Customer.query.count()
-    inventory_count = InventoryItem.query.count()
+    stats = _job_stats()
+    customers_count = db.session.query(db.func.count(Customer.id)).scalar()
+    inventory_count = db.session.query(db.func.count(InventoryItem.id)).scalar()
     return render_template("reports.html", 
-                         total_jobs=total_jobs,
-                         completed_jobs=completed_jobs,
-                         total_revenue=total_revenue,
+                         total_jobs=stats["total_jobs"],
+                         completed_jobs=stats["completed_jobs"],
+                         total_revenue=stats["total_revenue"],
                          customers_count=customers_count,
                          inventory_count=inventory_count)
 
 
 @main.route("/reports/download_today")
 @login_required
+@read_only
 def download_today_report():
-    today = date.today()
-    jobs_today = Job.query.filter(Job.scheduled_date == today).all()
+    try:
+        today = datetime.strptime(request.args["date"], "%Y-%m-%d").date() if request.args.get("date") else date.today()
+    except ValueError:
+        abort(400, description="date must be YYYY-MM-DD")
+    # Archived jobs stay in the export for past dates
+    jobs_today = [
+        job
+        for model in (ArchivedJob, Job)
+        for job in model.query.filter(model.scheduled_date == today).options(
+            undefer(model.description), undefer(model.notes), joinedload(model.customer), selectinload(model.materials_used),
+        ).order_by(model.id)
+    ]
 
     report_content = f"End of Shift Report - {today.strftime('%Y-%m-%d')}\n"
     report_content += "=" * 40 + "\n\n"
@@ -510,24 +876,18 @@ def download_today_report():
 # Calendar
 @main.route("/calendar")
 @login_required
+@read_only
 def calendar():
     import calendar as cal
     year = request.args.get('year', datetime.now().year, type=int)
     month = request.args.get('month', datetime.now().month, type=int)
-    start_date = datetime(year, month, 1).date()
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1).date()
-    else:
-        end_date = datetime(year, month + 1, 1).date()
-    jobs = Job.query.filter(
-        Job.scheduled_date >= start_date,
-        Job.scheduled_date < end_date
-    ).all()
+    if not (1 <= month <= 12 and ics.FIRST_MONTH <= (year, month) <= ics.LAST_MONTH):
+        abort(400, description="year must be 1-9999 and month 1-12")
+    snapshot = ics.get_month_cache().get([(year, month)])[(year, month)]
     jobs_by_date = {}
-    for job in jobs:
-        if job.scheduled_date:
-            date_key = job.scheduled_date.strftime('%Y-%m-%d')
-            jobs_by_date.setdefault(date_key, []).append(job)
+    for job in snapshot.entries:
+        date_key = job.scheduled_date.strftime('%Y-%m-%d')
+        jobs_by_date.setdefault(date_key, []).append(job)
     cal_obj = cal.monthcalendar(year, month)
     month_name = cal.month_name[month]
     prev_month = month - 1 if month > 1 else 12
@@ -545,3 +905,38 @@ def calendar():
                            next_month=next_month,
                            next_year=next_year,
                            today=datetime.now().date())
+
+
+def _feed_window():
+    today = ics.month_of(date.today())
+    if request.args.get("start"):
+        try:
+            start = ics.month_of(datetime.strptime(request.args["start"], "%Y-%m").date())
+        except ValueError:
+            abort(400, description="start must be YYYY-MM")
+    else:
+        start = ics.add_months(today, -current_app.config["CALENDAR_FEED_PAST_MONTHS"])
+    default = current_app.config["CALENDAR_FEED_PAST_MONTHS"] + current_app.config["CALENDAR_FEED_FUTURE_MONTHS"] + 1
+    count = min(max(request.args.get("months", default, type=int), 1), current_app.config["CALENDAR_FEED_MAX_MONTHS"])
+    return ics.month_range(start, min(ics.add_months(start, count - 1), ics.LAST_MONTH))
+
+
+@main.route("/calendar.ics")
+def calendar_feed():
+    # Phone calendars cannot log in; they subscribe with ?token=CALENDAR_FEED_TOKEN
+    token = current_app.config.get("CALENDAR_FEED_TOKEN")
+    if not session.get("logged_in") and not (token and hmac.compare_digest(request.args.get("token", ""), token)):
+        abort(403)
+    statuses = tuple(sorted(filter(None, request.args.get("status", "").split(","))))
+    customer_id = request.args.get("customer_id", type=int)
+    months = _feed_window()
+    snapshots = ics.get_month_cache().get(months)
+    etag = ics.feed_etag(snapshots, (statuses, customer_id))
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, max-age=300"}
+    if request.if_none_match.contains(etag):
+        metrics.incr("calendar_feed.not_modified")
+        return Response(status=304, headers=headers)
+    metrics.incr("calendar_feed.full")
+    name = "Gutter Tracker jobs" + (f" ({', '.join(statuses)})" if statuses else "")
+    body = ics.render_feed(ics.select_entries(snapshots, statuses, customer_id), name)
+    return Response(body, mimetype="text/calendar", headers=headers)
@@ -0,0 +1,141 @@
+"""Additive schema upgrades for databases created by older releases.
+
+``db.create_all()`` only creates missing tables.  Columns and indexes added
+to existing models later are applied here so deployed databases keep
+working without a migration tool.  Apart from foreign-key ``ON DELETE``
+rules and SQLite AUTOINCREMENT, which are brought in line with the models,
+only additive changes are handled.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateTable
+
+from .extensions import db
+
+
+def upgrade_schema(engine=None):
+    """Add any model columns and indexes missing from existing tables."""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    applied = []
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}")
+                applied.append(f"{table.name}.{column.name}")
+            indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(bind=conn)
+                    applied.append(index.name)
+    applied.extend(upgrade_foreign_keys(engine))
+    applied.extend(upgrade_sqlite_autoincrement(engine))
+    from .sync import upgrade as upgrade_sync
+    applied.extend(upgrade_sync(engine))
+    return applied
+
+
+def _ondelete_rules(table):
+    return {
+        tuple(fk.column_keys): (fk.ondelete or "").upper()
+        for fk in table.foreign_key_constraints
+    }
+
+
+def _stale_foreign_keys(inspector, table):
+    wanted = _ondelete_rules(table)
+    stale = []
+    for fk in inspector.get_foreign_keys(table.name):
+        key = tuple(fk["constrained_columns"])
+        if key in wanted and (fk["options"].get("ondelete") or "").upper() != wanted[key]:
+            stale.append(fk)
+    return stale
+
+
+def _rebuild_sqlite_table(conn, table, existing_columns):
+    # SQLite cannot alter a constraint; copy the rows into a table created
+    # from the model, then swap it in (foreign keys are off for the session)
+    preparer = conn.dialect.identifier_preparer
+    name = preparer.format_table(table)
+    temp = preparer.quote(f"_new_{table.name}")
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    conn.exec_driver_sql(ddl.replace(f"CREATE TABLE {name}", f"CREATE TABLE {temp}", 1))
+    columns = ", ".join(preparer.quote(col.name) for col in table.columns if col.name in existing_columns)
+    conn.exec_driver_sql(f"INSERT INTO {temp} ({columns}) SELECT {columns} FROM {name}")
+    conn.exec_driver_sql(f"DROP TABLE {name}")
+    conn.exec_driver_sql(f"ALTER TABLE {temp} RENAME TO {name}")
+    for index in table.indexes:
+        index.create(bind=conn)
+
+
+def _rebuild_sqlite_tables(engine, inspector, tables):
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            for table in tables:
+                existing = {col["name"] for col in inspector.get_columns(table.name)}
+                _rebuild_sqlite_table(conn, table, existing)
+            conn.commit()
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def upgrade_sqlite_autoincrement(engine=None):
+    """Rebuild SQLite tables created without the AUTOINCREMENT their model asks for.
+
+    Without it SQLite hands out ``max(id) + 1``, reusing the ids of deleted
+    (or archived) rows.
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "sqlite":
+        return []
+    inspector = inspect(engine)
+    with engine.connect() as conn:
+        stale = [
+            table for table in db.metadata.sorted_tables
+            if table.dialect_options["sqlite"]["autoincrement"]
+            and inspector.has_table(table.name)
+            and "AUTOINCREMENT" not in conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+            ).scalar().upper()
+        ]
+    if stale:
+        _rebuild_sqlite_tables(engine, inspector, stale)
+    return [f"{table.name} autoincrement" for table in stale]
+
+
+def upgrade_foreign_keys(engine=None):
+    """Recreate foreign keys whose ``ON DELETE`` rule differs from the model."""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    stale = {
+        table: _stale_foreign_keys(inspector, table)
+        for table in db.metadata.sorted_tables
+        if inspector.has_table(table.name)
+    }
+    stale = {table: fks for table, fks in stale.items() if fks}
+    if not stale:
+        return []
+    applied = [f"{table.name} foreign keys" for table in stale]
+    if engine.dialect.name == "sqlite":
+        _rebuild_sqlite_tables(engine, inspector, stale)
+        return applied
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table, fks in stale.items():
+            for fk in fks:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} DROP CONSTRAINT {preparer.quote(fk['name'])}"
+                )
+                constraint = next(
+                    c for c in table.foreign_key_constraints
+                    if tuple(c.column_keys) == tuple(fk["constrained_columns"])
+                )
+                conn.execute(AddConstraint(constraint))
+    return applied
@@ -0,0 +1,212 @@
+"""In-process prefix index for customer typeahead.
+
+Customers are indexed under normalized name words, address words and
+phone digits, one sorted ``(key, customer_id)`` array per field.  A query
+bisects to the range of keys with its most selective word as prefix and
+scans at most ``MAX_SCAN`` entries per field, names first, which stays
+well under a millisecond at 100k customers.
+
+The index is built lazily per app and kept current from session events:
+customer rows flushed in a transaction are re-indexed when it commits.
+Writes made by other worker processes are picked up by a background
+rebuild every ``CUSTOMER_INDEX_TTL`` seconds.
+"""
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from .extensions import db
+from .models import Customer
+
+# Fields in ranking order: name matches beat address and phone matches
+NAME, ADDRESS, PHONE = 0, 1, 2
+RANKS = (NAME, ADDRESS, PHONE)
+MAX_SCAN = 256
+_PENDING = "customer_index_pending"
+
+
+def normalize(text):
+    text = text or ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9 ]+", " ", text.lower()).split()
+
+
+def _keys(name, address, phone):
+    keys = {(word, NAME) for word in normalize(name)}
+    keys |= {(word, ADDRESS) for word in normalize(address)}
+    digits = re.sub(r"\D", "", phone or "")
+    if digits:
+        # Whole number, plus the local number and last four for partial entry
+        keys.update((tail, PHONE) for tail in {digits, digits[-10:], digits[-7:], digits[-4:]})
+    return keys
+
+
+class CustomerIndex:
+    """One sorted ``(key, customer_id)`` array per field, searched with bisect."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._arrays = {rank: [] for rank in RANKS}
+        self._entries = {}
+        self.built_at = None
+        self.refreshing = False
+
+    def _add(self, customer_id, name, address, phone):
+        keys = _keys(name, address, phone)
+        for key, rank in keys:
+            insort(self._arrays[rank], (key, customer_id))
+        self._entries[customer_id] = ({"id": customer_id, "name": name, "address": address, "phone": phone}, keys)
+
+    def _remove(self, customer_id):
+        entry = self._entries.pop(customer_id, None)
+        if entry is None:
+            return
+        for key, rank in entry[1]:
+            array = self._arrays[rank]
+            position = bisect_left(array, (key, customer_id))
+            if position < len(array) and array[position] == (key, customer_id):
+                del array[position]
+
+    def build(self, rows):
+        arrays = {rank: [] for rank in RANKS}
+        entries = {}
+        for row in rows:
+            keys = _keys(row.name, row.address, row.phone)
+            entries[row.id] = ({"id": row.id, "name": row.name, "address": row.address, "phone": row.phone}, keys)
+            for key, rank in keys:
+                arrays[rank].append((key, row.id))
+        for array in arrays.values():
+            array.sort()
+        with self._lock:
+            self._arrays, self._entries = arrays, entries
+            self.built_at = time.monotonic()
+
+    def expire(self):
+        """Keep serving, but rebuild in the background on next use."""
+        if self.built_at is not None:
+            self.built_at = float("-inf")
+
+    @property
+    def stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    def upsert(self, customer_id, name, address, phone):
+        with self._lock:
+            self._remove(customer_id)
+            self._add(customer_id, name, address, phone)
+
+    def remove(self, customer_id):
+        with self._lock:
+            self._remove(customer_id)
+
+    def _range(self, rank, prefix):
+        array = self._arrays[rank]
+        return bisect_left(array, (prefix,)), bisect_left(array, (prefix + "\uffff",))
+
+    def search(self, query, limit=10):
+        words = normalize(query)
+        digits = re.sub(r"\D", "", query or "")
+        if len(digits) >= 3 and not re.sub(r"[\d\s()+.-]", "", query):
+            words = [digits]
+        if not words:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            # Anchor on the word with the fewest matching keys; check the rest per candidate
+            ranges = {word: {rank: self._range(rank, word) for rank in RANKS} for word in words}
+            anchor = min(words, key=lambda w: sum(hi - lo for lo, hi in ranges[w].values()))
+            others = [w for w in words if w != anchor]
+            for rank in RANKS:
+                lo, hi = ranges[anchor][rank]
+                found = []
+                for _, customer_id in self._arrays[rank][lo:min(hi, lo + MAX_SCAN)]:
+                    if customer_id in seen:
+                        continue
+                    entry, keys = self._entries[customer_id]
+                    if all(any(k.startswith(word) for k, _ in keys) for word in others):
+                        seen.add(customer_id)
+                        found.append(entry)
+                found.sort(key=lambda entry: (entry["name"] or "").lower())
+                results.extend(found)
+                if len(results) >= limit:
+                    break
+        return results[:limit]
+
+
+def _load(app, index):
+    with app.app_context():
+        try:
+            index.build(db.session.execute(select(Customer.id, Customer.name, Customer.address, Customer.phone)))
+        finally:
+            index.refreshing = False
+
+
+def get_index(app=None):
+    """This app's customer index.
+
+    The first call builds it inline; after that a stale index keeps serving
+    while a background thread rebuilds it.
+    """
+    app = app or current_app._get_current_object()
+    index = app.extensions.get("customer_index")
+    if index is None:
+        index = app.extensions["customer_index"] = CustomerIndex(ttl=app.config["CUSTOMER_INDEX_TTL"])
+    if index.built_at is None:
+        index.build(db.session.execute(select(Customer.id, Customer.name, Customer.address, Customer.phone)))
+    elif index.stale and not index.refreshing:
+        index.refreshing = True
+        threading.Thread(target=_load, args=(app, index), daemon=True).start()
+    return index
+
+
+def _collect(session, flush_context):
+    pending = session.info.setdefault(_PENDING, {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Customer):
+            pending[obj.id] = (obj.name, obj.address, obj.phone)
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            pending[obj.id] = None
+
+
+def forget_customer(customer_id, session=None):
+    """Queue an index removal for a customer deleted with a Core DELETE.
+
+    Set-based deletes never reach ``session.deleted``, so the flush hook
+    cannot see them; the removal is applied on commit like any other.
+    """
+    session = session or db.session
+    session.info.setdefault(_PENDING, {})[customer_id] = None
+
+
+def _apply(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get("customer_index")
+    if index is None:
+        return
+    for customer_id, fields in pending.items():
+        if fields is None:
+            index.remove(customer_id)
+        else:
+            index.upsert(customer_id, *fields)
+
+
+def _discard(session):
+    session.info.pop(_PENDING, None)
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_flush", _collect):
+        event.listen(db.session, "after_flush", _collect)
+        event.listen(db.session, "after_commit", _apply)
+        event.listen(db.session, "after_rollback", _discard)
@@ -0,0 +1,179 @@
+"""Slow-query log.
+
+Cursor events time every statement on every engine (primary and replica).
+One that takes at least ``SLOW_QUERY_MS`` is recorded with its normalized
+SQL (literals and ``IN`` lists folded to ``?``), the shape of its bound
+parameters, the route that ran it and - once per distinct statement - the
+database's plan for it (``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN``
+elsewhere; SELECTs only).
+
+Each slow statement is appended as one JSON line to ``SLOW_QUERY_LOG``
+(rotated at ``SLOW_QUERY_LOG_BYTES``) and folded into a per-process
+summary; ``/admin/slow-queries`` lists it ranked by total time.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:\?|%\(\w+\)s|:\w+|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|%s))*\s*\)", re.I)
+_SPACE = re.compile(r"\s+")
+_INFO_KEY = "slowlog_started"
+
+
+def normalize(statement):
+    """SQL with whitespace collapsed, literals as ``?`` and IN lists as ``IN (?)``."""
+    sql = _SPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (?)", sql)
+
+
+def fingerprint(sql):
+    return hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+
+
+def parameter_shape(parameters, executemany=False):
+    """Types of the bound parameters, not their values."""
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "each": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def _explain(cursor, dialect, statement, parameters):
+    head = statement.lstrip()[:6].upper()
+    if not head.startswith(("SELECT", "WITH")):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    explain = cursor.connection.cursor()
+    try:
+        explain.execute(prefix + statement, parameters)
+        return [" ".join(str(col) for col in row) for row in explain.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        explain.close()
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms, path=None, max_bytes=5_000_000, backups=3):
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self._lock = threading.Lock()
+        self._summary = {}
+        self._logger = None
+        if path:
+            self._logger = logging.getLogger(f"{__name__}.{fingerprint(path)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            if not self._logger.handlers:
+                handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._logger.addHandler(handler)
+
+    def record(self, cursor, dialect, statement, parameters, executemany, elapsed_ms):
+        sql = normalize(statement)
+        key = fingerprint(sql)
+        route = f"{request.method} {request.endpoint or request.path}" if has_request_context() else None
+        with self._lock:
+            entry = self._summary.get(key)
+            first = entry is None
+            if first:
+                entry = self._summary[key] = {
+                    "fingerprint": key, "sql": sql, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "params": parameter_shape(parameters, executemany), "routes": {}, "plan": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            if route:
+                entry["routes"][route] = entry["routes"].get(route, 0) + 1
+        if first and not executemany:
+            entry["plan"] = _explain(cursor, dialect, statement, parameters)
+        metrics.incr("db.slow_queries")
+        if self._logger is not None:
+            self._logger.info(json.dumps({
+                "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "ms": round(elapsed_ms, 2),
+                "fingerprint": key,
+                "sql": sql,
+                "params": entry["params"],
+                "route": route,
+                "plan": entry["plan"] if first else None,
+            }, default=str))
+
+    def summary(self, limit=50):
+        """Distinct slow statements, most total time first."""
+        with self._lock:
+            entries = [dict(entry, routes=dict(entry["routes"])) for entry in self._summary.values()]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        for entry in entries:
+            entry["total_ms"] = round(entry["total_ms"], 2)
+            entry["max_ms"] = round(entry["max_ms"], 2)
+            entry["mean_ms"] = round(entry["total_ms"] / entry["count"], 2)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._summary.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_INFO_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get(_INFO_KEY)
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    if not has_app_context():
+        return
+    log = current_app.extensions.get("slow_queries")
+    if log is None or elapsed_ms < log.threshold_ms:
+        return
+    try:
+        log.record(cursor, conn.dialect, statement, parameters, executemany, elapsed_ms)
+    except Exception as e:
+        current_app.logger.warning("Could not record slow query: %s", e)
+
+
+def _handle_error(context):
+    started = context.connection.info.get(_INFO_KEY) if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def get_slow_query_log(app):
+    return app.extensions.get("slow_queries")
+
+
+def init_app(app):
+    threshold = app.config.get("SLOW_QUERY_MS")
+    if threshold is None or threshold < 0:
+        return
+    app.extensions["slow_queries"] = SlowQueryLog(
+        threshold,
+        app.config.get("SLOW_QUERY_LOG"),
+        app.config.get("SLOW_QUERY_LOG_BYTES", 5_000_000),
+        app.config.get("SLOW_QUERY_LOG_BACKUPS", 3),
+    )
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
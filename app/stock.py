@@ -0,0 +1,99 @@
+"""Inventory stock movements and edits that are safe under contention.
+
+Crews taking or returning stock use ``adjust_stock``: one
+``UPDATE ... SET quantity = quantity + :delta`` (guarded so a withdrawal
+never goes below zero), so concurrent movements never lose each other.
+
+Full edits (the edit form, ``inventory-update`` in chat) go through
+``edit_item``.  ``InventoryItem.version`` is the mapper's
+``version_id_col``: every ORM update is ``WHERE id = :id AND version =
+:seen``, and both paths bump it.  An edit made from a form showing an older
+version raises ``EditConflict``; a flush that loses the race to another
+writer is retried on a fresh copy, up to ``STOCK_EDIT_RETRIES`` times.
+"""
+import math
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import metrics
+from .extensions import db
+from .models import InventoryItem
+
+
+class StockError(ValueError):
+    """Raised when a stock movement or edit cannot be applied."""
+
+
+class StockShortage(StockError):
+    """Raised when a withdrawal is larger than the quantity on hand."""
+
+
+class EditConflict(StockError):
+    """Raised when an item changed since the version the edit was based on."""
+
+
+def parse_delta(value):
+    try:
+        delta = float(value)
+    except (TypeError, ValueError):
+        raise StockError(f"Invalid delta: {value!r}")
+    if not math.isfinite(delta):
+        raise StockError(f"Invalid delta: {value!r}")
+    if not delta:
+        raise StockError("Delta must not be zero")
+    return delta
+
+
+def adjust_stock(item_id, delta, allow_negative=False):
+    """Add ``delta`` (negative to withdraw) to an item's quantity in one UPDATE.
+
+    Returns ``(quantity, version)`` after the change, or ``None`` when there
+    is no such item.  Callers commit.
+    """
+    stmt = update(InventoryItem).where(InventoryItem.id == item_id)
+    if delta < 0 and not allow_negative:
+        stmt = stmt.where(db.func.coalesce(InventoryItem.quantity, 0) >= -delta)
+    row = db.session.execute(
+        stmt.values(
+            quantity=db.func.coalesce(InventoryItem.quantity, 0) + delta,
+            version=InventoryItem.version + 1,
+        )
+        .returning(InventoryItem.quantity, InventoryItem.version)
+        .execution_options(synchronize_session="fetch")
+    ).first()
+    if row is None:
+        if db.session.get(InventoryItem, item_id) is None:
+            return None
+        raise StockShortage(f"Not enough stock of item {item_id} to take {-delta:g}")
+    metrics.incr("stock.adjust")
+    return row.quantity, row.version
+
+
+def edit_item(item_id, changes, expected_version=None, retries=None):
+    """Apply ``{attribute: value}`` to an item and commit, checking its version.
+
+    ``expected_version`` is the version the caller's form was rendered from;
+    leave it out to apply the changes to whatever is current.  Returns the
+    item, or ``None`` when there is no such item.
+    """
+    if retries is None:
+        retries = current_app.config.get("STOCK_EDIT_RETRIES", 3)
+    for attempt in range(retries + 1):
+        item = db.session.get(InventoryItem, item_id, populate_existing=True)
+        if item is None:
+            return None
+        if expected_version is not None and item.version != expected_version:
+            metrics.incr("stock.edit_conflict")
+            raise EditConflict(f"Item {item_id} was changed by someone else; reload and try again")
+        for attribute, value in changes.items():
+            setattr(item, attribute, value)
+        try:
+            db.session.commit()
+            return item
+        except StaleDataError:
+            db.session.rollback()
+            metrics.incr("stock.edit_retry")
+    metrics.incr("stock.edit_conflict")
+    raise EditConflict(f"Item {item_id} kept changing; gave up after {retries + 1} attempts")
@@ -0,0 +1,185 @@
+"""Delta sync for mobile clients.
+
+Synced models carry ``updated_at``, maintained by the column's ``onupdate``
+for ORM flushes and for bulk ``update()`` statements alike.  Deletes -
+including ones the database cascades - are recorded in ``sync_tombstone``
+by ``AFTER DELETE`` triggers installed with the schema upgrade.
+
+``/api/sync`` pages through each model in ``(updated_at, id)`` order and
+returns an opaque token holding every cursor.  Rows stamped within the last
+``SYNC_SETTLE_SECONDS`` are held back until the next call so a transaction
+that commits a little late is not skipped.  Tokens older than
+``SYNC_TOMBSTONE_DAYS`` (the tombstone retention) ask the client to reset.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import undefer
+
+from .extensions import db
+from .models import Customer, InventoryItem, Job, Material, SyncTombstone
+
+
+class SyncTokenError(ValueError):
+    """Raised for a sync token that cannot be decoded."""
+
+
+def _customer(c):
+    return {"id": c.id, "name": c.name, "address": c.address, "phone": c.phone, "email": c.email,
+            "notes": c.notes, "latitude": c.latitude, "longitude": c.longitude}
+
+
+def _job(j):
+    return {"id": j.id, "customer_id": j.customer_id, "title": j.title, "description": j.description,
+            "scheduled_date": j.scheduled_date.isoformat() if j.scheduled_date else None,
+            "status": j.status, "total_cost": j.total_cost, "notes": j.notes}
+
+
+def _inventory(i):
+    return {"id": i.id, "name": i.name, "quantity": i.quantity, "unit": i.unit, "unit_cost": i.unit_cost,
+            "location": i.location, "low_stock_alert": i.low_stock_alert, "owner_id": i.owner_id}
+
+
+def _material(m):
+    return {"id": m.id, "name": m.name, "unit": m.unit, "unit_cost": m.unit_cost, "supplier": m.supplier}
+
+
+# Response key, model, serializer and the deferred columns it reads
+FEEDS = {
+    "customers": (Customer, _customer, [Customer.notes]),
+    "jobs": (Job, _job, [Job.description, Job.notes]),
+    "inventory": (InventoryItem, _inventory, []),
+    "materials": (Material, _material, []),
+}
+TOMBSTONE_ENTITIES = {"customer": "customers", "job": "jobs", "inventory_item": "inventory", "material": "materials"}
+_STAMP = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def encode_token(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    if not token:
+        return {}
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        raise SyncTokenError("Invalid sync token")
+    if not isinstance(state, dict):
+        raise SyncTokenError("Invalid sync token")
+    # Check every value the queries will use, so a hand-edited token is a 400
+    try:
+        for key in FEEDS:
+            if key in state:
+                cursor = state[key]
+                if not isinstance(cursor, list) or len(cursor) != 2:
+                    raise ValueError(key)
+                datetime.strptime(cursor[0], _STAMP)
+                int(cursor[1])
+        if "t" in state:
+            datetime.strptime(state["t"], _STAMP)
+        if "d" in state:
+            int(state["d"])
+    except (TypeError, ValueError, OverflowError):
+        raise SyncTokenError("Invalid sync token")
+    return state
+
+
+def _after(model, cursor):
+    stamp, last_id = datetime.strptime(cursor[0], _STAMP), int(cursor[1])
+    return or_(model.updated_at > stamp, and_(model.updated_at == stamp, model.id > last_id))
+
+
+def changes_since(token, limit, settle_seconds=2, tombstone_days=30, now=None):
+    """One bounded page of changes after ``token``; see the module docstring."""
+    state = decode_token(token)
+    now = now or datetime.utcnow()
+    reset = False
+    try:
+        synced = datetime.strptime(state["t"], _STAMP) if state else None
+    except (KeyError, TypeError, ValueError):
+        raise SyncTokenError("Invalid sync token")
+    if synced is not None and now - synced > timedelta(days=tombstone_days):
+        # Tombstones this client still needs may have been pruned
+        state, reset = {}, True
+    horizon = now - timedelta(seconds=settle_seconds)
+    result, cursors, more = {}, {}, False
+
+    for key, (model, serialize, deferred) in FEEDS.items():
+        query = select(model).where(model.updated_at <= horizon)
+        if key in state:
+            query = query.where(_after(model, state[key]))
+        rows = db.session.execute(
+            query.options(*(undefer(col) for col in deferred)).order_by(model.updated_at, model.id).limit(limit + 1)
+        ).scalars().all()
+        if len(rows) > limit:
+            rows, more = rows[:limit], True
+        result[key] = [serialize(row) for row in rows]
+        last = rows[-1] if rows else None
+        cursors[key] = [last.updated_at.strftime(_STAMP), last.id] if last else state.get(key)
+
+    deleted = {key: [] for key in FEEDS}
+    tombstones = select(SyncTombstone).where(SyncTombstone.id > int(state.get("d", 0))).order_by(SyncTombstone.id)
+    if not state:
+        # A full sync has nothing to delete; start from the newest tombstone
+        newest = db.session.execute(select(db.func.max(SyncTombstone.id))).scalar() or 0
+        tombstones = tombstones.where(SyncTombstone.id > newest)
+        cursors["d"] = newest
+    rows = db.session.execute(tombstones.limit(limit + 1)).scalars().all()
+    if len(rows) > limit:
+        rows, more = rows[:limit], True
+    for row in rows:
+        if row.entity in TOMBSTONE_ENTITIES:
+            deleted[TOMBSTONE_ENTITIES[row.entity]].append(row.entity_id)
+    cursors["d"] = rows[-1].id if rows else cursors.get("d", state.get("d", 0))
+
+    cursors = {k: v for k, v in cursors.items() if v is not None}
+    cursors["t"] = now.strftime(_STAMP)
+    return {**result, "deleted": deleted, "next": encode_token(cursors), "more": more, "reset": reset}
+
+
+def prune_tombstones(days):
+    """Drop tombstones older than ``days``; returns the row count."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return db.session.execute(delete(SyncTombstone).where(SyncTombstone.deleted_at < cutoff)).rowcount
+
+
+def _trigger_ddl(dialect, table):
+    name = f"trg_{table}_sync_tombstone"
+    if dialect == "sqlite":
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS {name} AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO sync_tombstone (entity, entity_id, deleted_at) VALUES ('{table}', OLD.id, CURRENT_TIMESTAMP); "
+            f"END"
+        ]
+    if dialect == "postgresql":
+        return [
+            f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$ BEGIN "
+            f"INSERT INTO sync_tombstone (entity, entity_id, deleted_at) VALUES ('{table}', OLD.id, now()); "
+            f"RETURN OLD; END $$ LANGUAGE plpgsql",
+            f"DROP TRIGGER IF EXISTS {name} ON {table}",
+            f"CREATE TRIGGER {name} AFTER DELETE ON {table} FOR EACH ROW EXECUTE FUNCTION {name}()",
+        ]
+    return []
+
+
+def upgrade(engine):
+    """Install tombstone triggers and stamp rows that predate ``updated_at``."""
+    applied = []
+    with engine.begin() as conn:
+        for entity in TOMBSTONE_ENTITIES:
+            for ddl in _trigger_ddl(engine.dialect.name, entity):
+                conn.exec_driver_sql(ddl)
+        for model, _, _ in FEEDS.values():
+            table = model.__table__
+            stamp = datetime.utcnow()
+            if "created" in table.c:
+                stamp = db.func.coalesce(table.c.created, stamp)
+            result = conn.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=stamp))
+            if result.rowcount:
+                applied.append(f"{model.__tablename__}.updated_at backfill")
+    return applied
@@ -0,0 +1,75 @@
+"""Keep database connections out of slow external calls.
+
+A route that calls the model follows three steps: read what it needs into
+plain values, ``release()`` the session so its transaction ends and the
+connection goes back to the pool (and SQLite drops its read lock), make the
+call, then open a short transaction for the writes.  The pool size then
+caps concurrent database work, not concurrent model calls.
+
+``external_call(name)`` wraps every outbound call (``app.ai`` uses it for
+each model request).  Pool checkout/checkin events record which thread
+holds each connection; entering an external call with one still checked
+out counts ``db.held_during_external_call`` in ``app.metrics`` (and under
+the call's name) and logs the route that did it.
+"""
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+from . import metrics
+from .extensions import db
+
+# Checked-out connection record -> thread that checked it out
+_owners = {}
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    _owners[id(connection_record)] = threading.get_ident()
+
+
+def _checkin(dbapi_connection, connection_record):
+    _owners.pop(id(connection_record), None)
+
+
+def held_connections():
+    """Connections this thread has checked out of any pool right now."""
+    ident = threading.get_ident()
+    return sum(1 for owner in list(_owners.values()) if owner == ident)
+
+
+def release():
+    """End the session's transaction (committing anything pending) and return its connection.
+
+    Loaded objects are expired afterwards; read the values you need first.
+    """
+    session = db.session()
+    if session.in_transaction():
+        session.commit()
+
+
+def check_released(name):
+    """Flag this thread if it holds a connection going into external call ``name``."""
+    if not held_connections():
+        return True
+    where = f"{request.method} {request.path}" if has_request_context() else "outside a request"
+    metrics.incr("db.held_during_external_call")
+    metrics.incr(f"db.held_during_external_call.{name}")
+    if has_app_context():
+        current_app.logger.warning("%s holds a database connection across %s", where, name)
+    return False
+
+
+@contextmanager
+def external_call(name):
+    """Mark a slow call to another service; see the module docstring."""
+    check_released(name)
+    yield
+
+
+def init_app(app):
+    if not event.contains(Pool, "checkout", _checkout):
+        event.listen(Pool, "checkout", _checkout)
+        event.listen(Pool, "checkin", _checkin)
@@ -0,0 +1,135 @@
+"""Cold-start warm-up for serverless and freshly started workers.
+
+``warm_up(app)`` does the work the first request would otherwise pay for:
+it compiles every template, opens a connection on each database engine and
+builds the in-process caches (typeahead, geo, estimate reuse, price book).
+``vercel_app.py`` runs it at import; ``/_warmup`` runs it on demand, so a
+platform pinger can warm a new instance before traffic reaches it.
+
+Compiled templates go to a Jinja bytecode cache in
+``JINJA_BYTECODE_CACHE_DIR``.  ``flask precompile-templates`` (``make
+precompile``) fills it at build time so the deployed bundle ships it; at
+runtime a read-only directory is only read, and a missing one falls back
+to the temp directory.  Cache entries are keyed by template name rather
+than absolute path, so a cache built on another machine still matches, and
+Jinja discards any entry whose source checksum no longer matches.
+
+Timings land in ``app.extensions["startup"]`` and in ``app.metrics``
+(``startup.create_app_ms``, ``startup.warmup_ms``,
+``startup.first_request_ms``).
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from flask import current_app, g
+from jinja2 import FileSystemBytecodeCache
+
+from . import metrics
+
+
+class ShippedBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache that survives read-only directories and moved checkouts."""
+
+    def get_cache_key(self, name, filename=None):
+        return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def _cache_dir(path):
+    try:
+        os.makedirs(path, exist_ok=True)
+        return path
+    except OSError:
+        fallback = os.path.join(tempfile.gettempdir(), "gutter-tracker-jinja")
+        os.makedirs(fallback, exist_ok=True)
+        return fallback
+
+
+def precompile_templates(app):
+    """Compile every template (writing the bytecode cache); returns the count."""
+    names = app.jinja_env.list_templates(extensions=("html", "txt", "xml"))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def _prime_pools(app):
+    from .extensions import db
+
+    engines = list(db.engines.values())
+    replica = app.extensions.get("replica_engine")
+    if replica is not None:
+        engines.append(replica)
+    for engine in engines:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    return len(engines)
+
+
+def _preload_caches(app):
+    from . import estimates, geo, pricing, search
+
+    search.get_index(app)
+    geo.get_geo_index(app)
+    estimates.get_estimate_index(app)
+    pricing.get_price_book(app)
+
+
+def warm_up(app):
+    """Run every warm-up step; returns ``{step: milliseconds}``.
+
+    A failing step is logged and skipped so a cold database never stops
+    the app from starting.
+    """
+    timings = {}
+    started = time.perf_counter()
+    steps = (("templates", precompile_templates), ("pools", _prime_pools), ("caches", _preload_caches))
+    with app.app_context():
+        for name, step in steps:
+            step_started = time.perf_counter()
+            try:
+                step(app)
+            except Exception as e:
+                app.logger.warning("Warm-up step %s failed: %s", name, e)
+                metrics.incr(f"startup.warmup_errors.{name}")
+            timings[name] = round((time.perf_counter() - step_started) * 1000, 2)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    metrics.observe("startup.warmup_ms", timings["total"])
+    startup = app.extensions.setdefault("startup", {})
+    startup["warmup_ms"] = timings
+    app.logger.info("Warm-up finished in %.1f ms: %s", timings["total"], timings)
+    return timings
+
+
+def _first_request_started():
+    if not _state().get("first_request_done"):
+        g.first_request_started = time.perf_counter()
+
+
+def _first_request_finished(response):
+    started = g.pop("first_request_started", None)
+    if started is not None:
+        elapsed = round((time.perf_counter() - started) * 1000, 2)
+        _state()["first_request_done"] = True
+        _state()["first_request_ms"] = elapsed
+        metrics.observe("startup.first_request_ms", elapsed)
+    return response
+
+
+def _state():
+    return current_app.extensions.setdefault("startup", {})
+
+
+def init_app(app):
+    directory = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if directory:
+        app.jinja_env.bytecode_cache = ShippedBytecodeCache(_cache_dir(directory))
+    app.before_request(_first_request_started)
+    app.after_request(_first_request_finished)
@@ -19,4 +19,8 @@ with app.app_context():
 PYTHON
 
 echo "🌐 Starting web server on port ${PORT:-8080}..."
+# SERVER_MODE=asgi serves the AI endpoints on an event loop (see app/asgi.py)
+if [ "${SERVER_MODE}" = "asgi" ]; then
+    exec uvicorn asgi:app --host 0.0.0.0 --port ${PORT:-8080} --workers 1
+fi
 exec gunicorn run:app --bind 0.0.0.0:${PORT:-8080} --workers 1 --threads 2 --timeout 120 --max-requests 1000 --max-requests-jitter 50
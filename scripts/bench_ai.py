@@ -0,0 +1,125 @@
+"""Hammer the AI routes at a target concurrency and report latency.
+
+Against a running server (start it with AI_BACKEND=fake to stay offline)::
+
+    AI_BACKEND=fake AI_FAKE_LATENCY=lognormal:-1.2,0.4 uvicorn asgi:app --port 8080
+    python scripts/bench_ai.py --url http://localhost:8080 --concurrency 200 --requests 2000
+
+Without ``--url`` the Flask app is driven in-process with the fake backend.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SAMPLE_IMAGE = "data:image/gif;base64,R0lGODlhAQABAIABAP8AAP///yH5BAEKAAEALAAAAAABAAEAAAICTAEAOw=="
+
+ROUTES = {
+    "chat": ("/api/chat", {"message": "How do I schedule a job?"}),
+    "help": ("/api/ai/help", {"question": "How do I add inventory?"}),
+    "estimate": ("/api/ai/estimate", {"description": "Replace 50 ft of K-style gutters", "address": "123 Main St"}),
+    "scan": ("/api/ai/scan-inventory", {"photo_data": SAMPLE_IMAGE}),
+}
+
+
+def http_sender(base_url, timeout):
+    def send(path, payload):
+        req = urllib.request.Request(
+            base_url.rstrip("/") + path,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as response:
+                response.read()
+                return response.getcode()
+        except urllib.error.HTTPError as e:
+            return e.code
+    return send
+
+
+def in_process_sender():
+    from app import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "AI_BACKEND": "fake"})
+    client = app.test_client()
+    return lambda path, payload: client.post(path, json=payload).status_code
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(send, routes, requests, concurrency):
+    latencies = defaultdict(list)
+    failures = defaultdict(int)
+    lock = threading.Lock()
+
+    def one(i):
+        name = routes[i % len(routes)]
+        path, payload = ROUTES[name]
+        start = time.perf_counter()
+        try:
+            status = send(path, payload)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[name].append(elapsed)
+            if status != 200:
+                failures[name] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def report(wall, latencies, failures):
+    print(f"{'route':<10} {'n':>6} {'err':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = []
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        everything.extend(values)
+        print(f"{name:<10} {len(values):>6} {failures[name]:>5} "
+              f"{percentile(values, 50) * 1000:8.1f} {percentile(values, 90) * 1000:8.1f} "
+              f"{percentile(values, 99) * 1000:8.1f} {values[-1] * 1000:8.1f}")
+    everything.sort()
+    print(f"{'all':<10} {len(everything):>6} {sum(failures.values()):>5} "
+          f"{percentile(everything, 50) * 1000:8.1f} {percentile(everything, 90) * 1000:8.1f} "
+          f"{percentile(everything, 99) * 1000:8.1f} {everything[-1] * 1000:8.1f}")
+    print(f"\n{len(everything)} requests in {wall:.2f}s = {len(everything) / wall:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server; in-process if omitted")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated subset of " + ", ".join(ROUTES))
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+    send = http_sender(args.url, args.timeout) if args.url else in_process_sender()
+    report(*run(send, routes, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
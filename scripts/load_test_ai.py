@@ -0,0 +1,87 @@
+"""Compare AI-route concurrency between the sync (WSGI) and async (ASGI) modes.
+
+The Gemini model is swapped for a fake that only waits ``--latency`` seconds,
+so the numbers show how many model calls each mode can keep in flight.
+Sync mode pushes requests through Flask on ``--threads`` workers (production
+runs ``gunicorn --threads 2``); async mode drives app.asgi directly.
+
+    python scripts/load_test_ai.py --requests 200 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import ai, create_app
+from app.asgi import create_asgi_app
+from app.fake_model import FakeGenerativeModel
+
+
+PAYLOAD = {"question": "How do I add a customer?"}
+
+
+def run_sync(app, requests, threads):
+    client = app.test_client()
+
+    def one(_):
+        return client.post("/api/ai/help", json=PAYLOAD).status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one, range(requests)))
+
+
+async def run_async(asgi_app, requests, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    body = json.dumps(PAYLOAD).encode()
+
+    async def one():
+        status = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        scope = {"type": "http", "method": "POST", "path": "/api/ai/help", "headers": [], "query_string": b""}
+        async with gate:
+            await asgi_app(scope, receive, send)
+        return status[0]
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def report(mode, statuses, elapsed):
+    ok = sum(1 for s in statuses if s == 200)
+    print(f"{mode:<6} {len(statuses):>5} requests  {ok:>5} ok  {elapsed:7.2f}s  {len(statuses) / elapsed:8.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=2, help="sync worker threads")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    ai.gemini_model = FakeGenerativeModel(latency=f"fixed:{args.latency}")
+
+    start = time.perf_counter()
+    statuses = run_sync(app, args.requests, args.threads)
+    report("sync", statuses, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    statuses = asyncio.run(run_async(create_asgi_app(app), args.requests, args.concurrency))
+    report("async", statuses, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+from app.archive import archive_jobs
+from app.extensions import db
+from app.models import ArchivedJob, ArchivedJobPhoto, Customer, Job, JobMaterial, JobPhoto, JobRollup
+
+
+def test_archive_moves_old_completed_jobs(client, app):
+    old_day = date.today() - timedelta(days=400)
+    with app.app_context():
+        customer = Customer(name="Archive Customer", address="7 Cold Storage Rd")
+        db.session.add(customer)
+        db.session.flush()
+        old = Job(customer_id=customer.id, title="Old cleaning", status="completed",
+                  scheduled_date=old_day, total_cost=150.0, notes="Ladder on north side")
+        old_open = Job(customer_id=customer.id, title="Old but open", status="scheduled", scheduled_date=old_day)
+        recent = Job(customer_id=customer.id, title="Recent", status="completed",
+                     scheduled_date=date.today(), total_cost=80.0)
+        db.session.add_all([old, old_open, recent])
+        db.session.flush()
+        db.session.add(JobMaterial(job_id=old.id, name="Elbow", quantity=2, unit_cost=4.0, total_cost=8.0))
+        original = JobPhoto(job_id=old.id, photo_data="data:image/jpeg;base64,QUJD", caption="before")
+        db.session.add(original)
+        db.session.flush()
+        db.session.add(JobPhoto(job_id=old.id, photo_data=None, source_photo_id=original.id, caption="again"))
+        db.session.commit()
+        old_id, open_id, recent_id, customer_id = old.id, old_open.id, recent.id, customer.id
+
+    client.post('/login', data={'password': 'NAO$'})
+    before = client.get("/reports").get_data(as_text=True)
+
+    with app.app_context():
+        assert archive_jobs(365) == 1
+        assert db.session.get(Job, old_id) is None
+        assert db.session.get(Job, open_id) is not None
+        assert db.session.get(Job, recent_id) is not None
+        assert JobMaterial.query.filter_by(job_id=old_id).count() == 0
+        assert JobPhoto.query.filter_by(job_id=old_id).count() == 0
+        archived = db.session.get(ArchivedJob, old_id)
+        assert archived.notes == "Ladder on north side"
+        assert [m.name for m in archived.materials_used] == ["Elbow"]
+        duplicate = ArchivedJobPhoto.query.filter_by(job_id=old_id, caption="again").one()
+        assert duplicate.data == "data:image/jpeg;base64,QUJD"
+        assert archive_jobs(365) == 0
+
+    assert client.get("/reports").get_data(as_text=True) == before
+
+    with app.app_context():
+        # Archived ids are never handed out again
+        newest = Job(customer_id=customer_id, title="New")
+        db.session.add(newest)
+        db.session.commit()
+        assert newest.id > recent_id
+
+    page = client.get(f"/jobs/{old_id}")
+    assert page.status_code == 200
+    assert b"Old cleaning" in page.data and b"read-only" in page.data
+    assert b"/add_material" not in page.data
+
+    report = client.get(f"/reports/download_today?date={old_day.isoformat()}")
+    assert b"Old cleaning" in report.data and b"Elbow" in report.data
+    assert client.get("/reports/download_today?date=yesterday").status_code == 400
+
+
+def test_deleting_a_customer_drops_their_archived_totals(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    before = client.get("/reports").get_data(as_text=True)
+    old_day = date.today() - timedelta(days=500)
+    with app.app_context():
+        customer = Customer(name="Gone Customer", address="8 Vanished Ln")
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add_all([
+            Job(customer_id=customer.id, title="Gone archived", status="completed", scheduled_date=old_day,
+                total_cost=275.0),
+            Job(customer_id=customer.id, title="Gone live", status="scheduled", scheduled_date=date.today()),
+        ])
+        db.session.commit()
+        customer_id = customer.id
+        assert archive_jobs(365) == 1
+        month = db.session.get(JobRollup, (old_day.strftime("%Y-%m"), "completed"))
+        assert (month.job_count, month.revenue) == (1, 275.0)
+
+    assert client.get("/reports").get_data(as_text=True) != before
+    assert client.get(f"/customers/delete/{customer_id}").status_code == 302
+    assert client.get("/reports").get_data(as_text=True) == before
+    with app.app_context():
+        assert ArchivedJob.query.filter_by(customer_id=customer_id).count() == 0
+        month = db.session.get(JobRollup, (old_day.strftime("%Y-%m"), "completed"))
+        assert (month.job_count, month.revenue) == (0, 0.0)
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+
+from app import ai, create_app, estimates
+from app.asgi import PooledWsgiToAsgi, ai_estimate, create_asgi_app
+from app.models import InventoryItem
+
+
+class FakeAsyncModel:
+    def __init__(self):
+        self.async_calls = 0
+
+    def generate_content(self, contents):
+        raise AssertionError("async mode must not use the blocking client")
+
+    async def generate_content_async(self, contents):
+        self.async_calls += 1
+        return type("Response", (), {"text": "Use the Customers page."})()
+
+
+def _post(asgi_app, path, payload):
+    body = json.dumps(payload).encode()
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST", "path": path, "raw_path": path.encode(),
+        "root_path": "", "scheme": "http", "query_string": b"", "server": ("testserver", 80),
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"host", b"testserver"),
+        ],
+    }
+    asyncio.run(asgi_app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, json.loads(b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body"))
+
+
+def test_ai_routes_use_async_client(app, monkeypatch):
+    model = FakeAsyncModel()
+    monkeypatch.setattr(ai, "gemini_model", model)
+    asgi_app = create_asgi_app(app)
+
+    status, data = _post(asgi_app, "/api/ai/help", {"question": "How do I add a customer?"})
+    assert status == 200
+    assert data["answer"] == "Use the Customers page."
+    status, data = _post(asgi_app, "/api/ai/help", {})
+    assert status == 400
+    assert model.async_calls == 1
+
+
+def test_chat_commands_fall_through_to_flask(app, monkeypatch):
+    monkeypatch.setattr(ai, "gemini_model", FakeAsyncModel())
+    status, data = _post(create_asgi_app(app), "/api/chat", {"message": "inventory-add name=ASGI Hanger, quantity=3"})
+    assert status == 200
+    assert data["response"].startswith("Added item ASGI Hanger")
+    with app.app_context():
+        assert InventoryItem.query.filter_by(name="ASGI Hanger").count() == 1
+
+
+def _lifespan(asgi_app):
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(asgi_app({"type": "lifespan"}, receive, send))
+    return sent
+
+
+def test_estimate_index_is_built_at_startup_not_on_the_event_loop(monkeypatch):
+    fresh = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'APP_PASSWORD': 'NAO$'})
+    model = FakeAsyncModel()
+    monkeypatch.setattr(ai, "gemini_model", model)
+    asgi_app = create_asgi_app(fresh)
+
+    # Before startup the handler defers to Flask instead of querying
+    with fresh.app_context():
+        assert asyncio.run(ai_estimate({"description": "Clean 120 ft of gutters"})) is None
+        assert not estimates.is_built()
+
+    assert _lifespan(asgi_app) == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    with fresh.app_context():
+        assert estimates.is_built()
+    status, data = _post(asgi_app, "/api/ai/estimate", {"description": "Clean 120 ft of gutters"})
+    assert status == 200 and data["reused"] is False
+    assert model.async_calls == 1
+
+
+def test_wsgi_requests_run_on_the_pool_and_close_their_body():
+    closed = []
+
+    class Body:
+        def __iter__(self):
+            yield threading.current_thread().name.encode()
+            yield b"|"
+            yield b"trimmed past content-length"
+
+        def close(self):
+            closed.append(True)
+
+    def wsgi_app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len("wsgi_0|trim")))])
+        return Body()
+
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "path": "/", "query_string": b"",
+             "headers": [], "server": ("testserver", 80)}
+    asyncio.run(PooledWsgiToAsgi(wsgi_app, threads=2)(scope, receive, send))
+    assert sent[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in sent[1:]) == b"wsgi_0|trim"
+    assert sent[-1] == {"type": "http.response.body"} and closed == [True]
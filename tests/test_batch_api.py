@@ -0,0 +1,62 @@
+import time
+from datetime import date
+
+from app import routes
+from app.extensions import db
+from app.models import Customer, InventoryItem, Job
+
+
+def test_dashboard_loads_in_one_batch(client, app):
+    with app.app_context():
+        customer = Customer(name="Batch Customer", address="5 Round Trip Rd")
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add_all([
+            Job(customer_id=customer.id, title="Batch today", scheduled_date=date.today()),
+            Job(customer_id=customer.id, title="Batch later", scheduled_date=date(2030, 1, 1)),
+            InventoryItem(name="Batch elbows", quantity=2, low_stock_alert=5, owner_id=customer.id),
+        ])
+        db.session.commit()
+
+    client.post('/login', data={'password': 'NAO$'})
+    response = client.post("/api/batch", json={"requests": [
+        {"id": "stats", "path": "/api/dashboard/stats"},
+        {"id": "today", "path": "/api/jobs?date=today"},
+        {"id": "low", "path": "/api/inventory/low-stock"},
+        {"id": "customers", "path": "/api/customers?limit=50"},
+        {"id": "missing", "path": "/api/nope"},
+        {"id": "add", "method": "POST", "path": "/api/chat", "body": {"message": "inventory-add name=Batch hangers, quantity=9"}},
+    ]})
+    assert response.status_code == 200
+    results = {r["id"]: r for r in response.get_json()["responses"]}
+    assert [r["id"] for r in response.get_json()["responses"]][:2] == ["stats", "today"]
+    assert results["stats"]["body"]["total_jobs"] >= 2
+    assert [j["title"] for j in results["today"]["body"]["jobs"]] == ["Batch today"]
+    assert "Batch elbows" in [i["name"] for i in results["low"]["body"]["items"]]
+    assert "Batch Customer" in [c["name"] for c in results["customers"]["body"]["customers"]]
+    assert results["missing"]["status"] == 404
+    assert results["add"]["body"]["response"].startswith("Added item Batch hangers")
+    with app.app_context():
+        assert InventoryItem.query.filter_by(name="Batch hangers").count() == 1
+
+    assert client.post("/api/batch", json={"requests": []}).status_code == 400
+    assert client.post("/api/batch", json={"requests": [{"path": "/api/batch", "method": "POST"}]}).status_code == 400
+
+
+def test_parallel_ai_sub_requests_overlap(client, monkeypatch):
+    def slow_answer(question):
+        time.sleep(0.3)
+        return f"Answer to {question}"
+
+    monkeypatch.setattr(routes, "help_answer", slow_answer)
+    client.post('/login', data={'password': 'NAO$'})
+    requests = [{"id": n, "method": "POST", "path": "/api/ai/help", "body": {"question": f"q{n}"}} for n in range(3)]
+    started = time.perf_counter()
+    results = client.post("/api/batch", json={"requests": requests, "parallel": True}).get_json()["responses"]
+    elapsed = time.perf_counter() - started
+    assert [r["body"]["answer"] for r in results] == ["Answer to q0", "Answer to q1", "Answer to q2"]
+    assert elapsed < 0.8
+
+
+def test_batch_requires_login(app):
+    assert app.test_client().post("/api/batch", json={"requests": [{"path": "/api/customers"}]}).status_code == 302
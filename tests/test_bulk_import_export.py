@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+
+from app.extensions import db
+from app.models import Customer, Job, Material
+
+
+def test_import_reports_bad_rows_and_export_streams(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    lines = [
+        {"name": "Bulk One", "address": "1 Bulk Rd", "phone": "555-0101"},
+        {"address": "no name"},
+        "not json",
+        {"name": "Bulk Two", "latitude": "41.5", "longitude": "-81.7"},
+        {"name": "Bulk Three", "latitude": "north"},
+    ]
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+    response = client.post("/api/import/customers", data=body, content_type="application/x-ndjson")
+    report = response.get_json()
+    assert report["inserted"] == 2 and report["failed"] == 3
+    assert [e["row"] for e in report["errors"]] == [2, 3, 5]
+    assert "name is required" in report["errors"][0]["error"]
+
+    with app.app_context():
+        two = Customer.query.filter_by(name="Bulk Two").one()
+        assert two.geohash and two.geohash.startswith("dp")
+        customer_id = two.id
+
+    jobs_csv = io.StringIO()
+    writer = csv.writer(jobs_csv)
+    writer.writerow(["customer_id", "title", "scheduled_date", "status", "total_cost"])
+    writer.writerow([customer_id, "Imported cleaning", "2026-04-02", "completed", "120"])
+    writer.writerow([999999, "Orphan", "", "", ""])
+    writer.writerow([customer_id, "Bad date", "04/02/2026", "", ""])
+    writer.writerow([customer_id, "Defaults", "", "", ""])
+    response = client.post("/api/import/jobs?format=csv", data=jobs_csv.getvalue(), content_type="text/csv")
+    report = response.get_json()
+    assert report["inserted"] == 2
+    assert {e["row"] for e in report["errors"]} == {2, 3}
+    with app.app_context():
+        defaults = Job.query.filter_by(title="Defaults").one()
+        assert (defaults.status, defaults.total_cost) == ("scheduled", 0.0)
+
+    dry = client.post("/api/import/materials?dry_run=1", data='{"name": "Dry"}', content_type="application/x-ndjson")
+    assert dry.get_json()["inserted"] == 1
+
+    exported = client.get("/api/export/customers")
+    assert exported.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in exported.get_data(as_text=True).splitlines()]
+    assert {"Bulk One", "Bulk Two"} <= {row["name"] for row in rows}
+    materials = client.get("/api/export/materials?format=csv").get_data(as_text=True)
+    assert "Dry" not in materials and materials.startswith("id,name,unit")
+
+    assert client.get("/api/export/invoices").status_code == 404
+    assert client.post("/api/import/customers?format=xml", data="").status_code == 400
+
+
+def test_non_string_and_non_finite_values_are_row_errors(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    with app.app_context():
+        customer = Customer(name="Typed Import", address="3 Type St")
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = customer.id
+    lines = [
+        {"customer_id": customer_id, "title": "Numeric status", "status": 5},
+        {"customer_id": customer_id, "title": "NaN cost", "total_cost": "nan"},
+        {"customer_id": customer_id, "title": "Infinite cost", "total_cost": "1e400"},
+        {"customer_id": customer_id + 0.9, "title": "Fractional customer"},
+        {"customer_id": float(customer_id), "title": "Whole float customer", "status": " completed "},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+    response = client.post("/api/import/jobs", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["inserted"] == 1
+    assert [e["row"] for e in report["errors"]] == [1, 2, 3, 4]
+    assert report["errors"][0]["error"].startswith("status must be one of")
+    assert report["errors"][1]["error"] == "total_cost must be a finite number"
+    assert report["errors"][3]["error"] == "customer_id must be an integer"
+    with app.app_context():
+        assert Job.query.filter_by(title="Whole float customer").one().status == "completed"
+
+
+def test_unparseable_input_reports_what_was_already_committed(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    app.config["BULK_IMPORT_CHUNK_ROWS"] = 2
+    try:
+        # Five chunks of two commit together; the broken row 13 is in the next batch
+        rows = [f"Partial {n}" for n in range(1, 13)] + ["x" * 140000, "Partial 14"]
+        body = "name\n" + "\n".join(rows) + "\n"
+        response = client.post("/api/import/materials?format=csv", data=body, content_type="text/csv")
+    finally:
+        app.config["BULK_IMPORT_CHUNK_ROWS"] = 1000
+    assert response.status_code == 400
+    data = response.get_json()
+    assert "field larger than field limit" in data["error"]
+    assert data["report"]["inserted"] == 10 and data["report"]["committed_through_row"] == 10
+    with app.app_context():
+        names = {m.name for m in Material.query.filter(Material.name.like("Partial %"))}
+    assert names == {f"Partial {n}" for n in range(1, 11)}
@@ -0,0 +1,84 @@
+from datetime import date
+
+from app import ics
+from app.extensions import db
+from app.models import Customer, Job
+
+
+def _events(body):
+    return [block for block in body.split("BEGIN:VEVENT")[1:]]
+
+
+def test_feed_is_cached_per_month_and_answers_304(client, app):
+    today = date.today()
+    with app.app_context():
+        customer = Customer(name="Feed; Customer, Inc", address="12 Gutter Way")
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add_all([
+            Job(customer_id=customer.id, title="Feed clean", scheduled_date=today, status="scheduled"),
+            Job(customer_id=customer.id, title="Feed cancelled", scheduled_date=today, status="cancelled"),
+            Job(customer_id=customer.id, title="Feed far future", scheduled_date=date(2031, 3, 4)),
+        ])
+        db.session.commit()
+        customer_id = customer.id
+        cache = ics.get_month_cache(app)
+
+    client.post('/login', data={'password': 'NAO$'})
+    response = client.get(f"/calendar.ics?customer_id={customer_id}")
+    assert response.status_code == 200 and response.mimetype == "text/calendar"
+    body = response.get_data(as_text=True)
+    assert body.startswith("BEGIN:VCALENDAR\r\n") and body.endswith("END:VCALENDAR\r\n")
+    assert "SUMMARY:Feed clean - Feed\\; Customer\\, Inc" in body
+    assert f"DTSTART;VALUE=DATE:{today:%Y%m%d}" in body
+    assert "STATUS:CANCELLED" in body and "Feed far future" not in body
+    etag = response.headers["ETag"]
+
+    builds = cache.builds
+    again = client.get(f"/calendar.ics?customer_id={customer_id}", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["ETag"] == etag and not again.data
+    assert cache.builds == builds
+
+    # A change in one month rebuilds only that month and changes the tag
+    with app.app_context():
+        Job.query.filter_by(title="Feed clean").one().title = "Feed clean gutters"
+        db.session.commit()
+    changed = client.get(f"/calendar.ics?customer_id={customer_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert "Feed clean gutters" in changed.get_data(as_text=True)
+    assert cache.builds == builds + 1
+
+    scheduled = client.get(f"/calendar.ics?customer_id={customer_id}&status=scheduled").get_data(as_text=True)
+    assert len(_events(scheduled)) == 1 and "CANCELLED" not in scheduled
+
+    ranged = client.get(f"/calendar.ics?customer_id={customer_id}&start=2031-03&months=1").get_data(as_text=True)
+    assert [e for e in _events(ranged) if "Feed far future" in e] and len(_events(ranged)) == 1
+    assert client.get("/calendar.ics?start=March").status_code == 400
+    # The window stops at the last month a date can hold
+    edge = client.get("/calendar.ics?start=9999-12&months=6")
+    assert edge.status_code == 200 and _events(edge.get_data(as_text=True)) == []
+    assert client.get("/calendar.ics?start=0000-01").status_code == 400
+    for query in ("year=10000&month=1", "year=2026&month=13", "year=0&month=1"):
+        assert client.get(f"/calendar?{query}").status_code == 400, query
+    assert client.get("/calendar?year=9999&month=12").status_code == 200
+
+    page = client.get(f"/calendar?year={today.year}&month={today.month}").get_data(as_text=True)
+    assert "Feed clean gutters - Feed; Customer, Inc" in page
+
+
+def test_phone_subscriptions_use_the_feed_token(app):
+    phone = app.test_client()
+    assert phone.get("/calendar.ics").status_code == 403
+    app.config["CALENDAR_FEED_TOKEN"] = "crew-lead-secret"
+    try:
+        assert phone.get("/calendar.ics?token=wrong").status_code == 403
+        assert phone.get("/calendar.ics?token=crew-lead-secret").status_code == 200
+    finally:
+        app.config["CALENDAR_FEED_TOKEN"] = None
+
+
+def test_long_lines_are_folded():
+    line = "DESCRIPTION:" + "é" * 80
+    folded = ics.fold(line)
+    assert all(len(part.encode("utf-8")) <= 75 for part in folded.split("\r\n"))
+    assert folded.replace("\r\n ", "") == line
@@ -0,0 +1,98 @@
+import sqlite3
+
+from sqlalchemy import create_engine, event, inspect
+
+from app.extensions import db
+from app.models import Customer, InventoryAudit, InventoryItem, Job, JobMaterial, JobPhoto
+from app.schema import upgrade_foreign_keys
+from app.search import get_index
+
+
+def _customer_with_history(name):
+    customer = Customer(name=name, address="1 Cascade Ct")
+    db.session.add(customer)
+    db.session.flush()
+    for n in range(3):
+        job = Job(customer_id=customer.id, title=f"Job {n}")
+        db.session.add(job)
+        db.session.flush()
+        db.session.add(JobMaterial(job_id=job.id, name="Downspout", quantity=1, unit_cost=5, total_cost=5))
+        db.session.add(JobPhoto(job_id=job.id, photo_data="data:image/jpeg;base64,AAAA"))
+    item = InventoryItem(name="Hanger", quantity=10, owner_id=customer.id)
+    db.session.add(item)
+    db.session.flush()
+    db.session.add(InventoryAudit(item_id=item.id, action="created", owner_id=customer.id))
+    db.session.commit()
+    return customer.id
+
+
+def test_delete_customer_is_one_statement(client, app):
+    with app.app_context():
+        customer_id = _customer_with_history("Cascade Customer")
+        assert get_index().search("Cascade Customer")
+
+    client.post('/login', data={'password': 'NAO$'})
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            response = client.get(f"/customers/delete/{customer_id}")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+    assert response.status_code == 302
+    # Besides the DELETE, only the read of archived jobs whose rollups must drop
+    others = [s for s in statements if not s.lstrip().upper().startswith("DELETE FROM CUSTOMER")]
+    assert len(others) == 1 and "FROM archived_job" in others[0]
+
+    with app.app_context():
+        assert db.session.get(Customer, customer_id) is None
+        assert Job.query.filter_by(customer_id=customer_id).count() == 0
+        assert InventoryItem.query.filter_by(owner_id=customer_id).count() == 0
+        assert JobMaterial.query.filter(~JobMaterial.job_id.in_(db.select(Job.id))).count() == 0
+        assert JobPhoto.query.filter(~JobPhoto.job_id.in_(db.select(Job.id))).count() == 0
+        audit = InventoryAudit.query.filter_by(owner_id=customer_id).one()
+        assert audit.item_id is None
+        assert not get_index().search("Cascade Customer")
+
+    assert client.get(f"/customers/delete/{customer_id}").status_code == 404
+
+
+def test_upgrade_recreates_old_foreign_keys(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE customer (id INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL);
+        CREATE TABLE job (id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL REFERENCES customer (id),
+                          title VARCHAR(200) NOT NULL);
+        INSERT INTO customer VALUES (1, 'Old Customer');
+        INSERT INTO job VALUES (1, 1, 'Old job');
+    """)
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    assert "job foreign keys" in upgrade_foreign_keys(engine)
+    [fk] = inspect(engine).get_foreign_keys("job")
+    assert fk["options"]["ondelete"] == "CASCADE"
+    with engine.begin() as conn:
+        assert conn.exec_driver_sql("SELECT title FROM job").scalar() == "Old job"
+        conn.exec_driver_sql("DELETE FROM customer WHERE id = 1")
+        assert conn.exec_driver_sql("SELECT count(*) FROM job").scalar() == 0
+    assert upgrade_foreign_keys(engine) == []
+    engine.dispose()
+
+
+def test_job_for_a_missing_customer_is_rejected(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    response = client.post("/jobs/add", data={"customer_id": "987654", "title": "Orphan", "description": ""})
+    assert response.status_code == 404
+    assert client.post("/jobs/add", data={"customer_id": "abc", "title": "Orphan", "description": ""}).status_code == 400
+    with app.app_context():
+        assert Job.query.filter_by(title="Orphan").count() == 0
+        customer_id = _customer_with_history("Job Owner")
+    response = client.post("/jobs/add", data={"customer_id": str(customer_id), "title": "Owned", "description": ""})
+    assert response.status_code == 302
@@ -0,0 +1,66 @@
+import random
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.commands import compress_text_columns_command
+from app.compression import MARKER, compress, decompress
+from app.extensions import db
+from app.models import Customer, Job
+
+
+def test_round_trip_and_short_values():
+    prose = "Replace 40ft of K-style gutter and re-pitch the downspouts. " * 40
+    packed = compress(prose)
+    assert packed.startswith(MARKER)
+    assert len(packed) < len(prose) / 3
+    assert decompress(packed) == prose
+    assert compress("short") == "short"
+    assert decompress("legacy raw text") == "legacy raw text"
+
+
+def test_columns_compress_at_rest_and_backfill(app):
+    estimate = "Estimate: labor 3h, materials $120, seamless aluminum. " * 50
+    with app.app_context():
+        customer = Customer(name="Compressed Customer")
+        db.session.add(customer)
+        db.session.flush()
+        job = Job(customer_id=customer.id, title="Compressed", ai_estimate=estimate)
+        legacy = Job(customer_id=customer.id, title="Legacy")
+        db.session.add_all([job, legacy])
+        db.session.commit()
+        # A row written before the column was compressed
+        db.session.execute(
+            text("UPDATE job SET notes = :notes, updated_at = :at WHERE id = :id"),
+            {"notes": estimate, "at": datetime(2020, 5, 1, 8, 30), "id": legacy.id},
+        )
+        db.session.commit()
+
+        stored = db.session.execute(text("SELECT ai_estimate FROM job WHERE id = :id"), {"id": job.id}).scalar()
+        assert stored.startswith(MARKER)
+        db.session.expire_all()
+        assert db.session.get(Job, job.id).ai_estimate == estimate
+        assert db.session.get(Job, legacy.id).notes == estimate
+        # Long but incompressible: stays raw and is not counted
+        noise = Job(customer_id=customer.id, title="Noise")
+        db.session.add(noise)
+        db.session.flush()
+        rng = random.Random(7)
+        random_text = "".join(chr(rng.randrange(33, 127)) for _ in range(2000))
+        db.session.execute(text("UPDATE job SET ai_estimate = :v WHERE id = :id"), {"v": random_text, "id": noise.id})
+        db.session.commit()
+        assert not compress(random_text).startswith(MARKER)
+        job_ids = (job.id, legacy.id)
+
+    result = app.test_cli_runner().invoke(compress_text_columns_command, ["--no-vacuum"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert "job.notes: compressed 1 row(s)." in lines
+    assert "job.ai_estimate: compressed 0 row(s)." in lines
+
+    with app.app_context():
+        stored = db.session.execute(text("SELECT notes FROM job WHERE id = :id"), {"id": job_ids[1]}).scalar()
+        assert stored.startswith(MARKER)
+        assert db.session.get(Job, job_ids[1]).notes == estimate
+        # Compressing is not an edit
+        assert db.session.get(Job, job_ids[1]).updated_at == datetime(2020, 5, 1, 8, 30)
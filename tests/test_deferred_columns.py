@@ -0,0 +1,58 @@
+import re
+from datetime import date
+
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Customer, Job, JobPhoto
+
+LARGE_COLUMNS = [
+    "job.description", "job.ai_estimate", "job.notes",
+    "job_photo.photo_data", "job_photo.ai_analysis", "customer.notes",
+]
+# The list previews read a truncated substr() of a column, never the column
+FETCHED = re.compile(r"(?<!substr\()\b(" + "|".join(re.escape(c) for c in LARGE_COLUMNS) + r")\b")
+
+
+def _capture(app, fetch):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            response = fetch()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+    assert response.status_code == 200
+    return response, statements
+
+
+def test_list_pages_never_fetch_large_columns(client, app):
+    with app.app_context():
+        customer = Customer(name="Deferred Customer", address="5 Lazy Ln", notes="gate code " + "x" * 500)
+        db.session.add(customer)
+        db.session.flush()
+        job = Job(customer_id=customer.id, title="Deferred job", scheduled_date=date.today(),
+                  description="long " * 200, ai_estimate="estimate " * 200, notes="note " * 200)
+        db.session.add(job)
+        db.session.flush()
+        db.session.add(JobPhoto(job_id=job.id, photo_data="data:image/jpeg;base64," + "A" * 5000, ai_analysis="ok"))
+        db.session.commit()
+        job_id = job.id
+
+    client.post('/login', data={'password': 'NAO$'})
+    for path in ("/jobs", "/customers", "/dashboard", "/reports", "/calendar"):
+        response, statements = _capture(app, lambda: client.get(path))
+        fetched = [s for s in statements if FETCHED.search(s)]
+        assert fetched == [], path
+
+    response, _ = _capture(app, lambda: client.get("/jobs"))
+    assert b"long long" in response.data
+    assert b"long " * 200 not in response.data
+
+    response, statements = _capture(app, lambda: client.get(f"/jobs/{job_id}"))
+    assert b"estimate estimate" in response.data or b"note note" in response.data
+    assert len([s for s in statements if "FROM job_photo" in s]) == 1
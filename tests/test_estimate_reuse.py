@@ -0,0 +1,52 @@
+from app import routes
+from app.estimates import shingles
+from app.extensions import db
+from app.models import Customer, Job
+
+
+def test_near_duplicate_jobs_reuse_the_earlier_estimate(client, app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(routes, "get_ai_estimate", lambda description, address: calls.append(description) or f"Quote for {description}")
+    with app.app_context():
+        customer = Customer(name="Reuse Customer", address="8 Shingle St")
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = customer.id
+
+    client.post('/login', data={'password': 'NAO$'})
+
+    def add_job(title, description):
+        client.post("/jobs/add", data={
+            "customer_id": customer_id, "title": title, "description": description, "use_ai_estimate": "on",
+        })
+        with app.app_context():
+            job = Job.query.filter_by(title=title).one()
+            return job.ai_estimate, job.estimate_reused_from, job.id
+
+    estimate, reused_from, first_id = add_job("Original", "Clean 150 feet of gutters on a two-story house, flush downspouts")
+    assert reused_from is None and len(calls) == 1
+
+    estimate, reused_from, _ = add_job("Repeat", "clean 150 ft of gutters on a two story house; flush downspouts!")
+    assert reused_from == first_id and estimate.startswith("Quote for Clean 150 feet")
+    assert len(calls) == 1
+
+    # A different footage is a different job
+    _, reused_from, _ = add_job("Smaller", "Clean 50 feet of gutters on a one-story house, flush downspouts")
+    assert reused_from is None and len(calls) == 2
+
+    response = client.post("/api/ai/estimate", json={"description": "Clean 150 ft of gutters on a two-story house, flush downspouts"})
+    data = response.get_json()
+    assert data["reused"] is True and data["reused_from_job"] == first_id and data["similarity"] >= 0.8
+    assert len(calls) == 2
+
+    app.config["ESTIMATE_REUSE_THRESHOLD"] = 1.01
+    try:
+        data = client.post("/api/ai/estimate", json={"description": "Clean 150 ft of gutters on a two-story house, flush downspouts"}).get_json()
+        assert data["reused"] is False and len(calls) == 3
+    finally:
+        app.config["ESTIMATE_REUSE_THRESHOLD"] = 0.8
+
+
+def test_shingles_fold_units_and_plurals():
+    assert shingles("150 feet of gutters") == shingles("150 ft of gutter")
+    assert shingles("replace 3 downspouts") != shingles("replace 4 downspouts")
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from app.fake_model import FakeGenerativeModel, FakeModelError
+
+
+def test_same_seed_replays_same_failures_and_replies():
+    runs = []
+    for _ in range(2):
+        model = FakeGenerativeModel(error_rate=0.3, seed=7)
+        outcome = []
+        for _ in range(20):
+            try:
+                outcome.append(model.generate_content("hello").text)
+            except FakeModelError:
+                outcome.append("error")
+        runs.append(outcome)
+    assert runs[0] == runs[1]
+    assert "error" in runs[0]
+
+
+def test_canned_replies_streaming_and_image_parts():
+    model = FakeGenerativeModel(responses={"downspout": "Use 2x3 aluminum downspouts every 35 feet of gutter run."})
+    chunks = [chunk.text for chunk in model.generate_content("Which downspout size?", stream=True)]
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Use 2x3 aluminum downspouts every 35 feet of gutter run."
+
+    reply = model.generate_content(["Analyze inventory image", {"mime_type": "image/jpeg", "data": b"\xff\xd8"}])
+    assert "1 image(s)" in reply.text
+
+
+def test_async_client_and_latency_spec():
+    model = FakeGenerativeModel(latency="uniform:0,0.01")
+    assert asyncio.run(model.generate_content_async("ping")).text.startswith("Fake response")
+    with pytest.raises(ValueError):
+        FakeGenerativeModel(latency="weibull:1,2")
@@ -0,0 +1,48 @@
+from app import metrics, routes
+
+
+def test_how_to_questions_are_answered_locally(client, app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(routes, "chat_reply", lambda message: calls.append(message) or "From the model")
+    client.post('/login', data={'password': 'NAO$'})
+    before = metrics.snapshot()["counters"]
+
+    def ask(message):
+        return client.post("/api/chat", json={"message": message}).get_json()["response"]
+
+    assert ask("How do I schedule a job?").startswith("Open Jobs, fill in Create New Job")
+    assert "inventory-add" in ask("how do i add inventory")
+    # Help page cards with a data-answer are indexed too
+    assert "APP_PASSWORD" in ask("How do I set the password?")
+    assert calls == []
+
+    assert ask("What materials do I need for 150 feet of gutter on a two story house?") == "From the model"
+    assert ask("hello") == "From the model"
+    assert len(calls) == 2
+
+    after = metrics.snapshot()
+    counters = after["counters"]
+    assert counters["chat.route.faq"] - before.get("chat.route.faq", 0) == 3
+    assert counters["chat.route.llm"] - before.get("chat.route.llm", 0) == 2
+    assert 0 <= after["values"]["chat.faq_hit"]["mean"] <= 1
+
+    app.config["FAQ_MIN_CONFIDENCE"] = 1.01
+    try:
+        assert ask("How do I schedule a job?") == "From the model"
+    finally:
+        app.config["FAQ_MIN_CONFIDENCE"] = 0.6
+
+
+def test_data_requests_go_to_the_model(client, app, monkeypatch):
+    monkeypatch.setattr(routes, "chat_reply", lambda message: "From the model")
+    client.post('/login', data={'password': 'NAO$'})
+    for message in (
+        "show me low stock inventory",
+        "mark job 5 completed",
+        "what jobs are scheduled today",
+        "add a job for Smith on Friday",
+    ):
+        assert client.post("/api/chat", json={"message": message}).get_json()["response"] == "From the model"
+    assert client.post("/api/chat", json={"message": "where do I see revenue?"}).get_json()["response"].startswith(
+        "Open Reports"
+    )
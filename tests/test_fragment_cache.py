@@ -0,0 +1,119 @@
+from jinja2 import ChoiceLoader, DictLoader
+
+from app import create_app
+from app.extensions import db
+from app.fragments import get_fragment_cache
+from app.models import Customer, Job
+
+
+def _app(**config):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'APP_PASSWORD': 'NAO$',
+        **config,
+    })
+
+
+def _seed(app, jobs=1000):
+    with app.app_context():
+        customers = [Customer(name=f"Row customer {n}", address=f"{n} Cache Ct") for n in range(50)]
+        db.session.add_all(customers)
+        db.session.flush()
+        db.session.add_all([
+            Job(customer_id=customers[n % 50].id, title=f"Row job {n}", description="Clean and flush " * 10,
+                total_cost=n)
+            for n in range(jobs)
+        ])
+        db.session.commit()
+
+
+def test_rows_are_served_from_cache_until_they_change():
+    app = _app()
+    _seed(app)
+    cache = get_fragment_cache(app)
+    client = app.test_client()
+    client.post('/login', data={'password': 'NAO$'})
+
+    first = client.get("/jobs").data
+    assert cache.stats()["misses"] == 1000
+    assert client.get("/jobs").data == first
+    assert cache.stats()["memory_hits"] == 1000
+
+    with app.app_context():
+        job = Job.query.filter_by(title="Row job 7").one()
+        job.title = "Row job seven"
+        customer = db.session.get(Customer, job.customer_id)
+        customer.name = "Renamed customer"
+        db.session.commit()
+    page = client.get("/jobs").data.decode()
+    assert "Row job seven" in page and "Row job 7<" not in page
+    # The rename touches every job of that customer (1000 / 50), and nothing else
+    assert cache.stats()["misses"] == 1000 + 20
+
+    client.get("/customers")
+    client.get("/customers")
+    stats = client.get("/admin/metrics").get_json()["fragment_cache"]
+    assert stats["memory_hits"] == 1000 + 980 + 50
+    assert 0 < stats["hit_rate"] < 1
+
+
+def test_lru_is_bounded_and_shared_tier_fills_other_workers(tmp_path):
+    shared = str(tmp_path / "fragments.db")
+    one = _app(FRAGMENT_CACHE_SIZE=100, FRAGMENT_CACHE_DB=shared)
+    _seed(one, jobs=300)
+    client = one.test_client()
+    client.post('/login', data={'password': 'NAO$'})
+    page = client.get("/jobs").data
+    assert get_fragment_cache(one).stats()["entries"] == 100
+
+    # Another worker with the same rows finds them in the shared table
+    two = _app(FRAGMENT_CACHE_DB=shared)
+    with one.app_context():
+        rows = [(j.customer_id, j.title, j.created, j.updated_at) for j in Job.query.order_by(Job.id)]
+        customers = [(c.id, c.name, c.address, c.created, c.updated_at) for c in Customer.query.order_by(Customer.id)]
+    with two.app_context():
+        db.session.add_all([Customer(id=i, name=n, address=a, created=c, updated_at=u) for i, n, a, c, u in customers])
+        db.session.add_all([
+            Job(customer_id=cid, title=t, description="Clean and flush " * 10, total_cost=n, created=c, updated_at=u)
+            for n, (cid, t, c, u) in enumerate(rows)
+        ])
+        db.session.commit()
+    other = two.test_client()
+    other.post('/login', data={'password': 'NAO$'})
+    assert other.get("/jobs").data == page
+    assert get_fragment_cache(two).stats()["shared_hits"] == 300
+
+
+def test_disabled_cache_still_renders():
+    app = _app(FRAGMENT_CACHE_SIZE=0)
+    _seed(app, jobs=3)
+    assert get_fragment_cache(app) is None
+    client = app.test_client()
+    client.post('/login', data={'password': 'NAO$'})
+    assert b"Row job 2" in client.get("/jobs").data
+
+
+def test_changed_template_markup_is_not_served_from_the_shared_tier(tmp_path):
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'FRAGMENT_CACHE_DB': str(tmp_path / "fragments.db"),
+    }
+    before = _app(**config)
+    _seed(before, jobs=5)
+    client = before.test_client()
+    client.post('/login', data={'password': 'NAO$'})
+    assert b"<strong>Customer:</strong>" in client.get("/jobs").data
+
+    # Next deploy: same rows, same shared store, new row markup
+    after = _app(**config)
+    source = after.jinja_loader.get_source(after.jinja_env, "jobs.html")[0]
+    after.jinja_loader = ChoiceLoader([
+        DictLoader({"jobs.html": source.replace("<strong>Customer:</strong>", "<strong>Client:</strong>")}),
+        after.jinja_loader,
+    ])
+    client = after.test_client()
+    client.post('/login', data={'password': 'NAO$'})
+    page = client.get("/jobs").data
+    assert page.count(b"<strong>Client:</strong>") == 5 and b"<strong>Customer:</strong>" not in page
+    assert get_fragment_cache(after).stats()["shared_hits"] == 0
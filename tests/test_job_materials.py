@@ -0,0 +1,83 @@
+import pytest
+from app.models import Customer, Job, Material, InventoryItem, JobMaterial
+from app.extensions import db
+from app.ledger import reconcile_job_totals
+
+
+@pytest.fixture()
+def job_setup(app):
+    with app.app_context():
+        customer = Customer(name="Ledger Customer", address="1 Ledger Ln")
+        db.session.add(customer)
+        db.session.commit()
+        gutter = Material(name="K-Style Gutter", unit="ft", unit_cost=4.5)
+        elbow = Material(name="Elbow", unit="each", unit_cost=3.0)
+        job = Job(customer_id=customer.id, title="Install gutters", total_cost=0.0)
+        stock = InventoryItem(name="k-style gutter", quantity=100, owner_id=customer.id)
+        db.session.add_all([gutter, elbow, job, stock])
+        db.session.commit()
+        return {"job_id": job.id, "gutter_id": gutter.id, "elbow_id": elbow.id, "stock_id": stock.id}
+
+
+def test_add_update_remove_keep_total_and_stock(client, app, job_setup):
+    client.post('/login', data={'password': 'NAO$'})
+    url = f"/api/jobs/{job_setup['job_id']}/materials"
+
+    response = client.post(url, json={"materials": [
+        {"material_id": job_setup["gutter_id"], "quantity": 40},
+        {"material_id": job_setup["elbow_id"], "quantity": 4},
+    ]})
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data["total_cost"] == pytest.approx(40 * 4.5 + 4 * 3.0)
+    gutter_line = next(line for line in data["materials"] if line["name"] == "K-Style Gutter")
+
+    response = client.patch(url, json={"materials": [{"id": gutter_line["id"], "quantity": 50}]})
+    assert response.status_code == 200
+    assert response.get_json()["total_cost"] == pytest.approx(50 * 4.5 + 4 * 3.0)
+
+    response = client.delete(url, json={"ids": [gutter_line["id"]]})
+    assert response.status_code == 200
+    assert response.get_json()["total_cost"] == pytest.approx(4 * 3.0)
+
+    with app.app_context():
+        assert db.session.get(InventoryItem, job_setup["stock_id"]).quantity == pytest.approx(100)
+
+
+def test_insufficient_stock_rolls_back_whole_batch(client, app, job_setup):
+    client.post('/login', data={'password': 'NAO$'})
+    response = client.post(f"/api/jobs/{job_setup['job_id']}/materials", json={"materials": [
+        {"material_id": job_setup["elbow_id"], "quantity": 2},
+        {"material_id": job_setup["gutter_id"], "quantity": 500},
+    ]})
+    assert response.status_code == 409
+
+    with app.app_context():
+        assert JobMaterial.query.filter_by(job_id=job_setup["job_id"]).count() == 0
+        assert db.session.get(InventoryItem, job_setup["stock_id"]).quantity == pytest.approx(100)
+        assert db.session.get(Job, job_setup["job_id"]).total_cost == 0.0
+
+
+def test_non_finite_quantities_are_rejected(client, app, job_setup):
+    client.post('/login', data={'password': 'NAO$'})
+    url = f"/api/jobs/{job_setup['job_id']}/materials"
+    for quantity in ("nan", "inf", "-inf", "1e400"):
+        response = client.post(url, json={"materials": [{"material_id": job_setup["elbow_id"], "quantity": quantity}]})
+        assert response.status_code == 400, quantity
+
+    with app.app_context():
+        assert JobMaterial.query.filter_by(job_id=job_setup["job_id"]).count() == 0
+        assert db.session.get(Job, job_setup["job_id"]).total_cost == 0.0
+
+
+def test_reconcile_fixes_drifted_totals(app, job_setup):
+    with app.app_context():
+        db.session.add(JobMaterial(job_id=job_setup["job_id"], name="Elbow", quantity=2, unit_cost=3.0, total_cost=6.0))
+        untracked = Job(customer_id=db.session.get(Job, job_setup["job_id"]).customer_id, title="Manual", total_cost=99.0)
+        db.session.add(untracked)
+        db.session.commit()
+
+        assert reconcile_job_totals() == 1
+        db.session.commit()
+        assert db.session.get(Job, job_setup["job_id"]).total_cost == pytest.approx(6.0)
+        assert db.session.get(Job, untracked.id).total_cost == pytest.approx(99.0)
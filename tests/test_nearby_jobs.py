@@ -0,0 +1,60 @@
+import random
+from datetime import date
+
+from app.extensions import db
+from app.geo import GeoIndex, geohash, haversine_km
+from app.models import Customer, GeocodeEntry, Job
+
+
+def test_geohash_and_index_match_brute_force():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    rng = random.Random(7)
+    points = [(i, 40 + rng.uniform(-1, 1), -75 + rng.uniform(-1, 1)) for i in range(5000)]
+    index = GeoIndex()
+    index.build(points)
+    for lat, lon, km in [(40.0, -75.0, 5), (40.3, -74.6, 25), (39.1, -75.9, 12)]:
+        expected = {i for i, plat, plon in points if haversine_km(lat, lon, plat, plon) <= km}
+        assert {i for i, _ in index.within(lat, lon, km)} == expected
+    # A box far wider than the populated cells scans only those
+    expected = {i for i, plat, plon in points if haversine_km(41.0, -75.0, plat, plon) <= 150}
+    assert {i for i, _ in index.within(41.0, -75.0, 150)} == expected
+    assert len(index.within(0.0, 0.0, 20000)) == 5000
+
+
+def test_nearby_jobs_api(client, app):
+    with app.app_context():
+        db.session.add_all([
+            GeocodeEntry(address_key="1 main st springfield", latitude=39.7817, longitude=-89.6501),
+            GeocodeEntry(address_key="20 oak ave springfield", latitude=39.8017, longitude=-89.6437),
+            GeocodeEntry(address_key="5 lake rd chicago", latitude=41.8781, longitude=-87.6298),
+        ])
+        db.session.commit()
+
+    client.post('/login', data={'password': 'NAO$'})
+    for name, address in [("Home", "1 Main St, Springfield"), ("Near", "20 Oak Ave Springfield"), ("Far", "5 Lake Rd Chicago")]:
+        client.post("/customers/add", data={"name": name, "address": address, "phone": "555"})
+
+    with app.app_context():
+        home, near, far = (Customer.query.filter_by(name=n).one() for n in ("Home", "Near", "Far"))
+        assert near.latitude == 39.8017 and near.geohash.startswith("dp0")
+        db.session.add_all([
+            Job(customer_id=near.id, title="Near in range", scheduled_date=date(2026, 5, 4)),
+            Job(customer_id=near.id, title="Near too late", scheduled_date=date(2026, 7, 1)),
+            Job(customer_id=far.id, title="Far in range", scheduled_date=date(2026, 5, 4)),
+        ])
+        db.session.commit()
+        home_id, near_id = home.id, near.id
+
+    response = client.get(f"/api/customers/{home_id}/nearby_jobs?km=10&start=2026-05-01&end=2026-05-31")
+    assert response.status_code == 200
+    jobs = response.get_json()["jobs"]
+    assert [job["title"] for job in jobs] == ["Near in range"]
+    assert 2.0 < jobs[0]["distance_km"] < 2.5
+
+    # Moving a customer updates the index on commit
+    client.post(f"/customers/edit/{near_id}", data={"name": "Near", "address": "5 Lake Rd Chicago", "phone": "555"})
+    response = client.get(f"/api/customers/{home_id}/nearby_jobs?km=10")
+    assert response.get_json()["jobs"] == []
+    for km in ("abc", "nan", "inf", "-inf", "0", "1e9", "200.5"):
+        assert client.get(f"/api/customers/{home_id}/nearby_jobs?km={km}").status_code == 400, km
+    assert client.get(f"/api/customers/{home_id}/nearby_jobs?km=200").status_code == 200
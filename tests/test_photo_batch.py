@@ -0,0 +1,44 @@
+import json
+
+from app import ai
+from app.fake_model import FakeGenerativeModel
+
+PIXEL = "data:image/gif;base64,R0lGODlhAQABAIABAP8AAP///yH5BAEKAAEALAAAAAABAAEAAAICTAEAOw=="
+
+
+class CountingModel(FakeGenerativeModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.image_counts = []
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.image_counts.append(sum(1 for part in contents if isinstance(part, dict)))
+        return super().generate_content(contents, stream=stream, **kwargs)
+
+
+def test_small_set_is_one_request(monkeypatch):
+    reply = json.dumps([{"image": n, "analysis": f"photo {n}: clogged"} for n in (1, 2, 3)])
+    model = CountingModel(responses={"JSON array": reply})
+    monkeypatch.setattr(ai, "gemini_model", model)
+
+    assert ai.analyze_photos([PIXEL] * 3, "Job: test") == ["photo 1: clogged", "photo 2: clogged", "photo 3: clogged"]
+    assert model.image_counts == [3]
+
+
+def test_incomplete_batch_reply_retries_missing_photos_singly(monkeypatch):
+    model = CountingModel(responses={"JSON array": '[{"image": 2, "analysis": "rusted seam"}]'})
+    monkeypatch.setattr(ai, "gemini_model", model)
+
+    results = ai.analyze_photos([PIXEL] * 3)
+    assert results[1] == "rusted seam"
+    assert all(results)
+    assert sorted(model.image_counts) == [1, 1, 3]
+
+
+def test_oversized_set_uses_parallel_single_calls(monkeypatch):
+    model = CountingModel()
+    monkeypatch.setattr(ai, "gemini_model", model)
+    monkeypatch.setitem(ai._settings, "PHOTO_BATCH_SIZE", 2)
+
+    assert len(ai.analyze_photos([PIXEL] * 5)) == 5
+    assert model.image_counts == [1] * 5
@@ -0,0 +1,56 @@
+import base64
+import io
+
+import pytest
+from app.models import Customer, Job, JobPhoto
+from app.extensions import db
+from app.photos import hamming_distance, photo_hash
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg_data_url(shift=0):
+    img = Image.new("L", (64, 64))
+    img.putdata([(x * 4 + y + shift) % 256 for y in range(64) for x in range(64)])
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90 - shift)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def test_near_identical_photos_hash_close():
+    original, reshot = photo_hash(_jpeg_data_url()), photo_hash(_jpeg_data_url(shift=2))
+    assert original.startswith("d:")
+    assert hamming_distance(original, reshot) <= 5
+
+
+def test_duplicate_upload_reuses_bytes_and_analysis(client, app, monkeypatch):
+    calls = []
+
+    def fake_analyze(photo_base64, context=""):
+        calls.append(context)
+        return "Sagging section, medium urgency"
+
+    monkeypatch.setattr("app.routes.analyze_photo", fake_analyze)
+    with app.app_context():
+        customer = Customer(name="Photo Customer", address="9 Lens Rd")
+        db.session.add(customer)
+        db.session.commit()
+        job = Job(customer_id=customer.id, title="Inspect gutters")
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+    client.post('/login', data={'password': 'NAO$'})
+    for shift in (0, 2):
+        response = client.post(f"/jobs/{job_id}/add_photo", data={
+            "photo_data": _jpeg_data_url(shift), "caption": "front", "analyze_photo": "on",
+        })
+        assert response.status_code == 302
+
+    assert len(calls) == 1
+    with app.app_context():
+        original, duplicate = JobPhoto.query.filter_by(job_id=job_id).order_by(JobPhoto.id).all()
+        assert duplicate.photo_data is None
+        assert duplicate.source_photo_id == original.id
+        assert duplicate.data == original.photo_data
+        assert duplicate.ai_analysis == original.ai_analysis
@@ -0,0 +1,81 @@
+import pytest
+
+from app import routes
+from app.commands import price_jobs_command
+from app.extensions import db
+from app.models import Material
+from app.pricing import PriceBook, get_price_book, parse_inputs
+
+
+def test_quote_follows_the_quick_estimate_rules():
+    book = PriceBook.from_catalog([], markup_percent=0, range_percent=10, labor_per_downspout=0)
+    quote = book.quote(parse_inputs({"linear_feet": 100, "downspouts": 2, "stories": "1"}))
+    costs = {line["item"]: (line["quantity"], line["cost"]) for line in quote["lines"]}
+    assert costs == {
+        "gutter_k5": (100, 125.0), "hanger": (50, 37.5), "downspout": (2, 9.0),
+        "elbow": (4, 16.0), "outlet": (2, 7.0), "splash_block": (2, 16.0),
+    }
+    assert quote["materials"] == 210.5 and quote["labor"] == 600.0
+    assert (quote["low"], quote["high"]) == (729.45, 891.55)
+
+    taller = book.quote(parse_inputs({"linear_feet": 100, "downspouts": 2, "stories": 2}))
+    assert taller["labor"] == 750.0 and {l["item"]: l["quantity"] for l in taller["lines"]}["downspout"] == 4
+
+
+def test_estimate_api_prices_from_catalog(client, app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(routes, "get_ai_estimate", lambda *args: calls.append(args) or "prose")
+    monkeypatch.setattr(routes, "get_estimate_narrative", lambda text, description: f"Narrative of {text.splitlines()[-1]}")
+    client.post('/login', data={'password': 'NAO$'})
+
+    def price(**payload):
+        return client.post("/api/ai/estimate", json=payload)
+
+    before = price(linear_feet=120, downspouts=3, gutter_type="k6").get_json()
+    assert before["provider"] == "RuleEngine" and "quote" in before
+    assert {l["item"]: l["source"] for l in before["quote"]["lines"]}["gutter_k6"] == "default"
+
+    with app.app_context():
+        db.session.add(Material(name='6" K-Style Gutter', unit="ft", unit_cost=2.75))
+        db.session.commit()
+    after = price(linear_feet=120, downspouts=3, gutter_type="k6").get_json()["quote"]
+    gutter = next(l for l in after["lines"] if l["item"] == "gutter_k6")
+    assert (gutter["unit_cost"], gutter["source"]) == (2.75, "catalog")
+    assert after["materials"] == round(before["quote"]["materials"] + 120 * 1.0, 2)
+
+    narrated = price(linear_feet=50, narrative=True, description="Front of house").get_json()
+    assert narrated["narrative"].startswith("Narrative of Total $")
+    assert calls == []
+
+    assert price(linear_feet=0).status_code == 400
+    assert price(linear_feet=100, downspouts="inf").status_code == 400
+    assert price(linear_feet=100, downspouts=2.9).status_code == 400
+    assert "gutter_type" in price(linear_feet=10, gutter_type="box").get_json()["error"]
+
+
+def test_price_jobs_command_quotes_in_bulk(app, tmp_path):
+    source = tmp_path / "jobs.csv"
+    source.write_text("linear_feet,downspouts,stories\n150,4,2\n80,2,1\n-5,1,1\n")
+    target = tmp_path / "quotes.csv"
+    result = app.test_cli_runner().invoke(price_jobs_command, [str(source), "-o", str(target)])
+    assert result.exit_code == 0, result.output
+    assert "Priced 2 job(s); 1 failed." in result.output
+    lines = target.read_text().strip().splitlines()
+    assert lines[0].startswith("row,linear_feet,stories")
+    assert len(lines) == 4 and "linear_feet must be greater than 0" in lines[3]
+
+
+@pytest.mark.parametrize("value", ["inf", "-inf", "nan", "2.9", 1e400])
+def test_counts_must_be_finite_whole_numbers(value):
+    with pytest.raises(ValueError, match="whole number"):
+        parse_inputs({"linear_feet": 100, "downspouts": value})
+    assert parse_inputs({"linear_feet": 100, "downspouts": "3.0"})["downspouts"] == 3
+
+
+def test_price_book_is_reread_after_its_ttl(app):
+    with app.app_context():
+        book = get_price_book(app)
+        assert get_price_book(app) is book
+        # Another worker's catalog edit is picked up once the book is old enough
+        book.built_at -= app.config["PRICE_BOOK_TTL"] + 1
+        assert get_price_book(app) is not book
@@ -0,0 +1,36 @@
+import json
+
+from app import ai, metrics
+from app.fake_model import FakeGenerativeModel
+from app.prompts import compact_jobs, estimate_tokens, schedule_prompt
+
+
+def _jobs(count):
+    return [
+        {"scheduled_date": f"2026-11-{1 + i % 20:02d}", "address": f"{i} Elm St, {'Tacoma' if i % 2 else 'Seattle'}, WA",
+         "title": f"Gutter cleaning #{i}", "status": "scheduled"}
+        for i in range(count)
+    ]
+
+
+def test_jobs_grouped_by_date_and_area():
+    summary = compact_jobs(_jobs(4) + [{"scheduled_date": "2026-11-01", "address": "7 Oak Ave, Seattle, WA", "title": "Repair"}], 500)
+    assert summary.splitlines()[0] == "2026-11-01 Seattle: 2 (Gutter cleaning #0; Repair)"
+    assert len(summary.splitlines()) == 4
+
+
+def test_schedule_prompt_stays_within_budget():
+    jobs = _jobs(2000)
+    prompt = schedule_prompt(jobs, "5 Pine Rd, Seattle, WA", budget_tokens=300)
+    assert "more jobs on" in prompt
+    assert estimate_tokens(prompt) < 420
+    assert estimate_tokens(prompt) < estimate_tokens(json.dumps(jobs)) / 50
+
+
+def test_prompt_size_recorded_per_call(monkeypatch):
+    monkeypatch.setattr(ai, "gemini_model", FakeGenerativeModel())
+    metrics.reset()
+    ai.chat_reply("How do I add a customer?")
+    stats = metrics.snapshot()
+    assert stats["counters"]["ai.calls.chat"] == 1
+    assert stats["values"]["ai.prompt_tokens.chat"]["total"] > estimate_tokens("How do I add a customer?")
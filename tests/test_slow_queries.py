@@ -0,0 +1,59 @@
+import json
+
+from app import create_app
+from app.extensions import db
+from app.models import Customer, Job
+from app.slowlog import normalize, parameter_shape
+
+
+def test_normalize_folds_literals_and_in_lists():
+    assert normalize("SELECT *\n  FROM job WHERE id IN (?, ?, ?) AND title = 'it''s' AND total_cost > 12.5") == (
+        "SELECT * FROM job WHERE id IN (?) AND title = ? AND total_cost > ?"
+    )
+    assert normalize("SELECT anon_1.job_id FROM t2 LIMIT 10") == "SELECT anon_1.job_id FROM t2 LIMIT ?"
+    assert parameter_shape((1, "a", None)) == ["int", "str", "NoneType"]
+    assert parameter_shape([(1,), (2,)], executemany=True) == {"rows": 2, "each": ["int"]}
+
+
+def test_slow_statements_are_logged_with_route_and_plan(tmp_path):
+    path = tmp_path / "slow.ndjson"
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'APP_PASSWORD': 'NAO$',
+        'SLOW_QUERY_MS': 0,
+        'SLOW_QUERY_LOG': str(path),
+    })
+    with app.app_context():
+        customer = Customer(name="Slow Customer", address="9 Plan St")
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(Job(customer_id=customer.id, title="Slow job"))
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'password': 'NAO$'})
+    client.get("/jobs")
+    client.get("/jobs")
+    client.get("/calendar")
+
+    queries = client.get("/admin/slow-queries").get_json()["queries"]
+    assert [q["total_ms"] for q in queries] == sorted((q["total_ms"] for q in queries), reverse=True)
+    jobs_query = next(q for q in queries if "FROM job LEFT OUTER JOIN customer" in q["sql"] and "GET main.jobs" in q["routes"])
+    assert jobs_query["routes"]["GET main.jobs"] == 2
+    assert jobs_query["plan"] and any("SCAN job" in line for line in jobs_query["plan"])
+    assert any("GET main.calendar" in q["routes"] for q in queries)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    logged = [line for line in lines if line["fingerprint"] == jobs_query["fingerprint"]]
+    assert len(logged) == 2 and logged[0]["plan"] and logged[1]["plan"] is None
+    assert logged[0]["route"] == "GET main.jobs" and logged[0]["ms"] >= 0
+    assert client.get("/admin/slow-queries?limit=1").get_json()["queries"] == queries[:1]
+
+
+def test_queries_under_the_threshold_are_not_recorded(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    client.get("/jobs")
+    data = client.get("/admin/slow-queries").get_json()
+    assert data["threshold_ms"] == 200 and data["log"] is None
+    assert all("GET main.jobs" not in q["routes"] for q in data["queries"])
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from app import create_app
+from app.extensions import db
+from app.models import InventoryItem
+from app.stock import EditConflict, adjust_stock, edit_item
+
+THREADS = 8
+ROUNDS = 25
+
+
+@pytest.fixture()
+def file_app(tmp_path):
+    # Threads need real connections; the shared in-memory database cannot take concurrent writers
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'stock.db'}",
+        'APP_PASSWORD': 'NAO$',
+        'STOCK_EDIT_RETRIES': 50,
+    })
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _hammer(app, work):
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def run(n):
+        with app.app_context():
+            start.wait()
+            try:
+                for r in range(ROUNDS):
+                    work(n, r)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_movements_and_edits_lose_nothing(file_app):
+    with file_app.app_context():
+        item = InventoryItem(name="Hidden hangers", quantity=1000, unit="each", location="barn")
+        db.session.add(item)
+        db.session.commit()
+        item_id = item.id
+        assert item.version == 1
+
+    def work(n, r):
+        if n % 4 == 3:
+            # Full edits of other fields race the movements without clobbering quantity
+            edit_item(item_id, {"notes": f"thread {n} round {r}"})
+        else:
+            adjust_stock(item_id, 3 if n % 2 else -2)
+            db.session.commit()
+
+    _hammer(file_app, work)
+    with file_app.app_context():
+        item = db.session.get(InventoryItem, item_id)
+        movers = [n for n in range(THREADS) if n % 4 != 3]
+        expected = 1000 + ROUNDS * sum(3 if n % 2 else -2 for n in movers)
+        assert item.quantity == expected
+        assert item.version == 1 + THREADS * ROUNDS
+
+
+def test_withdrawals_never_overdraw(file_app):
+    with file_app.app_context():
+        item = InventoryItem(name="End caps", quantity=50, unit="each")
+        db.session.add(item)
+        db.session.commit()
+        item_id = item.id
+    taken = []
+
+    def work(n, r):
+        try:
+            adjust_stock(item_id, -1)
+            db.session.commit()
+            taken.append(1)
+        except Exception:
+            db.session.rollback()
+
+    _hammer(file_app, work)
+    with file_app.app_context():
+        assert len(taken) == 50
+        assert db.session.get(InventoryItem, item_id).quantity == 0
+
+
+def test_stale_form_and_api(client, app):
+    with app.app_context():
+        item = InventoryItem(name="Stale elbows", quantity=10, unit="each", unit_cost=2, location="van")
+        db.session.add(item)
+        db.session.commit()
+        item_id, version = item.id, item.version
+
+    client.post('/login', data={'password': 'NAO$'})
+    moved = client.post(f"/api/inventory/{item_id}/adjust", json={"delta": -4}).get_json()
+    assert moved == {"success": True, "id": item_id, "quantity": 6, "version": version + 1}
+    assert client.post(f"/api/inventory/{item_id}/adjust", json={"delta": -7}).status_code == 409
+    assert client.post(f"/api/inventory/{item_id}/adjust", json={"delta": "lots"}).status_code == 400
+    for delta in ("nan", "inf", "-inf", "1e400"):
+        assert client.post(f"/api/inventory/{item_id}/adjust", json={"delta": delta}).status_code == 400, delta
+    chat = client.post("/api/chat", json={"message": f"inventory-adjust id={item_id}, delta=nan"}).get_json()
+    assert "Invalid delta" in chat["response"]
+    assert client.post("/api/inventory/999999/adjust", json={"delta": 1}).status_code == 404
+
+    # The form was rendered before the movement above; saving it must not undo it
+    form = {"name": "Stale elbows", "quantity": "10", "unit": "each", "unit_cost": "2", "location": "van",
+            "version": str(version)}
+    response = client.post(f"/inventory/edit/{item_id}", data=form)
+    assert response.status_code == 409 and b"changed by someone else" in response.data
+    form["version"] = str(version + 1)
+    assert client.post(f"/inventory/edit/{item_id}", data=form).status_code == 302
+
+    chat = client.post("/api/chat", json={"message": f"inventory-adjust id={item_id}, delta=5"}).get_json()
+    assert chat["response"] == f"Item {item_id} now has 15"
+    chat = client.post("/api/chat", json={"message": f"inventory-update id={item_id}, notes=Top shelf, version=1"})
+    assert "changed by someone else" in chat.get_json()["response"]
+    with app.app_context():
+        item = db.session.get(InventoryItem, item_id)
+        assert (item.quantity, item.version, item.notes) == (15, version + 3, "")
+        with pytest.raises(EditConflict):
+            edit_item(item_id, {"notes": "x"}, expected_version=version)
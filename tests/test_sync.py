@@ -0,0 +1,95 @@
+from datetime import date
+
+from sqlalchemy import update
+
+from app.extensions import db
+from app.sync import encode_token
+from app.models import Customer, InventoryItem, Job, Material
+
+
+def _sync(client, token=None, **params):
+    if token:
+        params["since"] = token
+    response = client.get("/api/sync", query_string=params)
+    assert response.status_code == 200, response.data
+    return response.get_json()
+
+
+def test_delta_sync_updates_and_tombstones(client, app):
+    app.config["SYNC_SETTLE_SECONDS"] = 0
+    with app.app_context():
+        customer = Customer(name="Sync Customer", address="3 Delta Way")
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add_all([
+            Job(customer_id=customer.id, title="First", scheduled_date=date(2026, 6, 1)),
+            Job(customer_id=customer.id, title="Second"),
+            InventoryItem(name="Screws", quantity=50, owner_id=customer.id),
+            Material(name="Gutter guard", unit="ft", unit_cost=2.5),
+        ])
+        db.session.commit()
+        customer_id = customer.id
+
+    client.post('/login', data={'password': 'NAO$'})
+    page = _sync(client)
+    assert {c["id"] for c in page["customers"]} >= {customer_id}
+    assert {j["title"] for j in page["jobs"]} >= {"First", "Second"}
+    assert page["materials"] and page["inventory"] and not page["more"]
+
+    # Nothing changed: an empty page
+    empty = _sync(client, page["next"])
+    assert not any(empty[key] for key in ("customers", "jobs", "inventory", "materials"))
+
+    # Bulk UPDATE statements bump updated_at too
+    with app.app_context():
+        db.session.execute(update(Job).where(Job.title == "Second").values(status="completed"))
+        db.session.commit()
+    delta = _sync(client, empty["next"])
+    assert [(j["title"], j["status"]) for j in delta["jobs"]] == [("Second", "completed")]
+    assert delta["customers"] == []
+
+    # Database-side cascades leave tombstones for every deleted row
+    job_ids = {j["id"] for j in page["jobs"] if j["customer_id"] == customer_id}
+    client.get(f"/customers/delete/{customer_id}")
+    gone = _sync(client, delta["next"])
+    assert gone["deleted"]["customers"] == [customer_id]
+    assert set(gone["deleted"]["jobs"]) == job_ids
+    assert len(gone["deleted"]["inventory"]) == 1
+
+
+def test_sync_pages_are_bounded(client, app):
+    app.config["SYNC_SETTLE_SECONDS"] = 0
+    with app.app_context():
+        db.session.add_all([Material(name=f"Part {n}") for n in range(5)])
+        db.session.commit()
+        total = Material.query.count()
+
+    client.post('/login', data={'password': 'NAO$'})
+    seen, token = [], None
+    while True:
+        page = _sync(client, token, limit=2)
+        assert len(page["materials"]) <= 2
+        seen.extend(m["id"] for m in page["materials"])
+        token = page["next"]
+        if not page["more"]:
+            break
+    assert len(seen) == len(set(seen)) == total
+    assert client.get("/api/sync?since=not-a-token").status_code == 400
+
+
+def test_hand_built_tokens_with_bad_values_are_rejected(client, app):
+    client.post('/login', data={'password': 'NAO$'})
+    stamp = "2024-01-01T00:00:00.000000"
+    for state in (
+        {"customers": ["bad", 1], "t": stamp},
+        {"jobs": [stamp, "x"], "t": stamp},
+        {"materials": stamp, "t": stamp},
+        {"inventory": [stamp], "t": stamp},
+        {"t": stamp, "d": "many"},
+        {"t": stamp, "d": [1]},
+        {"t": 5},
+    ):
+        response = client.get(f"/api/sync?since={encode_token(state)}")
+        assert response.status_code == 400, state
+        assert response.get_json() == {"error": "Invalid sync token"}
+    assert client.get(f"/api/sync?since={encode_token({'t': stamp, 'd': 0})}").status_code == 200
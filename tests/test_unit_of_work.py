@@ -0,0 +1,67 @@
+import base64
+
+from app import ai, metrics
+from app.extensions import db
+from app.models import Customer, Job, JobPhoto
+from app.uow import held_connections
+
+PHOTO = "data:image/jpeg;base64," + base64.b64encode(b"not really a jpeg").decode()
+
+
+class RecordingModel:
+    """Stands in for Gemini and notes whether the caller held a connection."""
+
+    def __init__(self):
+        self.held = []
+
+    def generate_content(self, contents):
+        self.held.append(held_connections())
+        return type("Response", (), {"text": "Model text"})()
+
+
+def _held_count():
+    return metrics.snapshot()["counters"].get("db.held_during_external_call", 0)
+
+
+def test_ai_routes_release_their_connection_first(client, app, monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(ai, "gemini_model", model)
+    with app.app_context():
+        customer = Customer(name="UoW Customer", address="1 Pool Ln")
+        db.session.add(customer)
+        db.session.flush()
+        job = Job(customer_id=customer.id, title="UoW job")
+        db.session.add(job)
+        db.session.flush()
+        db.session.add(JobPhoto(job_id=job.id, photo_data=PHOTO))
+        db.session.commit()
+        customer_id, job_id = customer.id, job.id
+
+    client.post('/login', data={'password': 'NAO$'})
+    before = _held_count()
+    client.post("/jobs/add", data={
+        "customer_id": customer_id, "title": "Quoted", "use_ai_estimate": "on",
+        "description": "Replace a rotten fascia board and rehang twelve feet of seamless gutter",
+    })
+    client.post(f"/jobs/{job_id}/add_photo", data={"photo_data": PHOTO.replace("not", "still not"), "analyze_photo": "on"})
+    client.post(f"/jobs/{job_id}/analyze_photos", data={"reanalyze": "on"})
+    client.post("/api/ai/estimate", json={"description": "Install copper rain chains at both porch corners"})
+    client.post("/api/chat", json={"message": "Write a haiku about November leaves"})
+
+    assert len(model.held) >= 5 and not any(model.held)
+    assert _held_count() == before
+    with app.app_context():
+        assert Job.query.filter_by(title="Quoted").one().ai_estimate == "Model text"
+        assert {p.ai_analysis for p in JobPhoto.query.filter_by(job_id=job_id)} <= {"Model text"}
+
+
+def test_holding_a_connection_across_a_model_call_is_flagged(app, monkeypatch):
+    monkeypatch.setattr(ai, "gemini_model", RecordingModel())
+    before = _held_count()
+    with app.app_context():
+        db.session.execute(db.select(Customer.id)).all()
+        ai.get_ai_estimate("anything", "anywhere")
+        db.session.rollback()
+    counters = metrics.snapshot()["counters"]
+    assert _held_count() == before + 1
+    assert counters["db.held_during_external_call.ai.estimate"] >= 1
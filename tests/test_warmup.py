@@ -0,0 +1,49 @@
+import os
+
+from app import create_app, metrics
+from app.warmup import warm_up
+
+
+def _app(cache_dir):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'APP_PASSWORD': 'NAO$',
+        'JINJA_BYTECODE_CACHE_DIR': str(cache_dir),
+    })
+
+
+def test_warm_up_fills_the_bytecode_cache_and_reports_timings(tmp_path):
+    cache_dir = tmp_path / "jinja"
+    app = _app(cache_dir)
+    assert app.extensions["startup"]["create_app_ms"] > 0
+
+    timings = warm_up(app)
+    assert set(timings) == {"templates", "pools", "caches", "total"}
+    templates = app.jinja_env.list_templates(extensions=("html", "txt", "xml"))
+    assert len(os.listdir(cache_dir)) == len(templates)
+    assert "customer_index" in app.extensions and "price_book" in app.extensions
+
+    client = app.test_client()
+    data = client.get("/_warmup").get_json()
+    assert data["warm"] and data["warmup_ms"] == timings
+    assert app.extensions["startup"]["first_request_ms"] > 0
+    assert metrics.snapshot()["values"]["startup.first_request_ms"]["count"] >= 1
+
+    # A fresh instance (another machine, same bundle) loads templates without compiling them
+    cold = _app(cache_dir)
+
+    def compile_(*args, **kwargs):
+        raise AssertionError("template was compiled instead of loaded from the bytecode cache")
+
+    cold.jinja_env.compile = compile_
+    cold_client = cold.test_client()
+    assert cold_client.get("/login").status_code == 200
+
+
+def test_unwritable_cache_is_skipped_not_fatal(tmp_path):
+    app = _app(tmp_path / "jinja")
+    # Directory vanished (or is read-only): renders still work, nothing is written
+    app.jinja_env.bytecode_cache.directory = str(tmp_path / "missing")
+    assert app.test_client().get("/login").status_code == 200
+    assert not (tmp_path / "missing").exists()
@@ -1,3 +1,7 @@
 from app import create_app
+from app.warmup import warm_up
 
 app = create_app()
+# Pay for template compilation, the first connection and the in-process
+# caches here, during the cold start, instead of in the first request
+warm_up(app)